@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the batched PubMed abstract retrieval against the local mock
+E-utilities efetch responder, checks that every PMID comes back with its
+title and abstract and reports articles per second for several batch sizes.
+
+usage: python3 bench_abstracts.py [-n ARTICLES] [-l LATENCY]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from scraper import Scraper
+from mock_server import MockServer
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Batched abstracts benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=400)
+    parser.add_argument('-l', '--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency)
+    server.start()
+    pmids = [str(10000000 + i) for i in range(args.articles)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("batch_size\tarticles/s")
+        for batch_size in [1, 20, 200]:
+            scraper = Scraper(os.path.join(tmp, "bench.csv"), server.biblio,
+                              eutils_address=server.eutils,
+                              batch_size=batch_size)
+            scraper.eutils_limiter.rate = None
+            open(scraper.text_dataset, "w").close()
+            start = time.perf_counter()
+            scraper.fetch_abstracts(pmids)
+            elapsed = time.perf_counter() - start
+            rows = pd.read_csv(scraper.text_dataset, header=None)
+            assert rows[0].astype(str).to_list() == pmids
+            assert rows[1].to_list() == [
+                server.article(pmid)[0] for pmid in pmids]
+            print("%d\t%.1f" % (batch_size, args.articles / elapsed))
+
+    server.stop()
+
+if __name__ == "__main__":
+    main()
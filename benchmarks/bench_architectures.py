@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory and time benchmark of the model architectures of create_model.py,
+the in-memory TF-IDF/SVM Model against the out-of-core HashingModel. A
+training set shaped like training/classifier_train.csv is built from the
+fixtures (each article made of reshuffled sentences of one fixture article,
+labelled by its confidence), already scraped so that nothing is fetched.
+Each architecture is trained in a fresh process that reports its time, peak
+RSS and validation accuracy.
+
+usage: python3 bench_architectures.py [-n ARTICLES] [-b BATCH_SIZE]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser, SUPPRESS
+import contextlib
+import io
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from model import Model
+from hashing_model import HashingModel
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "tests")
+
+def training_set(
+    path: str,
+    articles: int,
+    seed: int=0
+) -> None:
+    """Writes a training dataset and its scraped text dataset."""
+    df = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                     ).fillna('')
+    scores = pd.read_csv(os.path.join(TESTS,
+                                      "CAZyNAR-citations_confidence.csv"))
+    score = dict(zip(scores.id.astype(str), scores["%confidence"]))
+    score.update(zip(scores.pmcid, scores["%confidence"]))
+    rng = random.Random(seed)
+    ids, labels, titles, texts = [], [], [], []
+    for i in range(articles):
+        j = rng.randrange(len(df))
+        sentences = df.text[j].split(". ")
+        ids.append("PMC%d" % (1000000 + i))
+        labels.append(int(score[str(df.id[j])] > 50))
+        titles.append(df.title[j])
+        texts.append(". ".join(rng.sample(sentences, len(sentences))))
+    pd.DataFrame({"id": ids, "label": labels}).to_csv(path, index=False)
+    pd.DataFrame({"id": ids, "title": titles, "only_abstract": False,
+                  "text": texts}).to_csv(
+                      "%s_text.csv" % (os.path.splitext(path)[0]),
+                      index=False)
+
+def train(
+    architecture: str,
+    dataset: str,
+    batch_size: int
+) -> None:
+    """Trains an architecture in this process and prints the time, peak RSS
+    and validation accuracy."""
+    output = os.path.join(os.path.dirname(dataset), architecture + ".joblib")
+    if architecture == "hashing_sgd":
+        model = HashingModel(output, dataset, "http://localhost/Biblio", 0.15,
+                             rate=None, resume=True, batch_size=batch_size)
+    else:
+        model = Model(output, dataset, "http://localhost/Biblio", 0.15,
+                      rate=None, resume=True)
+    report = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(report):
+        model.dataset_prep()
+        model.fit()
+        model.performance()
+    elapsed = time.perf_counter() - start
+    accuracy = [line.split()[-2] for line in report.getvalue().split("\n")
+                if line.strip().startswith("accuracy")][0]
+    print("%.1f\t%.0f\t%s" % (elapsed, resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss / 1024, accuracy))
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Model architectures benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=1500)
+    parser.add_argument('-b', '--batch_size', type=int, default=200)
+    parser.add_argument('--train', nargs=2, default=None, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.train:
+        train(args.train[0], args.train[1], args.batch_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, "classifier_train.csv")
+        training_set(dataset, args.articles)
+        print("%d articles, %.0f MB of text" % (args.articles, os.path.getsize(
+            "%s_text.csv" % (os.path.splitext(dataset)[0])) / 1e6))
+        print("architecture\ttime (s)\tpeak RSS (MB)\taccuracy")
+        for architecture in ["tfidf_svm", "hashing_sgd"]:
+            result = subprocess.run(
+                [sys.executable, __file__, "-b", str(args.batch_size),
+                 "--train", architecture, dataset],
+                capture_output=True, text=True, check=True)
+            print("%s\t%s" % (architecture,
+                              result.stdout.strip().split("\n")[-1]))
+
+if __name__ == "__main__":
+    main()
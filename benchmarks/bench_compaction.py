@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the model compaction of compact_model.py: a Model is created on
+a training set built from the fixtures (already scraped, so that nothing is
+fetched), then compacted with several prunings and precisions, each compared
+to the model on another set of articles (size, load time, throughput of the
+Scorer, and the scores). Without pruning, the float32 and float16 weights
+must give nearly the same scores.
+
+usage: python3 bench_compaction.py [-n ARTICLES] [-v VALIDATION_ARTICLES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from model import Model
+from compact_model import launch_compact
+from bench_architectures import training_set
+
+SETTINGS = [
+    ("float32", 0.0, 0.0, False),
+    ("float16", 0.0, 0.0, False),
+    ("int8", 0.0, 0.0, False),
+    ("float16", 0.01, 0.0, False),
+    ("float16", 0.05, 0.0, False),
+    ("int8", 0.05, 0.0, False),
+    ("float16", 0.0, 0.005, False),
+    ("float16", 0.05, 0.0, True),
+    ]
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Model compaction benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=1500)
+    parser.add_argument('-v', '--validation_articles', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, "classifier_train.csv")
+        validation = os.path.join(tmp, "validation.csv")
+        training_set(dataset, args.articles)
+        training_set(validation, args.validation_articles, seed=1)
+        model = os.path.join(tmp, "model.joblib")
+        with contextlib.redirect_stdout(io.StringIO()):
+            Model.create_model(model, dataset, "http://localhost/Biblio",
+                               0.15, rate=None, resume=True)
+
+        print("%d training articles, %d scored" % (
+            args.articles, args.validation_articles))
+        print("precision\tmin weight\tmin df\tnative\tsize (MB)\tload (ms)\t\
+terms\tdocs/s\tmax |score delta|\tmean |score delta|\tAP delta")
+        for i, (precision, min_weight, min_df, native) in enumerate(
+                SETTINGS):
+            with contextlib.redirect_stdout(io.StringIO()):
+                comparison = launch_compact(
+                    model, os.path.join(tmp, "compact%d" % (i)), min_weight,
+                    min_df, precision, native, validation)
+            if i == 0:
+                print("model\t\t\t\t%.2f\t%.0f\t%d\t%.0f" % tuple(
+                    comparison.original[["size (MB)", "load (ms)", "terms",
+                                         "docs/s"]]))
+            compacted, delta = comparison.compacted, comparison.delta
+            print("%s\t%g\t%g\t%s\t%.2f\t%.0f\t%d\t%.0f\t%.4f\t%.4f\t%.4f" % (
+                precision, min_weight, min_df, native,
+                compacted["size (MB)"], compacted["load (ms)"],
+                compacted["terms"], compacted["docs/s"],
+                delta["max |score delta|"], delta["mean |score delta|"],
+                delta["average precision"]))
+            if not min_weight and not min_df and precision != "int8":
+                assert delta["max |score delta|"] < 0.1, precision
+
+if __name__ == "__main__":
+    main()
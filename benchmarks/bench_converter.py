@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the bulk ID conversion against the per-ID metapub path, both
+run against the local mock of the PMC ID Converter API seeded with the
+CAZyNAR citations fixtures. Checks that both paths give the same PMCIDs.
+
+usage: python3 bench_converter.py [-n IDS] [-l LATENCY]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import time
+import pandas as pd
+from metapub import pubmedcentral
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from converter import IdConverter
+from mock_server import MockServer
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "tests")
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Bulk ID conversion benchmark")
+    parser.add_argument('-n', '--ids', type=int, default=300)
+    parser.add_argument('-l', '--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency)
+    server.start()
+    ids = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations.csv"),
+                      header=None)[0].astype(str).to_list()[:args.ids]
+
+    pubmedcentral.PMC_ID_CONVERSION_URI = server.idconv + "?ids=%s"
+    start = time.perf_counter()
+    per_id = []
+    for idi in ids:
+        try:
+            per_id.append(pubmedcentral.get_pmcid_for_otherid(idi))
+        except AttributeError:
+            per_id.append(None)
+    per_id_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = IdConverter(server.idconv, rate=None).convert(ids, "pmcid")
+    bulk_time = time.perf_counter() - start
+
+    assert per_id == bulk
+    print("path\tids/s")
+    print("per-ID\t%.1f" % (len(ids) / per_id_time))
+    print("bulk\t%.1f" % (len(ids) / bulk_time))
+    server.stop()
+
+if __name__ == "__main__":
+    main()
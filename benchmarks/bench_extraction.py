@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the Biblio page extraction, the single pass of the
+ArticleParser of Scraper.parse_article against the previous three find_all
+walks over the tree of BeautifulSoup. HTML pages are rebuilt from the scraped
+fixtures, and malformed pages (unclosed tags inside containers, stray closing
+tags, entities, whitespace, scripts) are added; both paths must give
+identical outputs, and the single pass must be faster.
+
+usage: python3 bench_extraction.py [-r REPEAT]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from html import escape
+from typing import Tuple
+import os
+import sys
+import time
+import pandas as pd
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from scraper import Scraper
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                       "CAZyNAR-citations_text.csv")
+
+def full_parse(
+    html: str
+) -> Tuple[str, bool, str]:
+    """The previous extraction, kept as the reference."""
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.find_all('h1')[0].text
+    text = ''.join([p.text for p in soup.find_all('p')])
+    only_abstract = True
+    if len(soup.find_all('h2')) > 1:
+        only_abstract = False
+    return title, only_abstract, text
+
+def biblio_page(
+    title: str,
+    text: str,
+    only_abstract: bool
+) -> str:
+    """Rebuilds a Biblio-like page around a scraped article, with navigation,
+    tables and inline markup that the extraction has to skip or keep."""
+    words = text.split(". ")
+    paragraphs = [". ".join(words[i:i + 8]) for i in range(0, len(words), 8)]
+    sections = ["<h2>Abstract</h2>"]
+    for i, paragraph in enumerate(paragraphs):
+        if i and i % 6 == 0 and not only_abstract:
+            sections.append("<h2>Section %d</h2>" % (i))
+        sections.append("<div class=\"sec\"><p>%s <i>et al.</i></p>"
+                        "<table><tr><td>%d</td></tr></table></div>" % (
+                            escape(paragraph), i))
+    return "<html><head><title>%s</title><script>var x = 1;</script>" \
+        "</head><body><nav><a href=\"#\">Home</a></nav><h1>%s</h1>%s" \
+        "</body></html>" % (escape(title), escape(title), "".join(sections))
+
+MALFORMED = [
+    "<h1>T</h1><div><p>abc</div><span>xyz</span><h2>a</h2><p>d",
+    "<h1>T</h1><div><p>abc</div><h2>a</h2><h2>b</h2><p>d</p>",
+    "<h1>T</h1><section><p>a<p>b</section></p><p>c</div>",
+    "<h1>T<h2>x</h2></h1><table><tr><td><p>a</td></tr></table><p>b",
+    "<h1>T</h1><p>a<div>b</p>c</div><h2>s</h2><h2>t</h2>",
+    "<h1> &amp;T&foo;</h1>\n  <p>a&nbsp;b&#150;<br>c</br></p>\n<p> \n </p>",
+    "<h1>T<script>var t = '<p>x</p>';</script></h1><p>a<!-- b --><style>\
+p {}</style>c<p/>d<pre>  </pre>",
+    ]
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="HTML extraction micro-benchmark")
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = pd.read_csv(FIXTURE).fillna('')
+    pages = [biblio_page(title, text, only_abstract) for title, text,
+             only_abstract in zip(df.title, df.text, df.only_abstract)]
+    size = sum(len(page) for page in pages) / 1e6
+
+    for page in pages + MALFORMED:
+        assert full_parse(page) == Scraper.parse_article(page), page
+
+    print("path\tpages/s\tMB/s")
+    speeds = []
+    for name, parse in [("tree, three walks", full_parse),
+                        ("single pass", Scraper.parse_article)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for page in pages:
+                parse(page)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        speeds.append(len(pages) / elapsed)
+        print("%s\t%.1f\t%.2f" % (name, len(pages) / elapsed,
+                                  size / elapsed))
+    assert speeds[1] > speeds[0]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the feature store of create_model.py: preparing the training
+set of a Model (scraping, preprocessing and splitting, the articles being
+already scraped so that nothing is fetched) without a store, while creating
+it, and from it. The model trained on the store is saved, and its scores of
+the raw articles must be the ones of its classifier on the stored counts:
+the vocabulary and the phrasers saved with the model reproduce the store.
+
+usage: python3 bench_feature_store.py [-n ARTICLES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from model import Model
+from preprocessor import Preprocessor
+from feature_store import FeatureStore
+from scorer import Scorer
+from bench_architectures import training_set
+
+def prepare(
+    dataset: str,
+    features: str=None
+) -> tuple:
+    """Prepares the training set of a Model, returns it and the time."""
+    model = Model(os.path.join(os.path.dirname(dataset), "model.joblib"),
+                  dataset, "http://localhost/Biblio", 0.15, rate=None,
+                  resume=True, features=features)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        model.dataset_prep()
+    return model, time.perf_counter() - start
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Feature store benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=1500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, "classifier_train.csv")
+        training_set(dataset, args.articles)
+        features = os.path.join(tmp, "features")
+        print("%d articles" % (args.articles))
+        print("training set\tprepared in (s)")
+        print("no store\t%.2f" % (prepare(dataset)[1]))
+        print("creating the store\t%.2f" % (prepare(dataset, features)[1]))
+        model, elapsed = prepare(dataset, features)
+        print("from the store\t%.2f" % (elapsed))
+        print("store size\t%.1f MB" % (sum(
+            os.path.getsize(os.path.join(features, f))
+            for f in os.listdir(features)) / 1e6))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            model.fit()
+            model.save()
+        store = FeatureStore.load(features)
+        df = pd.read_csv("%s_text.csv" % (os.path.splitext(dataset)[0])
+                         ).fillna('')
+        df = df[:200]
+        scorer = Scorer(model.path)
+        scores = np.fromiter(scorer.stream(Preprocessor.preprocess(
+            (df.title + " " + df.text).to_list(),
+            phrasers=scorer.preprocessor.phrasers,
+            table=scorer.preprocessor.table)), dtype=np.float64)
+        expected = model.architecture[1:].predict_proba(
+            store.counts[store.rows(df.id.to_list())])[:, 1] * 100
+        difference = np.abs(scores - expected).max()
+        print("model trained on the store, max difference with the stored \
+counts %.1e" % (difference))
+        assert difference < 1e-9
+
+if __name__ == "__main__":
+    main()
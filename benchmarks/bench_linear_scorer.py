@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the compiled linear scorer against the trained models it is
+compiled from, for both architectures of create_model.py and both
+calibration methods. The compiled scorer must give the same probabilities as
+the model and score them faster; the size on disk, the latency of one
+document and the throughput by chunks of the Scorer are reported. The documents are the fixtures, each
+article made of reshuffled sentences of one fixture article, labelled by its
+confidence.
+
+usage: python3 bench_linear_scorer.py [-n ARTICLES] [-l LATENCY_DOCS]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from itertools import islice
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.feature_extraction.text import TfidfVectorizer, \
+    HashingVectorizer, TfidfTransformer
+from sklearn.svm import LinearSVC
+from sklearn.linear_model import SGDClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.frozen import FrozenEstimator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+from linear_scorer import LinearScorer
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "tests")
+
+def corpus(
+    articles: int,
+    seed: int=0
+) -> tuple:
+    """Preprocessed documents and their labels."""
+    df = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                     ).fillna('')
+    scores = pd.read_csv(os.path.join(TESTS,
+                                      "CAZyNAR-citations_confidence.csv"))
+    score = dict(zip(scores.id.astype(str), scores["%confidence"]))
+    score.update(zip(scores.pmcid, scores["%confidence"]))
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(articles):
+        j = rng.randrange(len(df))
+        sentences = df.text[j].split(". ")
+        texts.append("%s %s" % (df.title[j], ". ".join(
+            rng.sample(sentences, len(sentences)))))
+        labels.append(int(score[str(df.id[j])] > 50))
+    return Preprocessor.preprocess(texts), np.array(labels)
+
+def throughput(
+    model: object,
+    docs: list,
+    chunk_size: int=1000
+) -> float:
+    """Documents scored per second, by chunks as Scorer.stream (the best
+    of three runs)."""
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        chunks = iter(docs)
+        while chunk := list(islice(chunks, chunk_size)):
+            model.predict_proba(chunk)
+        times.append(time.perf_counter() - start)
+    return len(docs) / min(times)
+
+def latency(
+    model: object,
+    docs: list
+) -> float:
+    """Median time in ms to score one document."""
+    times = []
+    for doc in docs:
+        start = time.perf_counter()
+        model.predict_proba([doc])
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Compiled linear scorer benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=2000)
+    parser.add_argument('-l', '--latency_docs', type=int, default=200)
+    args = parser.parse_args()
+
+    docs, labels = corpus(args.articles)
+    models = []
+    for method in ["sigmoid", "isotonic"]:
+        model = SkPipeline([
+            ("tfidf_vectorization", TfidfVectorizer(
+                analyzer=Preprocessor.passthrough)),
+            ("classifier", CalibratedClassifierCV(LinearSVC(C=10),
+                                                  method=method))])
+        models.append(("tfidf_svm, %s" % (method), model.fit(docs, labels)))
+    model = SkPipeline([
+        ("hashing_vectorization", HashingVectorizer(
+            analyzer=Preprocessor.passthrough, alternate_sign=False,
+            norm=None)),
+        ("tfidf_transformation", TfidfTransformer()),
+        ("classifier", SGDClassifier(loss="hinge", alpha=1e-5))]).fit(
+            docs, labels)
+    calibrated = CalibratedClassifierCV(FrozenEstimator(model.steps[-1][1]))
+    calibrated.fit(model[:-1].transform(docs), labels)
+    model.steps[-1] = ("classifier", calibrated)
+    models.append(("hashing_sgd, sigmoid", model))
+
+    print("%d documents, %d for the latency" % (len(docs),
+                                               args.latency_docs))
+    print("model\tscorer\tsize (MB)\tlatency (ms)\tdocs/s")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, model in models:
+            compiled = LinearScorer.compile(model)
+            difference = np.abs(compiled.predict_proba(docs) -
+                                model.predict_proba(docs)).max()
+            assert difference < 1e-9, (name, difference)
+            speeds = []
+            for scorer, instance in [("pipeline", model),
+                                     ("compiled", compiled)]:
+                path = os.path.join(tmp, "model.joblib")
+                dump(instance, path)
+                speeds.append(throughput(instance, docs))
+                print("%s\t%s\t%.1f\t%.3f\t%.0f" % (
+                    name, scorer, os.path.getsize(path) / 1e6,
+                    latency(instance, docs[:args.latency_docs]), speeds[-1]))
+            print("%s\tmax difference %.1e" % (name, difference))
+            assert speeds[1] > speeds[0], name
+
+if __name__ == "__main__":
+    main()
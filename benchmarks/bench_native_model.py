@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load time and memory benchmark of the model formats given to predict.py: the
+trained model and the compiled model saved with joblib, and the compiled
+model in the native format (memory-mapped arrays). The model is trained on
+the fixtures, each article made of reshuffled sentences of one fixture
+article, its vocabulary padded with synthetic terms to the size of a real
+one. Every format is loaded by a Scorer in a fresh process, which reports
+the load time and its private (anonymous) and file-backed (shareable)
+resident memory after loading and after scoring; all must give the same
+scores.
+
+usage: python3 bench_native_model.py [-n ARTICLES] [-v VOCABULARY]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser, SUPPRESS
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from joblib import dump, load
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+from linear_scorer import LinearScorer
+from scorer import Scorer
+from bench_linear_scorer import corpus
+
+def memory(
+) -> tuple:
+    """The anonymous and file-backed resident memory of this process in
+    MB."""
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return tuple(int(status[field].split()[0]) / 1024
+                 for field in ["RssAnon", "RssFile"])
+
+def score(
+    model: str,
+    docs: str,
+    scores: str
+) -> None:
+    """Loads the model in this process, scores the documents and prints the
+    load time and the resident memory."""
+    docs = load(docs)
+    before = memory()
+    start = time.perf_counter()
+    scorer = Scorer(model)
+    elapsed = time.perf_counter() - start
+    loaded = memory()
+    np.save(scores, np.fromiter(scorer.stream(docs), dtype=np.float64))
+    scored = memory()
+    print("%.0f\t%.0f\t%.0f\t%.0f\t%.0f" % (
+        elapsed * 1000, loaded[0] - before[0], loaded[1] - before[1],
+        scored[0] - before[0], scored[1] - before[1]))
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Native model format benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=1000)
+    parser.add_argument('-v', '--vocabulary', type=int, default=500000)
+    parser.add_argument('--score', nargs=3, default=None, help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.score:
+        score(*args.score)
+        return
+
+    docs, labels = corpus(args.articles)
+    rng = random.Random(0)
+    padding = [["term%d_%d" % (i, j) for j in range(1000)]
+               for i in range(args.vocabulary // 1000)]
+    model = SkPipeline([
+        ("tfidf_vectorization", TfidfVectorizer(
+            analyzer=Preprocessor.passthrough)),
+        ("classifier", CalibratedClassifierCV(LinearSVC(C=10)))])
+    model.fit(docs + padding, np.concatenate([labels, [
+        rng.randrange(2) for _ in padding]]).astype(int))
+    vocabulary = len(model.steps[0][1].vocabulary_)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"pipeline (.joblib)": os.path.join(tmp, "model.joblib"),
+                 "compiled (.joblib)": os.path.join(tmp, "compiled.joblib"),
+                 "native": os.path.join(tmp, "native")}
+        dump(model, paths["pipeline (.joblib)"])
+        compiled = LinearScorer.compile(model)
+        compiled.save(paths["compiled (.joblib)"])
+        compiled.save(paths["native"], native=True)
+        dump(docs[:100], os.path.join(tmp, "docs.joblib"))
+
+        print("%d terms, 100 documents scored" % (vocabulary))
+        print("format\tsize (MB)\tload (ms)\tanon. RSS, loaded (MB)\tfile \
+RSS, loaded (MB)\tanon. RSS, scored (MB)\tfile RSS, scored (MB)")
+        reference = None
+        for name, path in paths.items():
+            size = sum(os.path.getsize(os.path.join(path, f))
+                       for f in os.listdir(path)) if os.path.isdir(path) \
+                else os.path.getsize(path)
+            scores = os.path.join(tmp, "scores.npy")
+            result = subprocess.run(
+                [sys.executable, __file__, "--score", path,
+                 os.path.join(tmp, "docs.joblib"), scores],
+                capture_output=True, text=True, check=True)
+            print("%s\t%.1f\t%s" % (name, size / 1e6,
+                                    result.stdout.strip().split("\n")[-1]))
+            if reference is None:
+                reference = np.load(scores)
+            assert np.abs(np.load(scores) - reference).max() < 1e-7, name
+
+if __name__ == "__main__":
+    main()
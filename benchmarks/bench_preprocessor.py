@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the text normalization, the compiled single-pass
+Preprocessor.normalize against the previous per-document regex compilation,
+RegexpTokenizer and stopword list. Both paths must give identical tokens on
+the full-text fixtures and on a set of noisy edge cases. The whole
+preprocessing is then timed on the fixtures repeated to a larger corpus:
+stemming and lemmatizing every token occurrence, and going through the
+normalization table, empty or already filled by a previous run, serially and
+across a process pool, and applying phrasers fitted beforehand instead of
+fitting them on the batch. All of them must give the same output, and a
+document preprocessed alone with the fitted phrasers must come out as in the
+whole batch.
+
+usage: python3 bench_preprocessor.py [-r REPEAT] [-j PROCESSES] [-c COPIES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from typing import List
+import os
+import re
+import sys
+import time
+import pandas as pd
+from nltk.corpus import stopwords
+from nltk.tokenize import RegexpTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                       "CAZyNAR-citations_text.csv")
+
+EDGE_CASES = [
+    "", "1234", "12,5", "12,", "nan", "{html}<p>Glycoside</p> hydrolases",
+    "<a href='http://x.org'>link</a> http://www.ncbi.nlm.nih.gov/pmc/",
+    "see www.cazy.org, {Entrez (gene)} and {unclosed", "<b\n>multi\nline</b>",
+    "Ångström β-glucosidase naïve CAZymes_GH13 3000 x2 ",
+    "Conflict of interest: however, et al. (Fig. 2) also use subject",
+    "line one\n42\nline three 1,000,000 α-amylase",
+]
+
+def legacy_normalize(
+    doc: str
+) -> List[str]:
+    """The previous cleaning, tokenization and stopword removal, kept as the
+    reference."""
+    doc = str(doc).lower()
+    doc = doc.replace('{html}', "")
+    cleanr = re.compile('<.*?>')
+    cleantext = re.sub(cleanr, '', doc)
+    rem_url = re.sub(r'http\S+', '', cleantext)
+    rem_www = re.sub(r'www\S+', '', rem_url)
+    rem_entrez = re.sub(r'\{([^)]+)\}', '', rem_www)
+    rem_num = re.sub(r'^\d+(?:,\d*)?$', '', rem_entrez)
+    tokens = RegexpTokenizer(r'\w+').tokenize(rem_num)
+    stop_words = stopwords.words('english')
+    stop_words.extend(
+        ['from', 'subject', 're', 'edu', 'use', 'however',
+         'et', 'al', 'fig', 'also', 'conflict', 'interest']
+        )
+    return [w for w in tokens if len(w) > 3 if w not in stop_words
+            if not w.isnumeric()]
+
+def per_token(
+    docs: List[str]
+) -> List[List[str]]:
+    """The previous stemming and lemmatization of every token occurrence,
+    kept as the reference."""
+    data_words_no_stop = [Preprocessor.normalize(doc) for doc in docs]
+    data_words_ngrams = Preprocessor.make_ngrams(data_words_no_stop)
+    data_words_stemmed = Preprocessor.stemmer(data_words_ngrams)
+    return Preprocessor.lemmatizer(data_words_stemmed)
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Text normalization benchmark")
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-j', '--processes', type=int, default=4)
+    parser.add_argument('-c', '--copies', type=int, default=4)
+    args = parser.parse_args()
+
+    df = pd.read_csv(FIXTURE).fillna('')
+    docs = (df.title + " " + df.text).to_list()
+    size = sum(len(doc) for doc in docs) / 1e6
+
+    for doc in docs + EDGE_CASES:
+        assert legacy_normalize(doc) == Preprocessor.normalize(doc), doc
+    assert [legacy_normalize(doc) for doc in docs] == \
+        Preprocessor.remove_stopwords(Preprocessor.tokenize(docs))
+
+    print("path\tdocs/s\tMB/s")
+    for name, normalize in [("legacy", legacy_normalize),
+                            ("compiled", Preprocessor.normalize)]:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for doc in docs:
+                normalize(doc)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print("%s\t%.1f\t%.2f" % (name, len(docs) / elapsed,
+                                  size / elapsed))
+
+    corpus = docs * args.copies
+    table = {}
+    phrasers = Preprocessor.fit_phrasers(
+        [Preprocessor.normalize(doc) for doc in corpus])
+    outputs = []
+    print("\npreprocessing\tprocesses\tdocs/s")
+    for name, processes, preprocess in [
+            ("per token", 1, per_token),
+            ("cold table", 1,
+             lambda corpus: Preprocessor.preprocess(corpus, 1, None, table)),
+            ("warm table", 1,
+             lambda corpus: Preprocessor.preprocess(corpus, 1, None, table)),
+            ("cold table", args.processes,
+             lambda corpus: Preprocessor.preprocess(corpus, args.processes)),
+            ("fitted phrasers", 1,
+             lambda corpus: Preprocessor.preprocess(corpus, 1, None, table,
+                                                    phrasers)),
+            ]:
+        start = time.perf_counter()
+        outputs.append(preprocess(corpus))
+        elapsed = time.perf_counter() - start
+        print("%s\t%d\t%.1f" % (name, processes, len(corpus) / elapsed))
+    assert all(output == outputs[0] for output in outputs)
+    for i in range(0, len(docs), 10):
+        assert Preprocessor.preprocess([corpus[i]], 1, None, table,
+                                       phrasers) == [outputs[0][i]]
+    print("%d distinct tokens for %d occurrences" % (
+        len(table), sum(len(doc) for doc in outputs[0])))
+
+if __name__ == "__main__":
+    main()
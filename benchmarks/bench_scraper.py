@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the concurrent Biblio scraping against the local mock server,
+reports the number of scraped articles per second for several concurrency
+levels, then with the adaptive limit of requests in flight. Use -t to make
+the server throttle (429) above a number of requests per second.
+
+usage: python3 bench_scraper.py [-n ARTICLES] [-l LATENCY] [-t THROTTLE]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from scraper import Scraper
+from mock_server import MockServer
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Concurrent scraping benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=200)
+    parser.add_argument('-l', '--latency', type=float, default=0.05)
+    parser.add_argument('-t', '--throttle', type=float, default=None)
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency, throttle=args.throttle)
+    server.start()
+    pmcids = ["PMC%d" % (i) for i in range(args.articles)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("workers\tarticles/s\t429s")
+        for workers in [1, 2, 4, 8, 16]:
+            scraper = Scraper(os.path.join(tmp, "bench.csv"), server.biblio,
+                              workers=workers, rate=None)
+            throttled, start = server.throttled, time.perf_counter()
+            scraper.scrape_biblio(pmcids)
+            elapsed = time.perf_counter() - start
+            print("%d\t%.1f\t%d" % (workers, args.articles / elapsed,
+                                    server.throttled - throttled))
+
+        scraper = Scraper(os.path.join(tmp, "bench.csv"), server.biblio,
+                          workers=16, rate=None, adaptive=True)
+        scraper.client.backoff = 0.1
+        throttled, start = server.throttled, time.perf_counter()
+        scraper.scrape_biblio(pmcids)
+        elapsed = time.perf_counter() - start
+        print("adaptive\t%.1f\t%d\t(%s)" % (
+            args.articles / elapsed, server.throttled - throttled,
+            scraper.controller.stats()))
+
+    server.stop()
+
+if __name__ == "__main__":
+    main()
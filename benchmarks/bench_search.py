@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the hyperparameter search of create.py (Model.tune), the terms
+counted once and cached for every fold and setting, against the same search
+vectorizing the documents again in every fold and setting (a TfidfVectorizer
+in the searched pipeline). The cross-validation scores of both must be
+close: with the cached counts, the terms of a validation fold missing from
+its training folds have no weight but still count in the norm of its
+documents. The tuned 3-step pipeline must then be scored by the Scorer and
+compiled to the same probabilities by the LinearScorer.
+
+usage: python3 bench_search.py [-n ARTICLES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import tempfile
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.feature_extraction.text import TfidfVectorizer, \
+    CountVectorizer
+from sklearn.model_selection import GridSearchCV
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+from linear_scorer import LinearScorer
+from model import Model
+from scorer import Scorer
+from bench_linear_scorer import corpus
+
+def setting(
+    values: list
+) -> tuple:
+    """A setting of the search comparable between the parameters and the
+    .csv report (where 1 is read as 1.0)."""
+    def value(v):
+        try:
+            return float(str(v))
+        except ValueError:
+            return str(v).lower()
+    return tuple(value(v) for v in values)
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Hyperparameter search benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=300)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+    os.environ["PYTHONWARNINGS"] = "ignore"
+
+    docs, labels = corpus(args.articles)
+    labels = np.array(labels)
+    grid = dict(Model.SEARCH_GRID)
+    settings = int(np.prod([len(values) for values in grid.values()]))
+    print("%d documents, %d settings, 5 folds, %d core(s)" % (
+        len(docs), settings, os.cpu_count()))
+    print("search\ttime (s)")
+
+    start = time.perf_counter()
+    search = GridSearchCV(SkPipeline([
+        ("tfidf_vectorization", TfidfVectorizer(
+            analyzer=Preprocessor.passthrough)),
+        ("classifier", CalibratedClassifierCV(LinearSVC(C=10)))]),
+        {name.replace("tfidf_transformation", "tfidf_vectorization"): values
+         for name, values in grid.items()}, scoring=Model.SEARCH_METRICS,
+        refit=Model.SEARCH_METRICS[0], n_jobs=-1)
+    search.fit(docs, labels)
+    print("vectorized in every fold and setting\t%.1f" % (
+        time.perf_counter() - start))
+    reference = {name: np.asarray(values) for name, values in
+                 search.cv_results_.items() if name.startswith("mean_")}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # a Model without its dataset, the training set set directly
+        model = Model.__new__(Model)
+        model.path = os.path.join(tmp, "model.joblib")
+        model.search = "grid"
+        model._Model__X_train, model._Model__y_train = docs, labels
+        start = time.perf_counter()
+        model.tune()
+        print("terms counted once (Model.tune)\t%.1f" % (
+            time.perf_counter() - start))
+
+        report = pd.read_csv(os.path.join(tmp, "model_search.csv"))
+        assert len(report) == settings
+        # the settings of both searches, in the order of the report
+        columns = ["param_" + name for name in sorted(grid)]
+        keys = [setting([params[name.replace(
+            "tfidf_transformation", "tfidf_vectorization")]
+            for name in sorted(grid)])
+            for params in search.cv_results_["params"]]
+        order = [keys.index(setting(row)) for row in
+                 report[columns].itertuples(index=False)]
+        print("\nmetric\tbest, vectorized\tbest, cached\tmax difference")
+        for metric in Model.SEARCH_METRICS:
+            vectorized = reference["mean_test_%s" % (metric)][order]
+            cached = report["mean_test_%s" % (metric)].to_numpy()
+            print("%s\t%.4f\t%.4f\t%.4f" % (
+                metric, vectorized.max(), cached.max(),
+                np.abs(vectorized - cached).max()))
+            assert np.abs(vectorized - cached).max() < 0.05, metric
+
+        assert isinstance(model.architecture.steps[0][1], CountVectorizer)
+        dump(model.architecture, model.path)
+        scorer = Scorer(model.path)
+        scores = np.fromiter(scorer.stream(docs[:200]), dtype=np.float64)
+        compiled = LinearScorer.compile(model.architecture)
+        difference = np.abs(compiled.predict_proba(docs[:200])[:, 1] * 100
+                            - scores).max()
+        print("\ntuned pipeline scored and compiled, max difference %.1e" % (
+            difference))
+        assert difference < 1e-7
+
+if __name__ == "__main__":
+    main()
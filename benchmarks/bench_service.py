@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the scoring service (serve.py) with a model trained on the
+fixtures:
+- the wall time of a fresh process scoring a few documents, loading the
+  libraries and the model itself against asking a warm service through the
+  thin client;
+- the throughput of concurrent clients sending one document per request,
+  with micro-batching and without (--max_batch 1);
+- a hot reload under load: the model files are replaced while the clients
+  are sending requests, none may fail and the new model must be served.
+The scores of the service must be the ones of a local Scorer.
+
+usage: python3 bench_service.py [-c CLIENTS] [-r REQUESTS]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+from service_client import ServiceClient
+from preprocessor import Preprocessor
+from scorer import Scorer
+from load_test import fixture_model, TESTS
+
+COLD = """
+import sys
+sys.path.insert(0, %r)
+from preprocessor import Preprocessor
+from scorer import Scorer
+scorer = Scorer(%r)
+scorer.docs = Preprocessor.preprocess(%r, phrasers=scorer.preprocessor.phrasers,
+                                      table=scorer.preprocessor.table)
+scorer.confidence()
+"""
+
+THIN = """
+import sys
+sys.path.insert(0, %r)
+from service_client import ServiceClient
+ServiceClient(%r).score(%r)
+"""
+
+def serve(
+    model: str,
+    *options: str
+) -> tuple:
+    """Starts serve.py and returns the process and its address."""
+    process = subprocess.Popen(
+        [sys.executable, "-u", os.path.join(SRC, "serve.py"), "-m", model,
+         "--port", "0", "--interval", "0.2"] + list(options),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in process.stdout:
+        if line.startswith("Serving"):
+            return process, line.split()[-1]
+    raise Exception("The service did not start")
+
+def stop(
+    process: subprocess.Popen
+) -> None:
+    process.terminate()
+    process.wait()
+
+def wall(
+    code: str,
+    runs: int=3
+) -> float:
+    """The median wall time of a fresh process running code."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True,
+                       capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def load(
+    address: str,
+    texts: list,
+    clients: int,
+    requests: int
+) -> tuple:
+    """Sends one document per request from concurrent clients, returns the
+    documents per second and the failed requests."""
+    client = ServiceClient(address)
+
+    def send(i):
+        failed = 0
+        for j in range(requests):
+            try:
+                client.score([texts[(i * requests + j) % len(texts)]])
+            except Exception:
+                failed += 1
+        return failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        failed = sum(executor.map(send, range(clients)))
+    return clients * requests / (time.perf_counter() - start), failed
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Scoring service benchmark")
+    parser.add_argument('-c', '--clients', type=int, default=16)
+    parser.add_argument('-r', '--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    df = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                     ).fillna('')
+    # abstract-sized documents, as most of the small lists of the curators
+    texts = (df.title + " " + df.text.str.slice(0, 1500)).to_list()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = fixture_model(os.path.join(tmp, "model.joblib"))
+        scorer = Scorer(model)
+        expected = scorer.stream(Preprocessor.preprocess(
+            texts, phrasers=scorer.preprocessor.phrasers,
+            table=scorer.preprocessor.table))
+
+        process, address = serve(model)
+        scores = ServiceClient(address).score(texts)
+        assert np.allclose(scores, list(expected), rtol=0, atol=1e-9)
+        print("fresh process scoring 5 documents\twall (s)")
+        print("local Scorer\t%.2f" % (wall(COLD % (SRC, model, texts[:5]))))
+        print("thin client, warm service\t%.2f" % (wall(THIN % (
+            SRC, address, texts[:5]))))
+        stop(process)
+
+        print("\n%d clients x %d requests of 1 document" % (
+            args.clients, args.requests))
+        print("service\tdocs/s\tdocuments per batch\tfailed")
+        for name, options in [("no batching", ["--max_batch", "1"]),
+                              ("micro-batching", [])]:
+            process, address = serve(model, *options)
+            client = ServiceClient(address)
+            client.score(texts[:1])
+            before = client.health()
+            throughput, failed = load(address, texts, args.clients,
+                                      args.requests)
+            after = client.health()
+            print("%s\t%.1f\t%.1f\t%d" % (
+                name, throughput, (after["documents"] - before["documents"])
+                / (after["batches"] - before["batches"]), failed))
+            stop(process)
+
+        print("\nhot reload under load")
+        # another model: the weights of the first fold doubled
+        other = fixture_model(os.path.join(tmp, "other.joblib"))
+        architecture = joblib.load(other)
+        architecture.steps[-1][1].calibrated_classifiers_[0].estimator.coef_ \
+            *= 2
+        joblib.dump(architecture, other)
+        scorer = Scorer(other)
+        process, address = serve(model)
+        client = ServiceClient(address)
+        with ThreadPoolExecutor(1) as executor:
+            running = executor.submit(load, address, texts, args.clients,
+                                      args.requests)
+            time.sleep(0.5)
+            for suffix in ["_preprocessor.joblib", ".joblib"]:
+                shutil.copyfile(os.path.join(tmp, "other" + suffix),
+                                os.path.join(tmp, "next" + suffix))
+                os.replace(os.path.join(tmp, "next" + suffix),
+                           os.path.join(tmp, "model" + suffix))
+            throughput, failed = running.result()
+        time.sleep(0.5)
+        reloads = client.health()["reloads"]
+        scores = client.score(texts)
+        expected = list(scorer.stream(Preprocessor.preprocess(
+            texts, phrasers=scorer.preprocessor.phrasers,
+            table=scorer.preprocessor.table)))
+        assert np.allclose(scores, expected, rtol=0, atol=1e-9)
+        print("%.1f docs/s, %d failed requests, %d reload(s), new model \
+served" % (throughput, failed, reloads))
+        assert failed == 0 and reloads >= 1
+        stop(process)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Peak memory benchmark of the streaming prediction mode. A large synthetic
+corpus of scraped articles is built by reshuffling the sentences of the
+full-text fixtures, then scored by Pipeline.confidence (whole corpus at once)
+and Pipeline.stream_confidence (chunks) in fresh processes, which report
+their peak RSS. Both modes must give the same scores.
+
+usage: python3 bench_streaming.py [-m MODEL] [-n ARTICLES] [-c CHUNK_SIZE]
+
+Without a model, a throwaway one is trained on the fixtures.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser, SUPPRESS
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from pipeline import Pipeline
+from load_test import fixture_model, TESTS
+
+def synthetic_corpus(
+    path: str,
+    articles: int,
+    seed: int=0
+) -> None:
+    """Writes a scraped text dataset of articles made of shuffled fixture
+    sentences."""
+    df = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                     ).fillna('')
+    sentences = [sentence for text in df.text for sentence in
+                 text.split(". ")]
+    rng = random.Random(seed)
+    length = len(sentences) // len(df)
+    pd.DataFrame({
+        "id": ["PMC%d" % (1000000 + i) for i in range(articles)],
+        "title": [rng.choice(df.title) for _ in range(articles)],
+        "only_abstract": False,
+        "text": [". ".join(rng.choices(sentences, k=length))
+                 for _ in range(articles)]}).to_csv(path, index=False)
+
+def score(
+    model: str,
+    corpus: str,
+    chunk_size: int,
+    stream: bool,
+    output: str
+) -> None:
+    """Scores the corpus in this process and prints the time and peak RSS."""
+    process = Pipeline(corpus, 0, "http://localhost/Biblio", model,
+                       chunk_size=chunk_size, stream=stream)
+    process.scraper.text_dataset = corpus
+    start = time.perf_counter()
+    if stream:
+        df = process.stream_confidence()
+    else:
+        df = process.confidence()
+    elapsed = time.perf_counter() - start
+    np.save(output, df["%confidence"].to_numpy(dtype=float))
+    print("%.1f\t%.0f" % (elapsed, resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Streaming memory benchmark")
+    parser.add_argument('-m', '--model', type=str, default=None)
+    parser.add_argument('-n', '--articles', type=int, default=1000)
+    parser.add_argument('-c', '--chunk_size', type=int, default=100)
+    parser.add_argument('--score', nargs=3, default=None,
+                        help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.score:
+        model, corpus, mode = args.score
+        score(model, corpus, args.chunk_size, mode == "stream",
+              corpus + "_%s.npy" % (mode))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model or fixture_model(os.path.join(tmp, "model.joblib"))
+        corpus = os.path.join(tmp, "corpus.csv")
+        synthetic_corpus(corpus, args.articles)
+        print("%d articles, %.0f MB of text" % (
+            args.articles, os.path.getsize(corpus) / 1e6))
+        print("mode\ttime (s)\tpeak RSS (MB)")
+        for mode in ["batch", "stream"]:
+            result = subprocess.run(
+                [sys.executable, __file__, "-c", str(args.chunk_size),
+                 "--score", model, corpus, mode],
+                capture_output=True, text=True, check=True)
+            print("%s\t%s" % (mode, result.stdout.strip().split("\n")[-1]))
+        assert np.allclose(np.load(corpus + "_batch.npy"),
+                           np.load(corpus + "_stream.npy"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the cache of preprocessed documents. The fixtures, repeated as
+distinct documents, are preprocessed for training (phrasers fitted, the
+normalized documents are cached) and for prediction with the fitted
+phrasers (the final token lists are cached), twice each, and streamed. Every
+run must give the same output as the preprocessing without cache.
+
+usage: python3 bench_token_cache.py [-c COPIES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+from cache import TokenCache
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                       "CAZyNAR-citations_text.csv")
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Token cache benchmark")
+    parser.add_argument('-c', '--copies', type=int, default=4)
+    args = parser.parse_args()
+
+    df = pd.read_csv(FIXTURE).fillna('')
+    # a trailing short number is dropped by the preprocessing, but changes
+    # the document hash
+    docs = ["%s %s %d" % (title, text, i % 100)
+            for i in range(args.copies) for title, text in zip(df.title,
+                                                               df.text)]
+    reference = Preprocessor(docs)
+    expected = reference.pipeline()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TokenCache(os.path.join(tmp, "tokens.db"))
+        print("run\tdocs/s")
+        for name, phrasers, stream in [
+                ("training, cold", None, False),
+                ("training, warm", None, False),
+                ("prediction, cold", reference.phrasers, False),
+                ("prediction, warm", reference.phrasers, False),
+                ("prediction, stream", reference.phrasers, True)]:
+            preprocessor = Preprocessor(docs, cache=cache)
+            preprocessor.phrasers = phrasers
+            start = time.perf_counter()
+            output = list(preprocessor.stream()) if stream else \
+                preprocessor.pipeline()
+            elapsed = time.perf_counter() - start
+            assert output == expected, name
+            print("%s\t%.1f" % (name, len(docs) / elapsed))
+        print(cache.stats())
+        print("%.1f MB for %.1f MB of text" % (
+            os.path.getsize(cache.path) / 1e6,
+            sum(len(doc) for doc in docs) / 1e6))
+        kept = preprocessor.versions()
+        assert cache.clear(kept) == 0
+        assert cache.clear() == 2 * len(docs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the update of a model with newly annotated articles
+(create_model.py -u), against creating a model on the whole dataset again.
+A model and its feature store are created on most of a training set built
+from the fixtures (already scraped, so that nothing is fetched), then updated
+with the rest of it: only the new articles must be preprocessed and added to
+the store, and the updated model is compared to the previous one on a part
+of them. Both architectures are benchmarked, the hashing_sgd update is only
+trained on the new articles, so it must be faster than creating the model on
+the whole dataset.
+
+usage: python3 bench_update.py [-n ARTICLES] [-a NEW_ARTICLES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from model import Model
+from hashing_model import HashingModel
+from feature_store import FeatureStore
+from bench_architectures import training_set
+
+VAL_SIZE = 0.15
+
+def subset(
+    dataset: str,
+    path: str,
+    rows: slice
+) -> str:
+    """Writes some rows of a training dataset and of its scraped text."""
+    pd.read_csv(dataset)[rows].to_csv(path, index=False)
+    pd.read_csv("%s_text.csv" % (os.path.splitext(dataset)[0]))[rows].to_csv(
+        "%s_text.csv" % (os.path.splitext(path)[0]), index=False)
+    return path
+
+def create(
+    architecture: type,
+    path: str,
+    dataset: str,
+    **options
+) -> tuple:
+    """Creates a model, returns it, its output and the time."""
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        model = architecture.create_model(
+            path, dataset, "http://localhost/Biblio", VAL_SIZE, rate=None,
+            resume=True, **options)
+    return model, output.getvalue(), time.perf_counter() - start
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Model update benchmark")
+    parser.add_argument('-n', '--articles', type=int, default=1500)
+    parser.add_argument('-a', '--new_articles', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = os.path.join(tmp, "classifier_train.csv")
+        training_set(dataset, args.articles)
+        old = subset(dataset, os.path.join(tmp, "old.csv"),
+                     slice(None, args.articles - args.new_articles))
+        new = subset(dataset, os.path.join(tmp, "new.csv"),
+                     slice(args.articles - args.new_articles, None))
+        n_val = math.ceil(VAL_SIZE * args.new_articles)
+
+        print("%d articles, %d new" % (args.articles, args.new_articles))
+        print("model\ttime (s)")
+        for name, architecture in [("tfidf_svm", Model),
+                                   ("hashing_sgd", HashingModel)]:
+            features = os.path.join(tmp, name + "_features")
+            create(architecture, os.path.join(tmp, name + "_old.joblib"),
+                   old, features=features)
+            _, _, full = create(architecture, os.path.join(
+                tmp, name + "_full.joblib"), dataset)
+            print("%s created on the whole dataset\t%.1f" % (name, full))
+            model, output, elapsed = create(
+                architecture, os.path.join(tmp, name + "_updated.joblib"),
+                new, features=features,
+                previous=os.path.join(tmp, name + "_old.joblib"))
+            print("%s updated with the new articles\t%.1f" % (name, elapsed))
+            assert "%d articles added" % (args.new_articles) in output
+            assert len(FeatureStore.load(features)) == args.articles
+            # only new articles are validated on, the hashed model is only
+            # trained on the others
+            assert len(model.y_val) == n_val
+            assert len(model.y_train) == (args.articles if
+                                          architecture.REFIT else
+                                          args.new_articles) - n_val
+            print("validated on %d new articles" % (len(model.y_val)))
+            print(model.compare().to_string(float_format="%.4f"))
+            if not architecture.REFIT:
+                assert elapsed < full, name
+            print()
+
+if __name__ == "__main__":
+    main()
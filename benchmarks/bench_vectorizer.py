@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the handoff from the preprocessing to the TF-IDF vectorizer,
+token lists passed through the vectorizer against the previous joined
+strings re-tokenized by the 'word' analyzer. Both must give the same
+vocabulary and matrix, and a model trained the previous way must give the
+same scores once migrated by the Scorer.
+
+usage: python3 bench_vectorizer.py [-c COPIES]
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from preprocessor import Preprocessor
+from scorer import Scorer
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests",
+                       "CAZyNAR-citations_text.csv")
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Vectorizer handoff benchmark")
+    parser.add_argument('-c', '--copies', type=int, default=4)
+    args = parser.parse_args()
+
+    df = pd.read_csv(FIXTURE).fillna('')
+    docs = Preprocessor.preprocess((df.title + " " + df.text).to_list())
+    docs = docs * args.copies
+    labels = np.arange(len(docs)) % 2
+
+    print("handoff\tfit docs/s\ttransform docs/s")
+    matrices = []
+    for name, vectorizer, prepare in [
+            ("joined strings", TfidfVectorizer(),
+             lambda docs: np.array([" ".join(doc) for doc in docs])),
+            ("token lists",
+             TfidfVectorizer(analyzer=Preprocessor.passthrough),
+             lambda docs: docs)]:
+        start = time.perf_counter()
+        vectorizer.fit(prepare(docs))
+        fit = time.perf_counter() - start
+        start = time.perf_counter()
+        matrices.append((vectorizer.vocabulary_,
+                         vectorizer.transform(prepare(docs))))
+        transform = time.perf_counter() - start
+        print("%s\t%.1f\t%.1f" % (name, len(docs) / fit,
+                                  len(docs) / transform))
+    assert matrices[0][0] == matrices[1][0]
+    assert (matrices[0][1] != matrices[1][1]).nnz == 0
+
+    legacy = SkPipeline([
+        ("tfidf_vectorization", TfidfVectorizer()),
+        ("classifier", CalibratedClassifierCV(LinearSVC(C=10), cv=3))])
+    joined = np.array([" ".join(doc) for doc in docs])
+    legacy.fit(joined, labels)
+    with tempfile.TemporaryDirectory() as tmp:
+        dump(legacy, os.path.join(tmp, "legacy.joblib"))
+        scorer = Scorer(os.path.join(tmp, "legacy.joblib"), docs)
+        assert np.array_equal(scorer.confidence(),
+                              legacy.predict_proba(joined)[:, 1] * 100)
+    print("migrated model: same scores")
+
+if __name__ == "__main__":
+    main()
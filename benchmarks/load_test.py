@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Load test of the whole prediction pipeline, Pipeline.run is launched end to
+end against the offline mock server and the wall time of each stage is
+reported with the p50/p99 latency of the requests it sent.
+
+usage: python3 load_test.py [-m MODEL] [-n IDS] [-w WORKERS] [-l LATENCY]
+                            [-e ERROR_RATE] [-t THROTTLE] [-a]
+
+Without a model, a throwaway one is trained on the scraped fixtures.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from typing import Callable
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from joblib import dump
+from sklearn.pipeline import Pipeline as SkPipeline
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from pipeline import Pipeline
+from preprocessor import Preprocessor
+from mock_server import MockServer
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "tests")
+
+def timed(
+    stages: dict,
+    name: str,
+    function: Callable
+) -> Callable:
+    """Wraps a pipeline step to add its wall time to a stage."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stages[name] = stages.get(name, 0) + time.perf_counter() - start
+    return wrapper
+
+def fixture_model(
+    path: str
+) -> str:
+    """Trains a throwaway model on the scraped fixtures, the articles scored
+    above 50% in the fixtures are the positives."""
+    text = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                       ).fillna('')
+    scores = pd.read_csv(os.path.join(TESTS,
+                                      "CAZyNAR-citations_confidence.csv"))
+    score = dict(zip(scores.id.astype(str), scores["%confidence"]))
+    score.update(zip(scores.pmcid, scores["%confidence"]))
+    preprocessor = Preprocessor((text.title + " " + text.text).to_list())
+    docs = preprocessor.pipeline()
+    preprocessor.save(Preprocessor.artifact(path))
+    architecture = SkPipeline([
+        ("tfidf_vectorization", TfidfVectorizer(
+            analyzer=Preprocessor.passthrough)),
+        ("classifier", CalibratedClassifierCV(LinearSVC(C=10), cv=3))])
+    architecture.fit(docs, np.array([score[str(idi)] > 50 for idi in text.id],
+                                    dtype=int))
+    dump(architecture, path)
+    return path
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="End to end pipeline load test")
+    parser.add_argument('-m', '--model', type=str, default=None)
+    parser.add_argument('-n', '--ids', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('-l', '--latency', type=float, default=0.05)
+    parser.add_argument('-e', '--error_rate', type=float, default=0)
+    parser.add_argument('-t', '--throttle', type=float, default=None)
+    parser.add_argument('-a', '--adaptive', action='store_true')
+    args = parser.parse_args()
+
+    server = MockServer(args.latency, args.error_rate, args.throttle)
+    server.start()
+    ids = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations.csv"),
+                      header=None)[0].astype(str).to_list()
+    ids = (ids + [str(30000000 + i) for i in range(args.ids)])[:args.ids]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model or fixture_model(os.path.join(tmp, "model.joblib"))
+        input_data = os.path.join(tmp, "load.csv")
+        pd.DataFrame(ids).to_csv(input_data, header=False, index=False)
+
+        process = Pipeline(input_data, 0, server.biblio, model,
+                           workers=args.workers, rate=None,
+                           adaptive=args.adaptive)
+        process.client.backoff = 0.1
+        process.converter.address = server.idconv
+        process.converter.limiter.rate = None
+        process.scraper.eutils_address = server.eutils
+        process.scraper.eutils_limiter.rate = None
+
+        stages = {}
+        for name, owner, method in [
+                ("ID conversion", process.converter, "convert"),
+                ("Biblio scraping", process.scraper, "scrape_biblio"),
+                ("abstracts", process.scraper, "fetch_abstracts"),
+                ("preprocessing", process.preprocessor, "pipeline"),
+                ("scoring", process.scorer, "confidence")]:
+            setattr(owner, method, timed(stages, name, getattr(owner,
+                                                               method)))
+        start = time.perf_counter()
+        process.run()
+        total = time.perf_counter() - start
+
+    paths = {MockServer.IDCONV: "ID conversion",
+             MockServer.BIBLIO: "Biblio scraping",
+             MockServer.EFETCH: "abstracts"}
+    print("\nstage\twall (s)\trequests\tp50 (ms)\tp99 (ms)")
+    for name, wall in stages.items():
+        latencies = [latency for path, samples in
+                     process.client.latencies.items()
+                     if paths.get(path) == name for latency in samples]
+        if latencies:
+            print("%s\t%.2f\t%d\t%.1f\t%.1f" % (
+                name, wall, len(latencies),
+                np.percentile(latencies, 50) * 1000,
+                np.percentile(latencies, 99) * 1000))
+        else:
+            print("%s\t%.2f\t-\t-\t-" % (name, wall))
+    print("total\t%.2f" % (total))
+    print("mock server: %d requests, %d errors, %d throttled" % (
+        server.requests, server.errors, server.throttled))
+    server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An offline stand-in for the Biblio package and the NCBI services used by the
+pipeline (fromPMCID.php, the PMC ID Converter API and efetch), seeded from
+the CAZyNAR citations fixtures, with configurable latency, error rate and
+429 throttling. Can be imported by the benchmarks or run on its own:
+
+usage: python3 mock_server.py [-p PORT] [-l LATENCY] [-e ERROR_RATE]
+                              [-t THROTTLE]
+
+then run the pipeline with -b http://127.0.0.1:PORT/Biblio
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from html import escape
+from typing import Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape as xml_escape, quoteattr
+import os
+import random
+import threading
+import time
+import pandas as pd
+
+TESTS = os.path.join(os.path.dirname(__file__), "..", "tests")
+
+ARTICLE = """<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM">\
+<PMID Version="1">%s</PMID><Article PubModel="Print"><Journal><Title>Mock\
+</Title></Journal><ArticleTitle>%s</ArticleTitle><Abstract><AbstractText>%s\
+</AbstractText></Abstract></Article></MedlineCitation></PubmedArticle>"""
+
+class MockServer:
+    """A threaded local HTTP server mimicking Biblio and the NCBI services.
+
+    Known IDs are answered from the fixtures, unknown numeric PMCIDs and PMIDs
+    are answered with a fixture article picked by their number so that any
+    amount of synthetic load can be generated.
+
+    Attributes
+    ----------
+    latency: float
+        The mean latency of a response in seconds.
+
+    error_rate: float
+        The fraction of requests answered with a 500 error.
+
+    throttle: Optional[float]
+        The number of requests per second served before answering 429, None
+        for no throttling.
+
+    address: str
+        The server root address, available once started.
+
+    """
+    BIBLIO = "/Biblio/utils/fromPMCID/fromPMCID.php"
+    IDCONV = "/idconv/"
+    EFETCH = "/eutils/efetch.fcgi"
+
+    def __init__(
+        self: object,
+        latency: float=0,
+        error_rate: float=0,
+        throttle: Optional[float]=None,
+        port: int=0,
+        seed: int=0
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle = throttle
+        self.requests, self.errors, self.throttled = 0, 0, 0
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__tokens, self.__last = throttle or 0, time.monotonic()
+
+        text = pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_text.csv")
+                           ).fillna('')
+        self.articles = {idi: (title, only_abstract, body) for idi, title,
+                         only_abstract, body in zip(text.id, text.title,
+                                                    text.only_abstract,
+                                                    text.text)}
+        self.pool = list(self.articles.values())
+        ids = pd.merge(
+            pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_PMCID.csv"),
+                        dtype=str),
+            pd.read_csv(os.path.join(TESTS, "CAZyNAR-citations_DOI.csv"),
+                        dtype=str), on="id")
+        self.records, self.pmcid_of = {}, {}
+        for pmid, pmcid, doi in zip(ids.id, ids.PMCID, ids.DOI):
+            record = {"pmid": pmid}
+            if pmcid != "not_found":
+                record["pmcid"] = pmcid
+                self.pmcid_of[pmid] = pmcid
+            if doi != "not_found":
+                record["doi"] = doi
+            if len(record) > 1:
+                for idi in record.values():
+                    self.records[idi.lower()] = record
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port),
+                                          self.handler())
+        self.server.daemon_threads = True
+        self.address = "http://127.0.0.1:%d" % (self.server.server_address[1])
+
+    @property
+    def biblio(
+        self: object
+    ) -> str:
+        """The Biblio package address to give to the pipeline."""
+        return self.address + "/Biblio"
+
+    @property
+    def idconv(
+        self: object
+    ) -> str:
+        """The ID Converter API address to give to IdConverter."""
+        return self.address + MockServer.IDCONV
+
+    @property
+    def eutils(
+        self: object
+    ) -> str:
+        """The E-utilities address to give to Scraper."""
+        return self.address + "/eutils"
+
+    def article(
+        self: object,
+        idi: str
+    ) -> Tuple[str, bool, str]:
+        """The (title, only_abstract, text) served for a PMCID or PMID."""
+        idi = self.pmcid_of.get(idi, idi)
+        if idi in self.articles:
+            return self.articles[idi]
+        return self.pool[int(idi.replace("PMC", "")) % len(self.pool)]
+
+    def start(
+        self: object
+    ) -> str:
+        """Starts serving in a background thread and returns the address."""
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.address
+
+    def stop(
+        self: object
+    ) -> None:
+        """Stops the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def admit(
+        self: object
+    ) -> int:
+        """Decides the fate of a request, sleeps the artificial latency.
+
+        Returns
+        -------
+        int
+            200 to serve it, 429 when throttled, 500 for an injected error.
+
+        """
+        with self.__lock:
+            self.requests += 1
+            if self.throttle:
+                now = time.monotonic()
+                self.__tokens = min(self.throttle, self.__tokens +
+                                    (now - self.__last) * self.throttle)
+                self.__last = now
+                if self.__tokens < 1:
+                    self.throttled += 1
+                    return 429
+                self.__tokens -= 1
+            failed = self.__random.random() < self.error_rate
+            delay = self.latency * self.__random.uniform(0.5, 1.5)
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        return 500 if failed else 200
+
+    def biblio_page(
+        self: object,
+        query: dict
+    ) -> Tuple[str, str]:
+        pmcid = "PMC" + query.get("PMCID", [""])[0]
+        title, only_abstract, text = self.article(pmcid)
+        sections = "<h2>Abstract</h2><p>%s</p>" % (escape(text[:1500]))
+        if not only_abstract:
+            sections += "<h2>Introduction</h2><p>%s</p>" % (
+                escape(text[1500:]))
+        return "text/html; charset=utf-8", "<html><body><h1>%s</h1>%s\
+</body></html>" % (escape(title), sections)
+
+    def idconv_page(
+        self: object,
+        query: dict
+    ) -> Tuple[str, str]:
+        body = "<pmcids status=\"ok\">"
+        for idi in query["ids"][0].split(","):
+            if record := self.records.get(idi.lower()):
+                body += "<record requested-id=%s %s/>" % (quoteattr(idi),
+                    " ".join("%s=%s" % (key, quoteattr(value))
+                             for key, value in record.items()))
+            else:
+                body += "<record requested-id=%s status=\"error\" \
+errmsg=\"invalid article id\"/>" % (quoteattr(idi))
+        return "application/xml", body + "</pmcids>"
+
+    def efetch_page(
+        self: object,
+        query: dict
+    ) -> Tuple[str, str]:
+        articles = []
+        for pmid in query["id"][0].split(","):
+            title, _, text = self.article(pmid)
+            articles.append(ARTICLE % (pmid, xml_escape(title),
+                                       xml_escape(text[:1500])))
+        return "text/xml; charset=utf-8", "<PubmedArticleSet>%s\
+</PubmedArticleSet>" % ("".join(articles))
+
+    def handler(
+        self: object
+    ) -> type:
+        """Builds the request handler class bound to this server."""
+        mock = self
+        routes = {MockServer.BIBLIO: self.biblio_page,
+                  MockServer.IDCONV: self.idconv_page,
+                  MockServer.EFETCH: self.efetch_page}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def reply(self, query):
+                path = urlparse(self.path).path
+                if path not in routes:
+                    return self.send(404, "text/plain", "not found")
+                status = mock.admit()
+                if status != 200:
+                    return self.send(status, "text/plain", "mock error")
+                self.send(200, *routes[path](query))
+
+            def send(self, status, content_type, body):
+                body = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.reply(parse_qs(urlparse(self.path).query))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.reply(parse_qs(self.rfile.read(length).decode("utf-8")))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+def main(
+) -> None:
+
+    parser = ArgumentParser(description="Offline Biblio and NCBI stand-in")
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('-l', '--latency', type=float, default=0.05)
+    parser.add_argument('-e', '--error_rate', type=float, default=0)
+    parser.add_argument('-t', '--throttle', type=float, default=None)
+    args = parser.parse_args()
+
+    server = MockServer(args.latency, args.error_rate, args.throttle,
+                        args.port)
+    print("Biblio: %s\nID converter: %s\nE-utilities: %s" % (
+        server.biblio, server.idconv, server.eutils))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A Batcher class, which keeps a model warm and scores the documents of
+concurrent requests together.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional, List, Dict, Tuple
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+from scorer import Scorer
+from cache import TokenCache
+from preprocessor import Preprocessor
+
+class Batcher:
+    """Scores raw documents with a model loaded once: the documents of the
+    requests received within a short delay are preprocessed and scored
+    together by a single thread, in one predict_proba call. The model is
+    reloaded when its files change, the batch being scored keeps the model
+    it started with, so no request is dropped by a reload.
+
+    Attributes
+    ----------
+    model : str
+        The model path, a trained or a compiled model.
+
+    scorer : cazy_little_helper.scorer.Scorer
+        The scorer of the loaded model, with its preprocessor.
+
+    max_batch : int
+        The maximum number of documents scored at once, larger requests are
+        split.
+
+    max_delay : float
+        The time in seconds a batch waits for other requests.
+
+    interval : Optional[float]
+        The time in seconds between two checks of the model files, None to
+        only reload on demand.
+
+    """
+    def __init__(
+        self: object,
+        model: str,
+        token_cache: Optional[str]=None,
+        max_batch: int=100,
+        max_delay: float=0.01,
+        interval: Optional[float]=2.0
+    ) -> None:
+        """Class constructor, loads the model.
+
+        Parameters
+        ----------
+        model : str
+            The model path.
+        token_cache : Optional[str], optional
+            The path of an on-disk cache of preprocessed documents. The
+            default is None (no cache).
+        max_batch : int, optional
+            Maximum documents scored at once. The default is 100.
+        max_delay : float, optional
+            Seconds a batch waits for other requests. The default is 0.01.
+        interval : Optional[float], optional
+            Seconds between two checks of the model files, None to only
+            reload on demand. The default is 2.0.
+
+        Raises
+        ------
+        Exception
+            If no phrasers were saved with the model.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.interval = interval
+        self.__token_cache = token_cache
+        self.__lock = threading.Lock()
+        self.__queue = queue.Queue()
+        self.__stop = threading.Event()
+        self.__counts = {"requests": 0, "batches": 0, "documents": 0,
+                         "reloads": 0}
+        self.loaded = self.__signature()
+        self.scorer = self.__load()
+        self.__threads = [threading.Thread(target=self.__run, daemon=True)]
+        if interval:
+            self.__threads.append(threading.Thread(target=self.__watch,
+                                                   daemon=True))
+        for thread in self.__threads:
+            thread.start()
+
+    def __signature(
+        self: object
+    ) -> Tuple:
+        """The modification times and sizes of the model files."""
+        paths = [self.model, Preprocessor.artifact(self.model)]
+        if os.path.isdir(self.model):
+            paths = [os.path.join(self.model, f) for f in sorted(
+                os.listdir(self.model))]
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                     for path in paths if os.path.exists(path))
+
+    def __load(
+        self: object
+    ) -> Scorer:
+        """Loads the model and its preprocessor."""
+        scorer = Scorer(self.model)
+        if scorer.preprocessor.phrasers is None:
+            raise Exception("No phrasers were saved with %s, the model must \
+be created again to be served" % (self.model))
+        scorer.preprocessor.cache = TokenCache(self.__token_cache) if \
+            self.__token_cache else None
+        return scorer
+
+    def reload(
+        self: object,
+        force: bool=False
+    ) -> bool:
+        """Loads the model again if its files changed, the new model is used
+        by the next batches.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Reload even if the files did not change. The default is False.
+
+        Returns
+        -------
+        bool
+            Whether the model was reloaded.
+
+        """
+        signature = self.__signature()
+        if signature == self.loaded and not force:
+            return False
+        scorer = self.__load()
+        with self.__lock:
+            self.scorer, self.loaded = scorer, signature
+            self.__counts["reloads"] += 1
+        print("%s was reloaded" % (self.model))
+        return True
+
+    def __watch(
+        self: object
+    ) -> None:
+        """Checks the model files every interval, a model that can't be
+        loaded (being written for instance) is tried again."""
+        while not self.__stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as error:
+                print("%s could not be reloaded: %s" % (self.model, error))
+
+    def __run(
+        self: object
+    ) -> None:
+        """Gathers the pending requests into batches and scores them."""
+        while True:
+            batch = [self.__queue.get()]
+            if batch[0] is None:
+                return
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_delay
+            while size < self.max_batch:
+                try:
+                    request = self.__queue.get(
+                        timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.__queue.put(None)
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            with self.__lock:
+                scorer = self.scorer
+                self.__counts["batches"] += 1
+                self.__counts["documents"] += size
+            try:
+                texts = [text for texts, _ in batch for text in texts]
+                scores = list(scorer.stream(scorer.preprocessor.stream(texts),
+                                            max(size, 1)))
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+                continue
+            start = 0
+            for texts, future in batch:
+                future.set_result(scores[start:start + len(texts)])
+                start += len(texts)
+
+    def score(
+        self: object,
+        texts: List[str]
+    ) -> List[float]:
+        """Scores raw documents (title and text), waits for the batches they
+        are part of.
+
+        Parameters
+        ----------
+        texts : List[str]
+            The documents.
+
+        Returns
+        -------
+        List[float]
+            The confidence scores, in order.
+
+        """
+        with self.__lock:
+            self.__counts["requests"] += 1
+        futures = []
+        for start in range(0, len(texts), self.max_batch):
+            futures.append(Future())
+            self.__queue.put((texts[start:start + self.max_batch],
+                              futures[-1]))
+        return [score for future in futures for score in future.result()]
+
+    def stats(
+        self: object
+    ) -> Dict:
+        """The model served and the number of requests, batches, documents
+        and reloads."""
+        with self.__lock:
+            return dict(self.__counts, model=self.model,
+                        loaded=max([mtime for _, mtime, _ in self.loaded],
+                                   default=0) / 1e9)
+
+    def close(
+        self: object
+    ) -> None:
+        """Stops the threads once the pending requests are scored."""
+        self.__stop.set()
+        self.__queue.put(None)
+        for thread in self.__threads:
+            thread.join()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An ArticleCache class to keep scraped articles on disk between runs, and a
+TokenCache class to keep preprocessed documents.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+
+class ArticleCache:
+    """An on-disk SQLite cache of scraped articles, keyed by their PMCID or
+    PMID, shared by the prediction and the training pipelines.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite database file.
+
+    ttl: Optional[float]
+        The time to live of a cached article in seconds, None to keep
+        articles forever.
+
+    max_entries: Optional[int]
+        The maximum number of cached articles, the least recently used ones
+        are evicted first, None for no limit.
+
+    hits: int
+        The number of articles found in the cache.
+
+    misses: int
+        The number of articles missing from the cache.
+
+    """
+    def __init__(
+        self: object,
+        path: str,
+        ttl: Optional[float]=None,
+        max_entries: Optional[int]=None
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        path : str
+            The SQLite database path, created if it does not exist.
+        ttl : Optional[float], optional
+            Time to live of an article in seconds. The default is None.
+        max_entries : Optional[int], optional
+            Maximum number of articles kept. The default is None.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits, self.misses = 0, 0
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS articles (id TEXT PRIMARY KEY, "
+                "title TEXT, only_abstract INTEGER, text TEXT, "
+                "stored_at REAL, accessed_at REAL)")
+            self.__db.execute(
+                "CREATE INDEX IF NOT EXISTS articles_accessed "
+                "ON articles (accessed_at)")
+
+    def get(
+        self: object,
+        idi: str
+    ) -> Optional[List[object]]:
+        """Looks up an article in the cache.
+
+        Parameters
+        ----------
+        idi : str
+            The PMCID or PMID of the article.
+
+        Returns
+        -------
+        Optional[List[object]]
+            The article csv row [id, title, only_abstract, text], None if it
+            is not cached or expired.
+
+        """
+        now = time.time()
+        with self.__lock, self.__db:
+            row = self.__db.execute(
+                "SELECT title, only_abstract, text, stored_at FROM articles "
+                "WHERE id = ?", (str(idi),)).fetchone()
+            if row and self.ttl is not None and now - row[3] > self.ttl:
+                self.__db.execute("DELETE FROM articles WHERE id = ?",
+                                  (str(idi),))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.__db.execute("UPDATE articles SET accessed_at = ? "
+                              "WHERE id = ?", (now, str(idi)))
+            self.hits += 1
+        return [idi, row[0], bool(row[1]), row[2]]
+
+    def put(
+        self: object,
+        row: List[object]
+    ) -> None:
+        """Stores a scraped article in the cache.
+
+        Parameters
+        ----------
+        row : List[object]
+            The article csv row [id, title, only_abstract, text].
+
+        Returns
+        -------
+        None
+
+        """
+        idi, title, only_abstract, text = row
+        now = time.time()
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                (str(idi), title, int(bool(only_abstract)), text, now, now))
+        if self.max_entries is not None:
+            self.evict()
+
+    def evict(
+        self: object
+    ) -> None:
+        """Removes expired articles, then the least recently used ones if
+        the cache holds more than max_entries articles.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.__lock, self.__db:
+            if self.ttl is not None:
+                self.__db.execute("DELETE FROM articles WHERE stored_at < ?",
+                                  (time.time() - self.ttl,))
+            if self.max_entries is not None:
+                self.__db.execute(
+                    "DELETE FROM articles WHERE id IN (SELECT id FROM "
+                    "articles ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,))
+
+    def stats(
+        self: object
+    ) -> str:
+        """Summarizes the cache usage.
+
+        Returns
+        -------
+        str
+            The hit and miss counters.
+
+        """
+        return "article cache %s: %d hits, %d misses" % (
+            self.path, self.hits, self.misses)
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the connection to the cache database.
+
+        Returns
+        -------
+        None
+
+        """
+        self.__db.close()
+
+
+class TokenCache:
+    """An on-disk SQLite cache of preprocessed documents, keyed by a hash of
+    their text and of the version of the preprocessing that produced them
+    (with the fingerprint of the phrasers for the final token lists). The
+    token lists are stored zlib-compressed.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite database file.
+
+    hits: int
+        The number of documents found in the cache.
+
+    misses: int
+        The number of documents missing from the cache.
+
+    """
+    BATCH = 500
+
+    def __init__(
+        self: object,
+        path: str
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        path : str
+            The SQLite database path, created if it does not exist.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.path = path
+        self.hits, self.misses = 0, 0
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS documents (key BLOB PRIMARY KEY, "
+                "version TEXT, tokens BLOB, stored_at REAL)")
+
+    @staticmethod
+    def key(
+        text: str,
+        version: str
+    ) -> bytes:
+        """The cache key of a document.
+
+        Parameters
+        ----------
+        text : str
+            The document text.
+        version : str
+            The version of the preprocessing.
+
+        Returns
+        -------
+        bytes
+            The SHA-1 digest of the version and the text.
+
+        """
+        return hashlib.sha1(("%s\n%s" % (version, text)).encode()).digest()
+
+    def get_many(
+        self: object,
+        keys: List[bytes]
+    ) -> Dict[bytes, List[str]]:
+        """Looks up documents in the cache.
+
+        Parameters
+        ----------
+        keys : List[bytes]
+            The document keys.
+
+        Returns
+        -------
+        Dict[bytes, List[str]]
+            The token lists of the cached documents, by key.
+
+        """
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        with self.__lock:
+            for i in range(0, len(keys), TokenCache.BATCH):
+                batch = keys[i:i + TokenCache.BATCH]
+                for key, tokens in self.__db.execute(
+                        "SELECT key, tokens FROM documents WHERE key IN "
+                        "(%s)" % (",".join("?" * len(batch))), batch):
+                    text = zlib.decompress(tokens).decode()
+                    found[key] = text.split(" ") if text else []
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(
+        self: object,
+        docs: Iterable[Tuple[bytes, List[str]]],
+        version: str
+    ) -> None:
+        """Stores preprocessed documents in the cache.
+
+        Parameters
+        ----------
+        docs : Iterable[Tuple[bytes, List[str]]]
+            The (key, token list) of the documents.
+        version : str
+            The version of the preprocessing.
+
+        Returns
+        -------
+        None
+
+        """
+        now = time.time()
+        with self.__lock, self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+                ((key, version, zlib.compress(" ".join(tokens).encode()), now)
+                 for key, tokens in docs))
+
+    def clear(
+        self: object,
+        keep: Optional[List[str]]=None,
+        older_than: Optional[float]=None
+    ) -> int:
+        """Invalidates cached documents and reclaims their space.
+
+        Parameters
+        ----------
+        keep : Optional[List[str]], optional
+            Versions to keep, the others are removed. The default is None
+            (all versions are removed).
+        older_than : Optional[float], optional
+            Only remove the documents stored more than this many seconds
+            ago. The default is None.
+
+        Returns
+        -------
+        int
+            The number of removed documents.
+
+        """
+        query, args = "DELETE FROM documents WHERE 1", []
+        if keep:
+            query += " AND version NOT IN (%s)" % (",".join("?" * len(keep)))
+            args += keep
+        if older_than is not None:
+            query += " AND stored_at < ?"
+            args.append(time.time() - older_than)
+        with self.__lock:
+            with self.__db:
+                removed = self.__db.execute(query, args).rowcount
+            self.__db.execute("VACUUM")
+        return removed
+
+    def stats(
+        self: object
+    ) -> str:
+        """Summarizes the cache usage.
+
+        Returns
+        -------
+        str
+            The hit and miss counters.
+
+        """
+        return "token cache %s: %d hits, %d misses" % (
+            self.path, self.hits, self.misses)
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the connection to the cache database.
+
+        Returns
+        -------
+        None
+
+        """
+        self.__db.close()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A CLI entry point for the PyPI package, for invalidating the cache of
+preprocessed documents.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+from parsers import Parser
+from cache import TokenCache
+from preprocessor import Preprocessor
+
+def launch_clear(
+    token_cache: str,
+    model: Optional[str],
+    days: Optional[float]
+) -> int:
+
+    keep = None
+    if model:
+        preprocessor = Preprocessor()
+        preprocessor.load(Preprocessor.artifact(model))
+        keep = preprocessor.versions()
+    return TokenCache(token_cache).clear(
+        keep, days * 86400 if days is not None else None)
+
+def main(
+) -> None:
+
+    parser = Parser.clear_cache()
+    args = parser.parse_args()
+    args = args.__dict__
+    removed = launch_clear(args["token_cache"], args["model"], args["days"])
+    print("%d documents were removed from %s"%(removed, args["token_cache"]))
+
+if __name__ == "__main__":
+    main()
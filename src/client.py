@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An HttpClient class shared by every network access of the package.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from controller import AdaptiveLimiter
+
+class HttpClient:
+    """A pooled HTTP client with connect/read timeouts and exponential
+    backoff, requests are retried on connection errors, timeouts, 429 and
+    5xx responses.
+
+    Attributes
+    ----------
+    session: requests.Session
+        The session holding the keep-alive connection pools.
+
+    timeout: tuple
+        The (connect, read) timeouts in seconds.
+
+    retries: int
+        The maximum number of retries of a request.
+
+    backoff: float
+        The first backoff delay in seconds, doubled at each retry.
+
+    max_backoff: float
+        The longest backoff delay in seconds.
+
+    requests: int
+        The number of requests sent, retries included.
+
+    retried: int
+        The number of retried requests.
+
+    latencies: dict
+        A uniform sample of the latencies in seconds of the attempts, at most
+        SAMPLES by URL path.
+
+    """
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    SAMPLES = 1000
+
+    def __init__(
+        self: object,
+        pool_size: int=10,
+        connect_timeout: float=10,
+        read_timeout: float=120,
+        retries: int=5,
+        backoff: float=1,
+        max_backoff: float=60
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            Connections kept alive per host. The default is 10.
+        connect_timeout : float, optional
+            Connection timeout in seconds. The default is 10.
+        read_timeout : float, optional
+            Read timeout in seconds. The default is 120.
+        retries : int, optional
+            Maximum number of retries. The default is 5.
+        backoff : float, optional
+            First backoff delay in seconds. The default is 1.
+        max_backoff : float, optional
+            Longest backoff delay in seconds. The default is 60.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.requests, self.retried = 0, 0
+        self.latencies = {}
+        self.__attempts = {}
+        self.__lock = threading.Lock()
+
+    def delay(
+        self: object,
+        attempt: int,
+        response: requests.Response=None
+    ) -> float:
+        """The backoff delay before the next attempt, the Retry-After header
+        of a 429 response is honoured when present.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of the failed attempt, starting at 0.
+        response : requests.Response, optional
+            The failed response. The default is None.
+
+        Returns
+        -------
+        float
+            The delay in seconds.
+
+        """
+        if response is not None and (after := response.headers.get(
+                "Retry-After", "")).isdigit():
+            return min(float(after), self.max_backoff)
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * \
+            random.uniform(0.5, 1)
+
+    def request(
+        self: object,
+        method: str,
+        url: str,
+        **kwargs: object
+    ) -> requests.Response:
+        """Sends a request, retrying it with an exponential backoff.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method.
+        url : str
+            The request URL.
+        **kwargs : object
+            Other requests arguments (params, data...), an optional
+            'limiter', a RateLimiter that every attempt takes a token and an
+            in-flight slot from, the slot being given back before the backoff
+            delay, and an optional 'controller', an AdaptiveLimiter that every
+            attempt has to go through and that is told about its outcome.
+
+        Raises
+        ------
+        requests.RequestException
+            When the last attempt failed to connect or timed out.
+
+        Returns
+        -------
+        requests.Response
+            The response, which may still be an error after the last retry.
+
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = kwargs.pop("limiter", None)
+        controller = kwargs.pop("controller", None)
+        for attempt in range(self.retries + 1):
+            response = None
+            if limiter:
+                limiter.acquire()
+            try:
+                with self.__lock:
+                    self.requests += 1
+                slot = controller.acquire() if controller else None
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                    self.__record(url, start, controller, slot,
+                                  response.status_code in
+                                  HttpClient.RETRY_STATUS)
+                    if response.status_code not in HttpClient.RETRY_STATUS \
+                        or attempt == self.retries:
+                        return response
+                except (requests.ConnectionError, requests.Timeout):
+                    self.__record(url, start, controller, slot, True)
+                    if attempt == self.retries:
+                        raise
+                except Exception:
+                    self.__record(url, start, controller, slot, False)
+                    raise
+            finally:
+                if limiter:
+                    limiter.release()
+            with self.__lock:
+                self.retried += 1
+            time.sleep(self.delay(attempt, response))
+        return response
+
+    def __record(
+        self: object,
+        url: str,
+        start: float,
+        controller: Optional[AdaptiveLimiter],
+        slot: Optional[float],
+        failed: bool
+    ) -> None:
+        elapsed = time.perf_counter() - start
+        path = urlparse(url).path
+        with self.__lock:
+            # reservoir sampling, the sample stays uniform and bounded
+            seen = self.__attempts[path] = self.__attempts.get(path, 0) + 1
+            samples = self.latencies.setdefault(path, [])
+            if len(samples) < HttpClient.SAMPLES:
+                samples.append(elapsed)
+            elif (kept := random.randrange(seen)) < HttpClient.SAMPLES:
+                samples[kept] = elapsed
+        if controller:
+            controller.release(slot, elapsed, failed)
+
+    def get(
+        self: object,
+        url: str,
+        **kwargs: object
+    ) -> requests.Response:
+        """Sends a GET request, see request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(
+        self: object,
+        url: str,
+        **kwargs: object
+    ) -> requests.Response:
+        """Sends a POST request, see request."""
+        return self.request("POST", url, **kwargs)
+
+    def connections(
+        self: object
+    ) -> int:
+        """The number of connections opened by the session's pools.
+
+        Returns
+        -------
+        int
+
+        """
+        opened = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            opened += sum(pools[key].num_connections for key in pools.keys())
+        return opened
+
+    def stats(
+        self: object
+    ) -> str:
+        """Summarizes the client usage.
+
+        Returns
+        -------
+        str
+            The request, retry and connection reuse counters.
+
+        """
+        opened = self.connections()
+        return "HTTP client: %d requests, %d retried, %d connections opened, \
+%d reused" % (self.requests, self.retried, opened,
+              max(self.requests - opened, 0))
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the connections of the session's pools.
+
+        Returns
+        -------
+        None
+
+        """
+        self.session.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A CLI entry point for the PyPI package, for compacting a model: pruning the
+vocabulary and quantizing the weights of the compiled model, and comparing it
+with the original.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional, List, Dict
+import os
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, roc_auc_score
+from parsers import Parser
+from preprocessor import Preprocessor
+from linear_scorer import LinearScorer
+from scorer import Scorer
+
+def size(
+    path: str
+) -> int:
+    """The size of a model on disk in bytes, with its preprocessor."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f))
+                   for f in os.listdir(path))
+    artifact = Preprocessor.artifact(path)
+    return os.path.getsize(path) + (os.path.getsize(artifact) if
+                                    os.path.exists(artifact) else 0)
+
+def evaluate(
+    model: str,
+    docs: Optional[List[List[str]]]
+) -> Dict:
+    """Loads a model (the best of three loads) and scores the documents,
+    returns its size, load time, throughput and scores."""
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        scorer = Scorer(model)
+        times.append(time.perf_counter() - start)
+    report = {"size (MB)": size(model) / 1e6, "load (ms)": min(times) * 1000}
+    vocabulary = getattr(scorer.model, "vocabulary", None)
+    if hasattr(scorer.model, "steps"):
+        vocabulary = getattr(scorer.model.steps[0][1], "vocabulary_", None)
+    report["terms"] = len(vocabulary) if vocabulary is not None else np.nan
+    if docs:
+        start = time.perf_counter()
+        report["scores"] = np.fromiter(scorer.stream(docs), dtype=np.float64)
+        report["docs/s"] = len(docs) / (time.perf_counter() - start)
+    return report
+
+def launch_compact(
+    model: str,
+    output_path: Optional[str],
+    min_weight: float,
+    min_df: float,
+    precision: str,
+    native: bool,
+    dataset: Optional[str]
+) -> pd.DataFrame:
+
+    if not output_path:
+        output_path = "%s_compact%s" % (os.path.splitext(model)[0],
+                                        "" if native else ".joblib")
+    compiled = LinearScorer.load(model)
+    if not isinstance(compiled, LinearScorer):
+        compiled = LinearScorer.compile(compiled)
+    compiled.compact(min_weight, min_df, precision).save(output_path, native)
+    preprocessor = Preprocessor()
+    if preprocessor.load(Preprocessor.artifact(model)):
+        preprocessor.save(Preprocessor.artifact(output_path))
+    print("The compacted model was saved to %s" % (output_path))
+
+    docs, labels = None, None
+    if dataset:
+        df = pd.read_csv(dataset)
+        text = pd.read_csv("%s_text.csv" % (os.path.splitext(dataset)[0])
+                           ).fillna('')
+        df = pd.merge(df, text, on="id")
+        print("Preprocessing %d documents..." % (len(df)))
+        docs = Preprocessor.preprocess((df.title + " " + df.text).to_list(),
+                                       table=preprocessor.table,
+                                       phrasers=preprocessor.phrasers)
+        labels = df.label.values if "label" in df else None
+
+    reports = {"original": evaluate(model, docs),
+               "compacted": evaluate(output_path, docs)}
+    rows = ["size (MB)", "load (ms)", "terms"]
+    if docs:
+        rows.append("docs/s")
+        if labels is not None and len(set(labels)) == 2:
+            for report in reports.values():
+                report["average precision"] = average_precision_score(
+                    labels, report["scores"])
+                report["ROC-AUC"] = roc_auc_score(labels, report["scores"])
+            rows += ["average precision", "ROC-AUC"]
+    comparison = pd.DataFrame({name: [report[row] for row in rows]
+                               for name, report in reports.items()},
+                              index=rows)
+    comparison["delta"] = comparison.compacted - comparison.original
+    if docs:
+        delta = np.abs(reports["compacted"]["scores"] -
+                       reports["original"]["scores"])
+        comparison.loc["max |score delta|"] = [np.nan, np.nan, delta.max()]
+        comparison.loc["mean |score delta|"] = [np.nan, np.nan, delta.mean()]
+    return comparison
+
+def main(
+) -> None:
+
+    parser = Parser.compact_model()
+    args = parser.parse_args()
+    args = args.__dict__
+    comparison = launch_compact(args["model"], args["output_path"],
+                                args["min_weight"], args["min_df"],
+                                args["precision"], args["native"],
+                                args["dataset"])
+    print(comparison.to_string(float_format="%.4f", na_rep=""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A CLI entry point for the PyPI package, for compiling a trained model into a
+compact linear scorer, or converting a compiled model to the native format.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+import os
+from parsers import Parser
+from preprocessor import Preprocessor
+from linear_scorer import LinearScorer
+
+def launch_compile(
+    model: str,
+    output_path: Optional[str],
+    native: bool
+) -> str:
+
+    if not output_path:
+        output_path = "%s_compiled%s" % (os.path.splitext(model)[0],
+                                         "" if native else ".joblib")
+    compiled = LinearScorer.load(model)
+    if not isinstance(compiled, LinearScorer):
+        compiled = LinearScorer.compile(compiled)
+    compiled.save(output_path, native)
+    preprocessor = Preprocessor()
+    if preprocessor.load(Preprocessor.artifact(model)):
+        preprocessor.save(Preprocessor.artifact(output_path))
+    return output_path
+
+def main(
+) -> None:
+
+    parser = Parser.compile_model()
+    args = parser.parse_args()
+    args = args.__dict__
+    output_path = launch_compile(args["model"], args["output_path"],
+                                 args["native"])
+    print("The compiled model was saved to %s"%(output_path))
+
+if __name__ == "__main__":
+    main()
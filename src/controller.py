@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An AdaptiveLimiter class to find how many requests an upstream service can
+take at the same time.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+from collections import deque
+import threading
+import time
+
+class AdaptiveLimiter:
+    """An AIMD (additive increase, multiplicative decrease) concurrency
+    limiter. The limit of requests in flight grows by about one per round
+    trip while latency and errors stay healthy, and is cut by a factor when
+    a 429, a 5xx, a connection error or a latency spike is seen.
+
+    Attributes
+    ----------
+    name: str
+        The name of the upstream service, for the stats.
+
+    limit: float
+        The current limit of requests in flight.
+
+    min_limit: int
+        The lowest limit.
+
+    max_limit: int
+        The highest limit (usually the number of worker threads).
+
+    decrease: float
+        The factor applied to the limit on congestion.
+
+    tolerance: float
+        How many times the baseline latency is still considered healthy.
+
+    target_latency: Optional[float]
+        A fixed healthy latency in seconds, None to learn the baseline from
+        the fastest smoothed latency seen.
+
+    in_flight: int
+        The number of requests in flight.
+
+    """
+    def __init__(
+        self: object,
+        name: str,
+        max_limit: int,
+        min_limit: int=1,
+        initial_limit: int=1,
+        decrease: float=0.5,
+        tolerance: float=2,
+        target_latency: Optional[float]=None,
+        window: float=10
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        name : str
+            The name of the upstream service.
+        max_limit : int
+            The highest limit of requests in flight.
+        min_limit : int, optional
+            The lowest limit. The default is 1.
+        initial_limit : int, optional
+            The starting limit. The default is 1.
+        decrease : float, optional
+            The multiplicative decrease factor. The default is 0.5.
+        tolerance : float, optional
+            Healthy latency / baseline latency ratio. The default is 2.
+        target_latency : Optional[float], optional
+            A fixed healthy latency in seconds. The default is None.
+        window : float, optional
+            The throughput window in seconds. The default is 10.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.target_latency = target_latency
+        self.window = window
+        self.in_flight = 0
+        self.__smoothed, self.__baseline = None, None
+        self.__last_decrease = 0.0
+        self.__completed = deque()
+        self.__condition = threading.Condition()
+
+    def acquire(
+        self: object
+    ) -> float:
+        """Waits until a request can be sent under the current limit.
+
+        Returns
+        -------
+        float
+            The start time of the request, to give back to release.
+
+        """
+        with self.__condition:
+            while self.in_flight >= int(self.limit):
+                self.__condition.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(
+        self: object,
+        start: float,
+        latency: float,
+        failed: bool
+    ) -> None:
+        """Reports the outcome of a request and adapts the limit.
+
+        Parameters
+        ----------
+        start : float
+            The start time given by acquire.
+        latency : float
+            The latency of the request in seconds.
+        failed : bool
+            Whether the upstream was congested (429, 5xx, connection error).
+
+        Returns
+        -------
+        None
+
+        """
+        with self.__condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            self.__completed.append(now)
+            self.__prune(now)
+            self.__smoothed = latency if self.__smoothed is None else \
+                0.8 * self.__smoothed + 0.2 * latency
+            if self.target_latency is None:
+                self.__baseline = self.__smoothed if self.__baseline is None \
+                    else min(self.__baseline * 1.001, self.__smoothed)
+            healthy = self.target_latency or self.__baseline
+            if failed or self.__smoothed > self.tolerance * healthy:
+                # requests sent before the last decrease saw the old limit
+                if start > self.__last_decrease:
+                    self.limit = max(float(self.min_limit),
+                                     self.limit * self.decrease)
+                    self.__last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit),
+                                 self.limit + 1 / self.limit)
+            self.__condition.notify_all()
+
+    def throughput(
+        self: object
+    ) -> float:
+        """The number of requests completed per second over the window.
+
+        Returns
+        -------
+        float
+
+        """
+        with self.__condition:
+            self.__prune(time.monotonic())
+            return len(self.__completed) / self.window
+
+    def __prune(
+        self: object,
+        now: float
+    ) -> None:
+        """Drops the completion times older than the window, the lock has to
+        be held."""
+        while self.__completed and self.__completed[0] < now - self.window:
+            self.__completed.popleft()
+
+    def stats(
+        self: object
+    ) -> str:
+        """Summarizes the state of the limiter.
+
+        Returns
+        -------
+        str
+            The current limit, requests in flight and throughput.
+
+        """
+        return "%s: limit %.1f, %d in flight, %.2f requests/s" % (
+            self.name, self.limit, self.in_flight, self.throughput())
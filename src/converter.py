@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An IdConverter class to convert article IDs in bulk.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+import requests
+from limiter import RateLimiter
+from idindex import IdIndex
+from client import HttpClient
+from controller import AdaptiveLimiter
+
+IDCONV = "https://www.ncbi.nlm.nih.gov/pmc/utils/idconv/v1.0/"
+
+class IdConverter:
+    """A bulk article ID converter (PMID, PMCID and DOI) that uses the PMC ID
+    Converter API, IDs are sent by chunks and the chunks are requested
+    concurrently.
+
+    Attributes
+    ----------
+    address: str
+        The ID Converter API address.
+
+    chunk_size: int
+        The number of IDs converted with a single request (200 at most).
+
+    workers: int
+        The number of chunks requested at the same time.
+
+    limiter: cazy_little_helper.limiter.RateLimiter
+        The rate limiter of the API requests.
+
+    index: Optional[cazy_little_helper.idindex.IdIndex]
+        A local mapping index looked up before the network, only the IDs
+        missing from it are sent to the API.
+
+    client: cazy_little_helper.client.HttpClient
+        The pooled HTTP client used for the API requests.
+
+    controller: Optional[cazy_little_helper.controller.AdaptiveLimiter]
+        An adaptive limit of the chunks in flight, between 1 and workers,
+        None for a fixed number of workers.
+
+    """
+    def __init__(
+        self: object,
+        address: str=IDCONV,
+        chunk_size: int=200,
+        workers: int=3,
+        rate: Optional[float]=3,
+        index: Optional[IdIndex]=None,
+        client: Optional[HttpClient]=None,
+        adaptive: bool=False
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        address : str, optional
+            The ID Converter API address. The default is NCBI's.
+        chunk_size : int, optional
+            IDs per request. The default is 200.
+        workers : int, optional
+            Concurrent requests. The default is 3.
+        rate : Optional[float], optional
+            Maximum requests per second, None for no limit. The default is 3.
+        index : Optional[IdIndex], optional
+            A local mapping index. The default is None.
+        client : Optional[HttpClient], optional
+            A shared HTTP client. The default is None (a new client).
+        adaptive : bool, optional
+            Adapt the number of chunks in flight to the API's latency and
+            errors (AIMD). The default is False.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.address = address
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate, workers)
+        self.index = index
+        self.client = client or HttpClient()
+        self.controller = AdaptiveLimiter("ID converter", workers) \
+            if adaptive else None
+
+    @staticmethod
+    def id_type(
+        idi: str
+    ) -> str:
+        """Guesses the type of an article ID.
+
+        Parameters
+        ----------
+        idi : str
+            The article ID.
+
+        Returns
+        -------
+        str
+            One of ['pmid', 'pmcid', 'doi'].
+
+        """
+        if "/" in idi:
+            return "doi"
+        if idi.startswith("PMC"):
+            return "pmcid"
+        return "pmid"
+
+    def convert_chunk(
+        self: object,
+        ids: List[str],
+        id_type: str
+    ) -> Dict[str, Dict[str, str]]:
+        """Converts a chunk of IDs of the same type with a single request.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The IDs to convert.
+        id_type : str
+            The type of the given IDs.
+
+        Returns
+        -------
+        Dict[str, Dict[str, str]]
+            The converter record of each requested ID (lowercase), a dict with
+            the found 'pmid', 'pmcid' and 'doi' keys.
+
+        """
+        response = self.client.get(self.address, params={
+            "tool": "cazy_little_helper", "idtype": id_type,
+            "ids": ",".join(ids)}, limiter=self.limiter,
+            controller=self.controller)
+        response.raise_for_status()
+        return {record.get("requested-id", "").lower(): record.attrib
+                for record in ElementTree.fromstring(
+                        response.content).iter("record")}
+
+    def __try_convert(
+        self: object,
+        ids: List[str],
+        id_type: str
+    ) -> Tuple[Optional[Dict[str, Dict[str, str]]], str]:
+        try:
+            return self.convert_chunk(ids, id_type), ""
+        except (requests.RequestException, ElementTree.ParseError) as error:
+            print("problem with a chunk of %d %s IDs: %r" % (
+                len(ids), id_type, error))
+            return None, repr(error)
+
+    def convert(
+        self: object,
+        ids: List[str],
+        target: str
+    ) -> List[Optional[str]]:
+        """Converts a list of article IDs of any type to the target type.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The IDs to convert, PMIDs, PMCIDs and DOIs can be mixed.
+        target : str
+            The ID type to find, one of ['pmid', 'pmcid', 'doi'].
+
+        Returns
+        -------
+        List[Optional[str]]
+            The converted IDs in the same order, None when not found or when
+            the request of their chunk failed (such IDs are not stored in the
+            index as missing).
+
+        """
+        ids = [str(idi).strip() for idi in ids]
+        converted, chunks = {}, []
+        for id_type in IdIndex.COLUMNS:
+            typed = list(dict.fromkeys(
+                idi for idi in ids if IdConverter.id_type(idi) == id_type))
+            if self.index:
+                converted.update(self.index.lookup(typed, id_type, target))
+                typed = [idi for idi in typed if idi not in converted]
+            chunks.extend((typed[i:i + self.chunk_size], id_type)
+                          for i in range(0, len(typed), self.chunk_size))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for (chunk, id_type), (records, _) in zip(chunks, executor.map(
+                    lambda chunk: self.__try_convert(*chunk), chunks)):
+                if records is None:
+                    converted.update(dict.fromkeys(chunk))
+                    continue
+                for idi in chunk:
+                    converted[idi] = records.get(idi.lower(), {}).get(target)
+                if self.index:
+                    self.index.store(list(records.values()))
+                    self.index.store_missing(
+                        [idi for idi in chunk if not converted[idi]],
+                        id_type, target)
+
+        return [converted[idi] for idi in ids]
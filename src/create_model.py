@@ -9,15 +9,35 @@ functionality.
 from __future__ import absolute_import
 from parsers import Parser
 from model import Model
+from hashing_model import HashingModel
 
 def launch_create_model( 
     path: str,
     dataset: str,
     biblio_address: str,
-    val_size: float
+    val_size: float,
+    workers: int,
+    rate: float,
+    cache: str,
+    resume: bool,
+    adaptive: bool,
+    processes: int,
+    chunk_size: int,
+    stream: bool,
+    token_cache: str,
+    architecture: str,
+    search: str,
+    n_iter: int,
+    features: str,
+    update: str
 ) -> Model:
 
-    return Model.create_model(path, dataset, biblio_address, val_size)
+    model = HashingModel if architecture == "hashing_sgd" else Model
+    return model.create_model(path, dataset, biblio_address, val_size,
+                              workers, rate, cache, resume, adaptive,
+                              processes, chunk_size, stream,
+                              token_cache, search, n_iter, features,
+                              update)
 
 def main(
 ) -> None:
@@ -26,7 +46,14 @@ def main(
     args = parser.parse_args()
     args = args.__dict__
     launch_create_model(args["output_path"], args["dataset"],
-                        args["biblio_add"], args["val_size"])
+                        args["biblio_add"], args["val_size"],
+                        args["workers"], args["rate"],
+                        args["cache"], args["resume"],
+                        args["adaptive"], args["processes"],
+                        args["chunk_size"], args["stream"],
+                        args["token_cache"], args["architecture"],
+                        args["search"], args["n_iter"],
+                        args["features"], args["update"])
 
 if __name__ == "__main__":
     main()
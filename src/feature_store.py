@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A FeatureStore class, the term counts of a training dataset saved on disk, so
+that a model can be trained again without scraping and preprocessing the
+articles.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional, List, Iterable
+import os
+import json
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from preprocessor import Preprocessor
+
+class FeatureStore:
+    """The term-count matrix of the preprocessed documents of a dataset, with
+    its terms and the id and label of every row. It is saved as a directory
+    of numpy arrays (the CSR matrix, and the UTF-8 terms stored one after
+    another), memory-mapped when loaded, with the index of the articles as a
+    .csv file and the preprocessor (normalization table and phrasers) that
+    produced the documents.
+
+    Attributes
+    ----------
+    counts : scipy.sparse.csr_matrix
+        The term counts, one row per article and one column per term.
+
+    terms : List[str]
+        The terms of the columns, sorted as by a CountVectorizer.
+
+    index : pandas.DataFrame
+        The "id" and "label" of every row.
+
+    """
+    FORMAT = 1
+    INDEX = "index.csv"
+    PARAMETERS = "parameters.json"
+
+    def __init__(
+        self: object,
+        counts: sp.csr_matrix,
+        terms: List[str],
+        index: pd.DataFrame
+    ) -> None:
+        """Class constructor, see FeatureStore.build to count documents.
+
+        Parameters
+        ----------
+        counts : sp.csr_matrix
+            The term counts.
+        terms : List[str]
+            The terms of the columns.
+        index : pd.DataFrame
+            The id and label of every row.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        self.counts = counts
+        self.terms = terms
+        self.index = index
+
+    def __len__(
+        self: object
+    ) -> int:
+        return self.counts.shape[0]
+
+    @classmethod
+    def build(
+        cls: type,
+        docs: Iterable[List[str]],
+        index: pd.DataFrame
+    ) -> object:
+        """Counts the terms of preprocessed documents.
+
+        Parameters
+        ----------
+        docs : Iterable[List[str]]
+            The token lists, in the order of the index.
+        index : pd.DataFrame
+            The id and label of every document.
+
+        Returns
+        -------
+        FeatureStore
+            The store of the documents.
+
+        """
+        vectorizer = CountVectorizer(analyzer=Preprocessor.passthrough)
+        counts = vectorizer.fit_transform(docs).tocsr()
+        return cls(counts, vectorizer.get_feature_names_out().tolist(),
+                   index[["id", "label"]].reset_index(drop=True))
+
+    def vectorizer(
+        self: object
+    ) -> CountVectorizer:
+        """A CountVectorizer of token lists into the columns of the store.
+
+        Returns
+        -------
+        CountVectorizer
+            The fitted vectorizer, its features are the terms of the store.
+
+        """
+        # the features of a CountVectorizer are sorted, as the terms
+        return CountVectorizer(analyzer=Preprocessor.passthrough).fit(
+            [self.terms])
+
+    def rows(
+        self: object,
+        ids: List[str]
+    ) -> np.ndarray:
+        """The rows of some articles, -1 for the articles not in the store.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The article IDs.
+
+        Returns
+        -------
+        np.ndarray
+            The rows.
+
+        """
+        positions = dict(zip(self.index.id.astype(str),
+                             range(len(self.index))))
+        return np.array([positions.get(str(i), -1) for i in ids],
+                        dtype=np.int64)
+
+    def add(
+        self: object,
+        docs: Iterable[List[str]],
+        index: pd.DataFrame
+    ) -> object:
+        """Adds the counts of new articles, their new terms are merged into
+        the sorted terms of the store, the columns of the stored counts are
+        moved accordingly.
+
+        Parameters
+        ----------
+        docs : Iterable[List[str]]
+            The token lists of the new articles, in the order of the index.
+        index : pd.DataFrame
+            The id and label of every new article.
+
+        Returns
+        -------
+        FeatureStore
+            The store with the new articles (in memory).
+
+        """
+        new = FeatureStore.build(docs, index)
+        terms = sorted(set(self.terms).union(new.terms))
+        position = dict(zip(terms, range(len(terms))))
+
+        def move(store):
+            # the terms of both stores are sorted, so are the moved columns
+            columns = np.fromiter(map(position.__getitem__, store.terms),
+                                  dtype=np.int64, count=len(store.terms))
+            return sp.csr_matrix((np.asarray(store.counts.data),
+                                  columns[store.counts.indices],
+                                  np.asarray(store.counts.indptr)),
+                                 shape=(len(store), len(terms)))
+
+        return FeatureStore(sp.vstack([move(self), move(new)]).tocsr(), terms,
+                            pd.concat([self.index, new.index],
+                                      ignore_index=True))
+
+    def relabel(
+        self: object,
+        index: pd.DataFrame
+    ) -> int:
+        """Sets the labels of the articles of the store found in an index.
+
+        Parameters
+        ----------
+        index : pd.DataFrame
+            The id and the new label of the articles.
+
+        Returns
+        -------
+        int
+            The number of labels that changed.
+
+        """
+        rows = self.rows(index.id.to_list())
+        found = rows >= 0
+        labels = self.index.label.to_numpy().copy()
+        changed = int((labels[rows[found]] != index.label.to_numpy()[found]
+                       ).sum())
+        labels[rows[found]] = index.label.to_numpy()[found]
+        self.index = self.index.assign(label=labels)
+        return changed
+
+    @staticmethod
+    def exists(
+        path: Optional[str]
+    ) -> bool:
+        """Whether a store was saved at a path."""
+        return bool(path) and os.path.exists(os.path.join(
+            path, FeatureStore.PARAMETERS))
+
+    def save(
+        self: object,
+        path: str,
+        processor: Optional[Preprocessor]=None
+    ) -> str:
+        """Saves the store in a directory, with the preprocessor of its
+        documents. The arrays of a store saved again are replaced, not
+        overwritten, so the stores loaded from them are left untouched.
+
+        Parameters
+        ----------
+        path : str
+            The directory.
+        processor : Optional[Preprocessor], optional
+            The preprocessor that produced the documents, its phrasers are
+            needed to score new documents with a model trained on the store.
+            The default is None.
+
+        Returns
+        -------
+        str
+            The save path.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        if FeatureStore.exists(path):
+            os.remove(os.path.join(path, FeatureStore.PARAMETERS))
+        terms = [term.encode() for term in self.terms]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in terms], out=offsets[1:])
+        arrays = {"data": self.counts.data, "indices": self.counts.indices,
+                  "indptr": self.counts.indptr,
+                  "terms": np.frombuffer(b"".join(terms), dtype=np.uint8),
+                  "offsets": offsets}
+        for name, array in arrays.items():
+            with open(os.path.join(path, name + ".tmp"), "wb") as f:
+                np.save(f, array)
+            os.replace(os.path.join(path, name + ".tmp"),
+                       os.path.join(path, name + ".npy"))
+        self.index.to_csv(os.path.join(path, FeatureStore.INDEX),
+                          index=False)
+        if processor is not None:
+            processor.save(Preprocessor.artifact(path))
+        # written last, a store is only complete with its parameters
+        with open(os.path.join(path, FeatureStore.PARAMETERS), "w") as f:
+            json.dump({"format": FeatureStore.FORMAT,
+                       "shape": list(self.counts.shape)}, f)
+        return path
+
+    @classmethod
+    def load(
+        cls: type,
+        path: str
+    ) -> object:
+        """Loads a store, the arrays of the matrix are memory-mapped
+        read-only.
+
+        Parameters
+        ----------
+        path : str
+            The directory of the store.
+
+        Raises
+        ------
+        Exception
+            If the store was saved by another version.
+
+        Returns
+        -------
+        FeatureStore
+            The store.
+
+        """
+        with open(os.path.join(path, FeatureStore.PARAMETERS)) as f:
+            parameters = json.load(f)
+        if parameters["format"] != FeatureStore.FORMAT:
+            raise Exception("%s was saved in another format, create the \
+store again" % (path))
+        arrays = {name: np.load(os.path.join(path, name + ".npy"),
+                                mmap_mode="r")
+                  for name in ["data", "indices", "indptr", "terms",
+                               "offsets"]}
+        counts = sp.csr_matrix((arrays["data"], arrays["indices"],
+                                arrays["indptr"]),
+                               shape=tuple(parameters["shape"]), copy=False)
+        terms, offsets = arrays["terms"], arrays["offsets"]
+        return cls(counts, [terms[offsets[i]:offsets[i + 1]].tobytes().decode()
+                            for i in range(len(offsets) - 1)],
+                   pd.read_csv(os.path.join(path, FeatureStore.INDEX),
+                               dtype={"id": str}))
@@ -11,10 +11,11 @@ from toolkit import Toolkit
 
 def launch_find( 
     ids_file: str,
-    id_type: str
+    id_type: str,
+    index: str
 ) -> None:
 
-    return Toolkit.find_ids(ids_file, id_type)
+    return Toolkit.find_ids(ids_file, id_type, index)
 
 def main(
 ) -> None:
@@ -22,7 +23,7 @@ def main(
     parser = Parser.find_ids()
     args = parser.parse_args()
     args = args.__dict__
-    output = launch_find(args["input_path"], args["id_type"])
+    output = launch_find(args["input_path"], args["id_type"], args["index"])
     print("the file was saved to %s"%(output))
 
 if __name__ == "__main__":
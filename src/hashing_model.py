@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An out-of-core HashingModel class, a hashed TF-IDF/linear SVM classifier
+trained by mini-batches, for training sets that do not fit in memory.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from collections import deque
+from itertools import islice
+from typing import Optional, Tuple, Dict, Generator
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer, \
+    TfidfTransformer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import classification_report
+from sklearn.calibration import CalibratedClassifierCV
+from joblib import load
+try:
+    from sklearn.frozen import FrozenEstimator
+except ImportError:  # scikit-learn < 1.6
+    FrozenEstimator = None
+from preprocessor import Preprocessor
+from model import Model
+
+class TextChunks:
+    """The documents of a scraped text dataset read by chunks, only the
+    articles of a training dataset are kept, with their labels. It can be
+    iterated over several times, each time reading the file again.
+
+    Attributes
+    ----------
+    path : str
+        The text dataset, '<dataset>_text.csv'.
+
+    labels : Dict[str, int]
+        The label of every article ID of the training dataset.
+
+    chunk_size : int
+        The number of rows read at once.
+
+    """
+    def __init__(
+        self: object,
+        path: str,
+        labels: Dict[str, int],
+        chunk_size: int
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        path : str
+            The text dataset.
+        labels : Dict[str, int]
+            The label of every article ID.
+        chunk_size : int
+            The number of rows read at once.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        self.path = path
+        self.labels = labels
+        self.chunk_size = chunk_size
+
+    def chunks(
+        self: object
+    ) -> Generator[pd.DataFrame, None, None]:
+        """Reads the text dataset by chunks.
+
+        Yields
+        ------
+        Generator[pd.DataFrame, None, None]
+            The "id", "label" and "docs" (title and text) of the articles of
+            the training dataset, in the order of the file.
+
+        """
+        for chunk in pd.read_csv(self.path, dtype={"id": str},
+                                 chunksize=self.chunk_size):
+            chunk = chunk[chunk.id.isin(self.labels.keys())].fillna('')
+            yield pd.DataFrame({"id": chunk.id,
+                                "label": chunk.id.map(self.labels),
+                                "docs": chunk.title + " " + chunk.text})
+
+    def __iter__(
+        self: object
+    ) -> Generator[str, None, None]:
+        for chunk in self.chunks():
+            yield from chunk.docs
+
+class HashingModel(Model):
+    """A Model whose training corpus never has to be held in memory. The
+    documents are preprocessed as a stream, hashed into a fixed number of
+    features and written to disk by mini-batches, a linear SVM is then
+    trained by stochastic gradient descent over the batches, and calibrated
+    on a held-out part of the training set (a sample of at most
+    MAX_CALIBRATION documents of it). With a feature store, the stored
+    counts are hashed instead, and a previous model is updated by training
+    its SVM further on the articles of the dataset only.
+
+    Attributes
+    ----------
+    batch_size : int
+        The number of documents per mini-batch.
+
+    epochs : int
+        The number of passes over the training batches.
+
+    n_features : int
+        The number of hashed features.
+
+    """
+    TRAIN, CALIBRATION, VALIDATION = 0, 1, 2
+    MAX_CALIBRATION = 100000
+    REFIT = False
+
+    def __init__(
+        self: object,
+        path: str,
+        dataset: str,
+        biblio_address: str,
+        val_size: float,
+        workers: int=1,
+        rate: Optional[float]=1/3,
+        cache: Optional[str]=None,
+        resume: bool=False,
+        adaptive: bool=False,
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        stream: bool=True,
+        token_cache: Optional[str]=None,
+        search: Optional[str]=None,
+        n_iter: int=20,
+        features: Optional[str]=None,
+        previous: Optional[str]=None,
+        batch_size: int=1000,
+        epochs: int=5,
+        n_features: int=2 ** 20
+    ) -> None:
+        """Class constructor, see Model for the shared parameters. The
+        documents are always streamed, and there is no hyperparameter
+        search. The previous model of an update must be a HashingModel.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Documents per mini-batch. The default is 1000.
+        epochs : int, optional
+            Passes over the training batches. The default is 5.
+        n_features : int, optional
+            Number of hashed features. The default is 2 ** 20.
+
+        Raises
+        ------
+        Exception
+            If a hyperparameter search is asked.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        if search:
+            raise Exception("The hyperparameter search is only available \
+for the tfidf_svm architecture")
+        super().__init__(path, dataset, biblio_address, val_size, workers,
+                         rate, cache, resume, adaptive, processes, chunk_size,
+                         True, token_cache, None, n_iter, features, previous)
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.n_features = n_features
+        self.architecture = Pipeline([
+            ("hashing_vectorization", HashingVectorizer(
+                analyzer=Preprocessor.passthrough, n_features=n_features,
+                alternate_sign=False, norm=None)),
+            ("tfidf_transformation", TfidfTransformer()),
+            ("classifier", SGDClassifier(loss="hinge", alpha=1e-5))
+            ])
+        self.__batches = None
+        self.__n_batches = 0
+        self.__df = None
+        self.__n_roles = np.zeros(3, dtype=np.int64)
+
+    def __batch(
+        self: object,
+        i: int
+    ) -> Tuple[sp.csr_matrix, np.ndarray, np.ndarray]:
+        """Reads a mini-batch (counts, labels, roles) from disk."""
+        path = os.path.join(self.__batches.name, "%d" % (i))
+        arrays = np.load(path + ".npz")
+        return sp.load_npz(path + "_X.npz"), arrays["y"], arrays["role"]
+
+    def __write(
+        self: object,
+        X: sp.csr_matrix,
+        y: np.ndarray,
+        role: np.ndarray
+    ) -> None:
+        """Writes a mini-batch (hashed counts, labels, roles) to disk, and
+        counts the document frequencies of its training rows."""
+        path = os.path.join(self.__batches.name, "%d" % (self.__n_batches))
+        sp.save_npz(path + "_X.npz", X)
+        np.savez(path + ".npz", y=y, role=role)
+        self.__df += np.bincount(X[role == HashingModel.TRAIN].indices,
+                                 minlength=self.n_features)
+        self.__n_roles += np.bincount(role, minlength=3)
+        self.__n_batches += 1
+
+    def __rows(
+        self: object,
+        role: int,
+        size: int
+    ) -> Tuple[sp.csr_matrix, np.ndarray]:
+        """Gathers a uniform sample of at most size rows of a role from the
+        mini-batches."""
+        n_rows = self.__n_roles[role]
+        keep = np.zeros(n_rows, dtype=bool)
+        keep[np.random.choice(n_rows, min(n_rows, size), replace=False)] = True
+        X, y, start = [], [], 0
+        for i in range(self.__n_batches):
+            X_batch, y_batch, roles = self.__batch(i)
+            rows = np.flatnonzero(roles == role)
+            selected = rows[keep[start:start + len(rows)]]
+            start += len(rows)
+            X.append(X_batch[selected])
+            y.append(y_batch[selected])
+        return sp.vstack(X).tocsr(), np.concatenate(y)
+
+    def dataset_prep(
+        self: object
+    ) -> None:
+        """This method prepares the dataset for training: the articles are
+        scraped, then the text dataset is read by chunks of batch_size, for
+        the two passes fitting the phrasers and for the one preprocessing the
+        documents as a stream, hashing them and writing them to disk by
+        mini-batches. Each document is randomly assigned to the training,
+        the calibration or the validation set. With a feature store, the
+        training and validation sets are split as by a Model and their
+        stored counts are hashed instead (see hash_store).
+
+        Returns
+        -------
+        None
+            Writes the mini-batches and the document frequencies.
+
+        """
+        if self.features:
+            # the store replaces the architecture by the one of a Model
+            architecture = self.architecture
+            super().dataset_prep()
+            self.architecture = architecture
+            self.hash_store()
+            return
+
+        self.scrape(merge=False)
+
+        print("Preprocessing and hashing documents by batches of %d..." % (
+            self.batch_size))
+        text = TextChunks(self.scraper.text_dataset, dict(zip(
+            self.dataset.id.astype(str), self.dataset.label)),
+                          self.batch_size)
+        self.processor.docs = text
+        self.processor.fit()
+        # the validation and calibration sets are split as by two successive
+        # train_test_split, without knowing the number of documents
+        shares = [(1 - self.val_size) ** 2, (1 - self.val_size) *
+                  self.val_size, self.val_size]
+
+        hasher = self.architecture.named_steps["hashing_vectorization"]
+        self.__batches = tempfile.TemporaryDirectory()
+        self.__df = np.zeros(self.n_features, dtype=np.int64)
+        labels = deque()
+
+        def documents():
+            for chunk in text.chunks():
+                labels.extend(chunk.label)
+                yield from chunk.docs
+
+        docs = self.processor.stream(documents())
+        while batch := list(islice(docs, self.batch_size)):
+            X = hasher.transform(batch)
+            y = np.array([labels.popleft() for _ in batch])
+            role = np.random.choice(3, len(batch), p=shares).astype(np.int8)
+            self.__write(X, y, role)
+        self.processor.docs = None
+        if self.processor.cache:
+            print(self.processor.cache.stats())
+
+    def hash_store(
+        self: object
+    ) -> None:
+        """This method hashes the stored counts of the training and
+        validation sets and writes them to disk by mini-batches, each
+        training article is randomly assigned to the training or the
+        calibration set. When updating a previous model, its vectorization
+        is reused, so that the new articles are hashed as the ones it was
+        trained on.
+
+        Raises
+        ------
+        Exception
+            If the previous model is not a HashingModel.
+
+        Returns
+        -------
+        None
+            Writes the mini-batches and the document frequencies.
+
+        """
+        if self.previous:
+            previous = load(self.previous)
+            if not isinstance(previous, Pipeline) or not isinstance(
+                    previous.steps[0][1], HashingVectorizer):
+                raise Exception("Only a model of the hashing_sgd \
+architecture can be updated by a HashingModel")
+            calibrated = previous.named_steps["classifier"]
+            # a prefitted classifier is wrapped in a FrozenEstimator
+            classifier = getattr(calibrated.estimator, "estimator",
+                                 calibrated.estimator)
+            self.architecture = Pipeline(previous.steps[:-1] + [
+                ("classifier", classifier)])
+        hasher = self.architecture.named_steps["hashing_vectorization"]
+        self.n_features = hasher.n_features
+
+        # only the terms of the articles are hashed, a term of the store
+        # has the column of its single-term document
+        used = np.unique(np.concatenate([self.X_train.indices,
+                                         self.X_val.indices]))
+        columns = hasher.transform([[self.store.terms[i]] for i in used
+                                    ]).indices
+        projection = sp.csr_matrix((np.ones(len(used)), (used, columns)),
+                                   shape=(len(self.store.terms),
+                                          self.n_features))
+
+        print("Hashing the stored counts by batches of %d..." % (
+            self.batch_size))
+        self.__batches = tempfile.TemporaryDirectory()
+        self.__df = np.zeros(self.n_features, dtype=np.int64)
+        for X, y, validation in [(self.X_train, self.y_train, False),
+                                 (self.X_val, self.y_val, True)]:
+            for start in range(0, X.shape[0], self.batch_size):
+                batch = (X[start:start + self.batch_size] @ projection
+                         ).tocsr()
+                if validation:
+                    role = np.full(batch.shape[0], HashingModel.VALIDATION,
+                                   dtype=np.int8)
+                else:
+                    role = np.random.choice(2, batch.shape[0], p=[
+                        1 - self.val_size, self.val_size]).astype(np.int8)
+                self.__write(batch, np.asarray(y[start:start +
+                                                 self.batch_size]), role)
+
+    def fit(
+        self: object
+    ) -> None:
+        """This method sets the inverse document frequencies of the training
+        set, trains the classifier over the mini-batches for a number of
+        epochs, then calibrates it on the calibration set. The classifier of
+        a previous model is trained further, with its inverse document
+        frequencies, so an update only goes over the new batches.
+
+        Returns
+        -------
+        None
+            Fits the architecture property.
+
+        """
+        tfidf = self.architecture.named_steps["tfidf_transformation"]
+        classifier = self.architecture.named_steps["classifier"]
+        if self.previous:
+            classes = classifier.classes_
+        else:
+            tfidf.idf_ = np.log((1 + self.__n_roles[HashingModel.TRAIN]) /
+                                (1 + self.__df)) + 1
+            classes = np.unique(self.dataset.label.values)
+        for epoch in range(self.epochs):
+            print("Training epoch %d/%d..." % (epoch + 1, self.epochs))
+            for i in np.random.permutation(self.__n_batches):
+                X, y, roles = self.__batch(i)
+                rows = roles == HashingModel.TRAIN
+                if rows.any():
+                    classifier.partial_fit(tfidf.transform(X[rows]), y[rows],
+                                           classes=classes)
+
+        print("Calibrating...")
+        X, y = self.__rows(HashingModel.CALIBRATION,
+                           HashingModel.MAX_CALIBRATION)
+        if FrozenEstimator is not None:
+            calibrated = CalibratedClassifierCV(FrozenEstimator(classifier))
+        else:
+            calibrated = CalibratedClassifierCV(classifier, cv="prefit")
+        calibrated.fit(tfidf.transform(X), y)
+        self.architecture.steps[-1] = ("classifier", calibrated)
+
+    def performance(
+        self: object
+    ) -> None:
+        """This method makes predictions on the validation set, mini-batch
+        by mini-batch, and prints out some classification statistics (and
+        the comparison to the previous model of an update), then removes the
+        mini-batches.
+
+        Returns
+        -------
+        None
+            Prints accuracy stats on the validation dataset.
+
+        """
+        tfidf = self.architecture.named_steps["tfidf_transformation"]
+        classifier = self.architecture.named_steps["classifier"]
+        y, predicted = [], []
+        for i in range(self.__n_batches):
+            X_batch, y_batch, roles = self.__batch(i)
+            rows = roles == HashingModel.VALIDATION
+            if rows.any():
+                y.append(y_batch[rows])
+                predicted.append(classifier.predict(tfidf.transform(
+                    X_batch[rows])))
+        print(classification_report(np.concatenate(y),
+                                    np.concatenate(predicted)))
+        if self.previous:
+            print(self.compare())
+        self.__batches.cleanup()
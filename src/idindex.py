@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+An IdIndex class to keep resolved article IDs on disk between runs.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Dict, List, Optional
+import os
+import sqlite3
+import time
+import pandas as pd
+
+class IdIndex:
+    """A local SQLite index of PMID/PMCID/DOI mappings, it stores resolved
+    articles and negative results (IDs that were not found), negative results
+    expire after negative_ttl seconds so they can be retried later.
+
+    Attributes
+    ----------
+    path: str
+        The path of the SQLite database file.
+
+    negative_ttl: Optional[float]
+        How long a "not found" result is trusted in seconds, None to trust it
+        forever.
+
+    hits: int
+        The number of IDs answered by the index.
+
+    misses: int
+        The number of IDs that had to be sent to the network.
+
+    """
+    COLUMNS = ["pmid", "pmcid", "doi"]
+
+    def __init__(
+        self: object,
+        path: str,
+        negative_ttl: Optional[float]=30*24*3600
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        path : str
+            The SQLite database path, created if it does not exist.
+        negative_ttl : Optional[float], optional
+            Expiry of negative results in seconds. The default is 30 days.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.hits, self.misses = 0, 0
+        self.__db = sqlite3.connect(path)
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS articles (pmid TEXT, pmcid TEXT, "
+                "doi TEXT, resolved_at REAL)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS articles_pmid "
+                              "ON articles (pmid)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS articles_pmcid "
+                              "ON articles (pmcid)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS articles_doi "
+                              "ON articles (lower(doi))")
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS missing (id TEXT, target TEXT, "
+                "checked_at REAL, PRIMARY KEY (id, target))")
+
+    @staticmethod
+    def key(
+        idi: str,
+        id_type: str
+    ) -> str:
+        """Normalizes an ID for the index, DOIs are case insensitive.
+
+        Parameters
+        ----------
+        idi : str
+            The article ID.
+        id_type : str
+            The ID type, one of ['pmid', 'pmcid', 'doi'].
+
+        Returns
+        -------
+        str
+            The normalized ID.
+
+        """
+        return idi.lower() if id_type == "doi" else idi
+
+    def lookup(
+        self: object,
+        ids: List[str],
+        id_type: str,
+        target: str
+    ) -> Dict[str, Optional[str]]:
+        """Looks up IDs of the same type in the index.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The IDs to convert.
+        id_type : str
+            The type of the given IDs.
+        target : str
+            The ID type to find.
+
+        Returns
+        -------
+        Dict[str, Optional[str]]
+            The known IDs only, mapped to the target ID or to None when they
+            are known not to be found.
+
+        """
+        column = "lower(doi)" if id_type == "doi" else id_type
+        expiry = 0 if self.negative_ttl is None else \
+            time.time() - self.negative_ttl
+        found = {}
+        for idi in ids:
+            key = IdIndex.key(idi, id_type)
+            row = self.__db.execute(
+                "SELECT %s FROM articles WHERE %s = ? AND %s IS NOT NULL "
+                "LIMIT 1" % (target, column, target), (key,)).fetchone()
+            if row:
+                found[idi] = row[0]
+            elif self.__db.execute(
+                    "SELECT 1 FROM missing WHERE id = ? AND target = ? AND "
+                    "checked_at >= ?", (key, target, expiry)).fetchone():
+                found[idi] = None
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    def store(
+        self: object,
+        records: List[Dict[str, str]]
+    ) -> None:
+        """Stores resolved articles, merging them with the rows that already
+        share one of their IDs.
+
+        Parameters
+        ----------
+        records : List[Dict[str, str]]
+            Dicts with some of the 'pmid', 'pmcid' and 'doi' keys.
+
+        Returns
+        -------
+        None
+
+        """
+        now = time.time()
+        with self.__db:
+            for record in records:
+                merged = {col: record.get(col) for col in IdIndex.COLUMNS}
+                if not any(merged.values()):
+                    continue
+                clause = " OR ".join(
+                    "lower(doi) = ?" if col == "doi" else "%s = ?" % (col)
+                    for col in IdIndex.COLUMNS if merged[col])
+                params = [IdIndex.key(merged[col], col)
+                          for col in IdIndex.COLUMNS if merged[col]]
+                for row in self.__db.execute(
+                        "SELECT pmid, pmcid, doi FROM articles WHERE %s"
+                        % (clause), params).fetchall():
+                    for col, value in zip(IdIndex.COLUMNS, row):
+                        merged[col] = merged[col] or value
+                self.__db.execute("DELETE FROM articles WHERE %s" % (clause),
+                                  params)
+                self.__db.execute("INSERT INTO articles VALUES (?, ?, ?, ?)",
+                                  (merged["pmid"], merged["pmcid"],
+                                   merged["doi"], now))
+
+    def store_missing(
+        self: object,
+        ids: List[str],
+        id_type: str,
+        target: str
+    ) -> None:
+        """Stores negative results, IDs for which the target was not found.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The IDs that could not be converted.
+        id_type : str
+            The type of the given IDs.
+        target : str
+            The ID type that was not found.
+
+        Returns
+        -------
+        None
+
+        """
+        now = time.time()
+        with self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO missing VALUES (?, ?, ?)",
+                [(IdIndex.key(idi, id_type), target, now) for idi in ids])
+
+    def bulk_load(
+        self: object,
+        path: str
+    ) -> int:
+        """Loads the index from a find_ids output file, a two column .csv file
+        'id' and one of ['PMID', 'PMCID', 'DOI'], 'not_found' values are
+        stored as negative results.
+
+        Parameters
+        ----------
+        path : str
+            The find_ids output file path.
+
+        Returns
+        -------
+        int
+            The number of loaded rows.
+
+        """
+        df = pd.read_csv(path, dtype=str).dropna()
+        target = df.columns[1].lower()
+        if target not in IdIndex.COLUMNS:
+            raise Exception("Unknown ID column %s in %s, expected one of \
+['PMID', 'DOI', 'PMCID']" % (df.columns[1], os.path.basename(path)))
+
+        records, missing = [], {}
+        for idi, found in zip(df.iloc[:, 0].str.strip(), df.iloc[:, 1]):
+            id_type = "doi" if "/" in idi else \
+                "pmcid" if idi.startswith("PMC") else "pmid"
+            if found == "not_found":
+                missing.setdefault(id_type, []).append(idi)
+            else:
+                records.append({id_type: idi, target: found})
+
+        self.store(records)
+        for id_type, ids in missing.items():
+            self.store_missing(ids, id_type, target)
+        return len(df)
+
+    def stats(
+        self: object
+    ) -> str:
+        """Summarizes the index usage.
+
+        Returns
+        -------
+        str
+            The hit and miss counters.
+
+        """
+        return "ID index %s: %d hits, %d misses" % (
+            self.path, self.hits, self.misses)
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the connection to the index database.
+
+        Returns
+        -------
+        None
+
+        """
+        self.__db.close()
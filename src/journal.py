@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A Journal class to record the progress of a scraping run.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import List, Set
+import csv
+import os
+import threading
+
+class Journal:
+    """An append-only .csv journal of the status of each scraped article,
+    'pending', 'done' or 'failed', so that an interrupted run can be resumed.
+    The file is only opened when the journal is entered as a context manager,
+    and closed when it is exited.
+
+    Attributes
+    ----------
+    path: str
+        The journal file path.
+
+    resume: bool
+        Whether an existing journal is resumed when it is first opened.
+
+    status: dict
+        The last known status of each article ID.
+
+    attempts: dict
+        The number of failed attempts of each article ID.
+
+    errors: dict
+        The last error of each failed article ID.
+
+    """
+    def __init__(
+        self: object,
+        path: str,
+        resume: bool=False
+    ) -> None:
+        """Class constructor, nothing is read or written before the journal
+        is opened.
+
+        Parameters
+        ----------
+        path : str
+            The journal file path.
+        resume : bool, optional
+            Whether to resume an existing journal. The default is False.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.path = path
+        self.status, self.attempts, self.errors = {}, {}, {}
+        self.resume = resume
+        self.__lock = threading.Lock()
+        self.__file, self.__writer = None, None
+        self.__started = False
+
+    def open(
+        self: object
+    ) -> object:
+        """Opens the journal file. The first time, an existing journal is
+        replayed when resuming, otherwise it is started over, afterwards it is
+        appended to.
+
+        Returns
+        -------
+        Journal
+            The opened journal.
+
+        """
+        with self.__lock:
+            if self.__file is not None:
+                return self
+            append = self.__started or (self.resume and
+                                        os.path.exists(self.path))
+            if append and not self.__started:
+                with open(self.path) as f:
+                    for row in csv.DictReader(f):
+                        self.__update(row["id"], row["status"], row["error"])
+            self.__file = open(self.path, "a" if append else "w")
+            self.__writer = csv.writer(self.__file)
+            if not append:
+                self.__writer.writerow(["id", "status", "error"])
+                self.__file.flush()
+            self.__started = True
+        return self
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the journal file, it can be opened again to append to it.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file, self.__writer = None, None
+
+    def __enter__(
+        self: object
+    ) -> object:
+        return self.open()
+
+    def __exit__(
+        self: object,
+        *exc_info: object
+    ) -> None:
+        self.close()
+
+    def __update(
+        self: object,
+        idi: str,
+        status: str,
+        error: str
+    ) -> None:
+        self.status[idi] = status
+        if status == "failed":
+            self.attempts[idi] = self.attempts.get(idi, 0) + 1
+            self.errors[idi] = error
+
+    def record(
+        self: object,
+        idi: str,
+        status: str,
+        error: str=""
+    ) -> None:
+        """Appends the new status of an article to the journal.
+
+        Parameters
+        ----------
+        idi : str
+            The article ID.
+        status : str
+            One of ['pending', 'done', 'failed'].
+        error : str, optional
+            The error message of a failed article. The default is "".
+
+        Returns
+        -------
+        None
+
+        """
+        idi = str(idi)
+        with self.__lock:
+            self.__writer.writerow([idi, status, error])
+            self.__file.flush()
+            self.__update(idi, status, error)
+
+    def pending(
+        self: object,
+        ids: List[str]
+    ) -> None:
+        """Records a list of articles that are about to be scraped.
+
+        Parameters
+        ----------
+        ids : List[str]
+            The article IDs.
+
+        Returns
+        -------
+        None
+
+        """
+        with self.__lock:
+            for idi in ids:
+                self.__writer.writerow([idi, "pending", ""])
+                self.status[str(idi)] = "pending"
+            self.__file.flush()
+
+    def done(
+        self: object
+    ) -> Set[str]:
+        """The IDs of the successfully scraped articles.
+
+        Returns
+        -------
+        Set[str]
+
+        """
+        return {idi for idi, status in self.status.items()
+                if status == "done"}
+
+    def dead_letter(
+        self: object,
+        path: str
+    ) -> int:
+        """Writes the articles that never succeeded to a .csv file with their
+        number of attempts and last error.
+
+        Parameters
+        ----------
+        path : str
+            The dead-letter file path.
+
+        Returns
+        -------
+        int
+            The number of failed articles.
+
+        """
+        failed = [idi for idi, status in self.status.items()
+                  if status == "failed"]
+        with open(path, "w") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "attempts", "error"])
+            for idi in failed:
+                writer.writerow([idi, self.attempts[idi], self.errors[idi]])
+        return len(failed)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A RateLimiter class to throttle requests sent to upstream services.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+import threading
+import time
+
+class RateLimiter:
+    """A token-bucket rate limiter with a cap on the number of requests in
+    flight, shared between the worker threads of a scraping run.
+
+    Attributes
+    ----------
+    rate: Optional[float]
+        The number of requests allowed per second, None for no limit.
+
+    max_in_flight: int
+        The maximum number of requests running at the same time.
+
+    burst: int
+        The capacity of the bucket, how many requests can be sent at once
+        after an idle period.
+
+    """
+    def __init__(
+        self: object,
+        rate: Optional[float]=None,
+        max_in_flight: int=1,
+        burst: int=1
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        rate : Optional[float], optional
+            Requests per second. The default is None (no limit).
+        max_in_flight : int, optional
+            Maximum number of concurrent requests. The default is 1.
+        burst : int, optional
+            The bucket capacity. The default is 1.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__last = time.monotonic()
+        self.__lock = threading.Lock()
+        self.__in_flight = threading.BoundedSemaphore(max_in_flight)
+
+    def __wait_for_token(
+        self: object
+    ) -> None:
+        """Blocks until a token is available in the bucket and consumes it.
+
+        Returns
+        -------
+        None
+
+        """
+        if not self.rate:
+            return
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(float(self.burst), self.__tokens +
+                                    (now - self.__last) * self.rate)
+                self.__last = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.rate
+            time.sleep(wait)
+
+    def acquire(
+        self: object
+    ) -> None:
+        """Takes an in-flight slot then a token, blocking if needed.
+
+        Returns
+        -------
+        None
+
+        """
+        self.__in_flight.acquire()
+        try:
+            self.__wait_for_token()
+        except BaseException:
+            self.__in_flight.release()
+            raise
+
+    def release(
+        self: object
+    ) -> None:
+        """Gives back the in-flight slot once a request is finished.
+
+        Returns
+        -------
+        None
+
+        """
+        self.__in_flight.release()
+
+    def __enter__(
+        self: object
+    ) -> object:
+        self.acquire()
+        return self
+
+    def __exit__(
+        self: object,
+        *exc_info: object
+    ) -> None:
+        self.release()
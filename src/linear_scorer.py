@@ -0,0 +1,673 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A LinearScorer class, a trained model compiled into a compact scoring form
+that gives the same scores as the model with a few numpy/scipy operations.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional, List, Dict, Tuple, Union
+from collections import Counter, defaultdict
+from hashlib import blake2b
+import os
+import json
+import numpy as np
+import scipy.sparse as sp
+from scipy.special import expit
+from joblib import load, dump
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import normalize
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+from preprocessor import Preprocessor
+
+class TermIndex:
+    """The vocabulary of a model in the native format, which can be
+    memory-mapped: the terms are looked up by their 64-bit BLAKE2 hash in a
+    sorted array, the matches are checked against the UTF-8 terms stored
+    one after another.
+
+    Attributes
+    ----------
+    keys : np.ndarray
+        The sorted hashes of the terms, a term's position is its row.
+
+    terms : np.ndarray
+        The UTF-8 bytes of the terms, in the order of the keys.
+
+    offsets : np.ndarray
+        The start of every term in the bytes, and the end of the last one.
+
+    """
+    def __init__(
+        self: object,
+        keys: np.ndarray,
+        terms: np.ndarray,
+        offsets: np.ndarray
+    ) -> None:
+        """Class constructor, see TermIndex.build to index a vocabulary."""
+        self.keys = keys
+        self.terms = terms
+        self.offsets = offsets
+
+    def __len__(
+        self: object
+    ) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def hash(
+        terms: List[bytes]
+    ) -> np.ndarray:
+        """The 64-bit BLAKE2 hashes of UTF-8 terms."""
+        return np.frombuffer(b"".join(blake2b(term, digest_size=8).digest()
+                                      for term in terms), dtype="<u8")
+
+    @classmethod
+    def build(
+        cls: type,
+        vocabulary: Dict[str, int]
+    ) -> Tuple[object, np.ndarray]:
+        """Indexes a vocabulary.
+
+        Parameters
+        ----------
+        vocabulary : Dict[str, int]
+            The vocabulary, term -> row.
+
+        Returns
+        -------
+        Tuple[TermIndex, np.ndarray]
+            The index, and the rows of the vocabulary in its order.
+
+        """
+        terms = [term.encode() for term in vocabulary]
+        keys = TermIndex.hash(terms)
+        order = np.argsort(keys, kind="stable")
+        if len(keys) and (np.diff(keys[order]) == 0).any():
+            raise Exception("Two terms of the vocabulary have the same hash")
+        terms = [terms[i] for i in order]
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in terms], out=offsets[1:])
+        rows = np.fromiter(vocabulary.values(), dtype=np.int64,
+                           count=len(vocabulary))[order]
+        return cls(keys[order], np.frombuffer(b"".join(terms),
+                                              dtype=np.uint8),
+                   offsets), rows
+
+    def rows(
+        self: object,
+        terms: List[bytes]
+    ) -> np.ndarray:
+        """The rows of UTF-8 terms, -1 for terms out of the vocabulary."""
+        queries = TermIndex.hash(terms)
+        rows = np.searchsorted(self.keys, queries).clip(max=len(self) - 1)
+        rows = np.where(self.keys[rows] == queries, rows, -1)
+        for i in np.flatnonzero(rows >= 0):
+            if self.terms[self.offsets[rows[i]]:self.offsets[
+                    rows[i] + 1]].tobytes() != terms[i]:
+                rows[i] = -1
+        return rows
+
+    def subset(
+        self: object,
+        keep: np.ndarray
+    ) -> object:
+        """The index of some of the terms, their rows keep their order.
+
+        Parameters
+        ----------
+        keep : np.ndarray
+            Whether every row is kept.
+
+        Returns
+        -------
+        TermIndex
+            The index of the kept terms.
+
+        """
+        lengths = np.diff(self.offsets)
+        offsets = np.zeros(keep.sum() + 1, dtype=np.int64)
+        np.cumsum(lengths[keep], out=offsets[1:])
+        return TermIndex(np.asarray(self.keys)[keep],
+                         np.asarray(self.terms)[np.repeat(keep, lengths)],
+                         offsets)
+
+class LinearScorer:
+    """A calibrated linear model compiled from a trained model, a TF-IDF
+    vectorization followed by a CalibratedClassifierCV of linear classifiers.
+    Every fold of the CalibratedClassifierCV is a linear decision function
+    followed by a calibration, so the model is reduced to one column of
+    weights per fold over the vocabulary, the intercepts and the calibration
+    parameters of the folds; the probabilities are then the mean of the
+    calibrated decisions, as in CalibratedClassifierCV.predict_proba.
+
+    Attributes
+    ----------
+    vocabulary : Optional[Union[Dict[str, int], TermIndex]]
+        The vocabulary of the vectorizer, term -> row of the weights, a
+        TermIndex for a model loaded from the native format, None for a
+        hashed model.
+
+    hasher : Optional[sklearn.feature_extraction.text.HashingVectorizer]
+        The hashing vectorizer of a hashed model, None otherwise.
+
+    idf : Optional[np.ndarray]
+        The inverse document frequencies, None if they are not used.
+
+    weights : np.ndarray
+        The weights of the linear classifiers, one column per fold, in
+        float64 or in a reduced precision for a compacted model.
+
+    intercepts : np.ndarray
+        The intercepts of the linear classifiers, one per fold.
+
+    method : str
+        The calibration method, 'sigmoid' or 'isotonic'.
+
+    calibration : List[Tuple[np.ndarray, np.ndarray]]
+        The calibration parameters of every fold, (a, b) of the sigmoid
+        1 / (1 + exp(a * decision + b)) or the thresholds (decisions,
+        probabilities) interpolated by the isotonic regression.
+
+    scale : Optional[np.ndarray]
+        The scale of the weights of every fold when they are quantized to
+        int8, None otherwise.
+
+    """
+    FORMAT = 1
+    PRECISIONS = ["float64", "float32", "float16", "int8"]
+    PARAMETERS = "parameters.json"
+
+    def __init__(
+        self: object,
+        vocabulary: Optional[Union[Dict[str, int], TermIndex]],
+        hasher: Optional[HashingVectorizer],
+        idf: Optional[np.ndarray],
+        weights: np.ndarray,
+        intercepts: np.ndarray,
+        method: str,
+        calibration: List[Tuple[np.ndarray, np.ndarray]],
+        binary: bool=False,
+        sublinear_tf: bool=False,
+        norm: Optional[str]="l2",
+        scale: Optional[np.ndarray]=None
+    ) -> None:
+        """Class constructor, see LinearScorer.compile to build an instance
+        from a trained model.
+
+        Parameters
+        ----------
+        binary : bool, optional
+            Whether the term counts are replaced by presence. The default is
+            False.
+        sublinear_tf : bool, optional
+            Whether the term counts are replaced by 1 + log(count). The
+            default is False.
+        norm : Optional[str], optional
+            The normalization of the TF-IDF vectors. The default is "l2".
+        scale : Optional[np.ndarray], optional
+            The scale of every fold's int8 weights. The default is None.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        self.vocabulary = vocabulary
+        self.hasher = hasher
+        self.idf = idf
+        self.weights = weights
+        self.intercepts = intercepts
+        self.method = method
+        self.calibration = calibration
+        self.binary = binary
+        self.sublinear_tf = sublinear_tf
+        self.norm = norm
+        self.scale = scale
+
+    @classmethod
+    def compile(
+        cls: type,
+        model: Pipeline
+    ) -> object:
+        """Compiles a trained model, a TfidfVectorizer or a HashingVectorizer
+        and a TfidfTransformer, followed by a fitted CalibratedClassifierCV
+        of binary linear classifiers calibrated with the sigmoid or the
+        isotonic method.
+
+        Parameters
+        ----------
+        model : sklearn.pipeline.Pipeline
+            The trained model.
+
+        Raises
+        ------
+        Exception
+            If the model can't be compiled.
+
+        Returns
+        -------
+        LinearScorer
+            The compiled model.
+
+        """
+        steps = [step for _, step in model.steps]
+        vectorizer, classifier = steps[0], steps[-1]
+        tfidf = steps[1] if len(steps) == 3 else vectorizer
+        if not hasattr(classifier, "calibrated_classifiers_"):
+            raise Exception("Only models calibrated by a \
+CalibratedClassifierCV can be compiled")
+        if len(classifier.classes_) != 2:
+            raise Exception("Only binary models can be compiled")
+
+        if isinstance(vectorizer, HashingVectorizer):
+            if vectorizer.norm is not None or vectorizer.alternate_sign:
+                raise Exception("Only hashing vectorizers without \
+normalization nor alternate signs can be compiled")
+            vocabulary, hasher = None, vectorizer
+        else:
+            vocabulary, hasher = vectorizer.vocabulary_, None
+
+        coefs, intercepts, calibration = [], [], []
+        for fold in classifier.calibrated_classifiers_:
+            # a prefitted classifier is wrapped in a FrozenEstimator
+            estimator = getattr(fold.estimator, "estimator", fold.estimator)
+            calibrator = fold.calibrators[0]
+            if fold.method == "sigmoid":
+                calibration.append((calibrator.a_, calibrator.b_))
+            elif fold.method == "isotonic":
+                calibration.append((calibrator.X_thresholds_,
+                                    calibrator.y_thresholds_))
+            else:
+                raise Exception("The '%s' calibration can't be compiled" % (
+                    fold.method))
+            coefs.append(np.asarray(estimator.coef_, dtype=np.float64
+                                    ).ravel())
+            intercepts.append(float(np.ravel(estimator.intercept_)[0]))
+
+        return cls(vocabulary, hasher,
+                   tfidf.idf_ if tfidf.use_idf else None,
+                   np.column_stack(coefs), np.array(intercepts),
+                   classifier.calibrated_classifiers_[0].method, calibration,
+                   vectorizer.binary, tfidf.sublinear_tf, tfidf.norm)
+
+    def __count(
+        self: object,
+        docs: List[List[str]]
+    ) -> sp.csr_matrix:
+        """Counts the terms of the documents found in the vocabulary."""
+        # only the distinct terms of a document are looked up
+        vocabulary = self.vocabulary.keys()
+        indices, counts, indptr = [], [], [0]
+        for doc in docs:
+            doc = Counter(doc)
+            terms = doc.keys() & vocabulary
+            indices.extend(map(self.vocabulary.__getitem__, terms))
+            counts.extend(map(doc.__getitem__, terms))
+            indptr.append(len(indices))
+        return sp.csr_matrix((np.array(counts, dtype=np.float64),
+                              np.array(indices, dtype=np.int64),
+                              np.array(indptr, dtype=np.int64)),
+                             shape=(len(docs), self.weights.shape[0]))
+
+    def __search(
+        self: object,
+        docs: List[List[str]]
+    ) -> sp.csr_matrix:
+        """Counts the terms of the documents found in the TermIndex, or in
+        the columns of the hasher, the distinct terms of all the documents
+        are looked up (or hashed) at once."""
+        distinct = defaultdict(lambda: len(distinct))
+        positions, counts, indptr = [], [], [0]
+        for doc in docs:
+            doc = Counter(doc)
+            positions.extend(map(distinct.__getitem__, doc))
+            counts.extend(doc.values())
+            indptr.append(len(positions))
+        rows = self.rows(list(distinct))[np.array(positions,
+                                                  dtype=np.int64)]
+        found = rows >= 0
+        lengths = np.bincount(np.repeat(np.arange(len(docs)), np.diff(
+            indptr))[found], minlength=len(docs))
+        X = sp.csr_matrix((np.array(counts, dtype=np.float64)[found],
+                           rows[found], np.concatenate([[0], np.cumsum(
+                               lengths)])),
+                          shape=(len(docs), self.weights.shape[0]))
+        # the terms hashed together are summed, as by the hasher
+        X.sum_duplicates()
+        return X
+
+    def rows(
+        self: object,
+        terms: List[str]
+    ) -> np.ndarray:
+        """The rows of the weights of some terms, -1 for the terms out of the
+        vocabulary.
+
+        Parameters
+        ----------
+        terms : List[str]
+            The terms.
+
+        Returns
+        -------
+        np.ndarray
+            The rows.
+
+        """
+        if self.hasher is not None:
+            # the column of HashingVectorizer, |signed murmurhash3| modulo
+            # the number of features (without the int32 overflow)
+            return np.abs(np.fromiter(
+                (murmurhash3_32(term, seed=0) for term in terms),
+                dtype=np.int64, count=len(terms))) % self.hasher.n_features
+        if isinstance(self.vocabulary, dict):
+            return np.fromiter((self.vocabulary.get(term, -1)
+                                for term in terms), dtype=np.int64,
+                               count=len(terms))
+        return self.vocabulary.rows([term.encode() for term in terms])
+
+    def project(
+        self: object,
+        counts: sp.csr_matrix,
+        terms: List[str]
+    ) -> sp.csr_matrix:
+        """Projects term counts over other terms, the columns of a
+        FeatureStore for instance, on the rows of the model: the terms out
+        of its vocabulary are dropped (and the ones hashed together summed).
+
+        Parameters
+        ----------
+        counts : sp.csr_matrix
+            The term counts, one column per term.
+        terms : List[str]
+            The terms of the columns.
+
+        Returns
+        -------
+        sp.csr_matrix
+            The counts over the rows of the model, for transform or
+            predict_proba.
+
+        """
+        rows = self.rows(terms)
+        found = np.flatnonzero(rows >= 0)
+        projection = sp.csr_matrix((np.ones(len(found)), (found, rows[found])),
+                                   shape=(len(terms), self.weights.shape[0]))
+        return (counts @ projection).tocsr()
+
+    def transform(
+        self: object,
+        docs: Union[List[List[str]], sp.csr_matrix]
+    ) -> sp.csr_matrix:
+        """Computes the TF-IDF matrix of preprocessed documents, as the
+        vectorization steps of the compiled model.
+
+        Parameters
+        ----------
+        docs : Union[List[List[str]], sp.csr_matrix]
+            The preprocessed documents, a list of tokens each, or their term
+            counts over the rows of the model (see project).
+
+        Returns
+        -------
+        sp.csr_matrix
+            The TF-IDF matrix.
+
+        """
+        if sp.issparse(docs):
+            X = sp.csr_matrix(docs, dtype=np.float64, copy=True)
+        else:
+            X = self.__count(docs) if isinstance(self.vocabulary, dict) \
+                else self.__search(docs)
+        if self.binary:
+            X.data[:] = 1
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        if self.norm:
+            X = normalize(X, norm=self.norm, copy=False)
+        return X
+
+    def __decide(
+        self: object,
+        X: sp.csr_matrix
+    ) -> np.ndarray:
+        """The decisions of the folds, the weights in a reduced precision are
+        only converted for the terms of the documents."""
+        if self.weights.dtype == np.float64:
+            return X @ self.weights + self.intercepts
+        columns, indices = np.unique(X.indices, return_inverse=True)
+        X = sp.csr_matrix((X.data, indices.ravel(), X.indptr),
+                          shape=(X.shape[0], len(columns)))
+        weights = self.weights[columns].astype(np.float64)
+        # compiled models pickled before quantization have no scale
+        if getattr(self, "scale", None) is not None:
+            weights *= self.scale
+        return X @ weights + self.intercepts
+
+    def compact(
+        self: object,
+        min_weight: float=0.0,
+        min_df: float=0.0,
+        precision: str="float64"
+    ) -> object:
+        """Compacts the model: the terms whose weight is below a minimum in
+        every fold, or whose document frequency is, are pruned, and the
+        weights are stored in a reduced precision, float32, float16 or int8
+        (scaled by fold). The pruned terms no longer count in the norm of
+        the documents, so the scores change slightly.
+
+        Parameters
+        ----------
+        min_weight : float, optional
+            The minimum absolute weight of a term kept, in one of the folds.
+            The default is 0.0 (no pruning).
+        min_df : float, optional
+            The minimum document frequency of a term kept, as a proportion
+            of the training documents derived from its IDF. The default is
+            0.0 (no pruning).
+        precision : str, optional
+            The precision of the weights, one of PRECISIONS. The default is
+            "float64".
+
+        Raises
+        ------
+        Exception
+            If the terms of a hashed model are pruned, by document frequency
+            without IDF, or if the precision is unknown.
+
+        Returns
+        -------
+        LinearScorer
+            The compacted model.
+
+        """
+        if precision not in LinearScorer.PRECISIONS:
+            raise Exception("The precision must be one of %s" % (
+                ", ".join(LinearScorer.PRECISIONS)))
+        weights = np.asarray(self.weights, dtype=np.float64)
+        if getattr(self, "scale", None) is not None:
+            weights = weights * self.scale
+
+        keep = np.ones(len(weights), dtype=bool)
+        if min_weight:
+            keep &= np.abs(weights).max(axis=1) >= min_weight
+        if min_df:
+            if self.idf is None:
+                raise Exception("The document frequencies of a model without \
+IDF are unknown")
+            # idf = 1 + ln((1 + n) / (1 + df)), smoothed as in sklearn
+            keep &= np.exp(1 - np.asarray(self.idf)) >= min_df
+        if (min_weight or min_df) and self.vocabulary is None:
+            raise Exception("Only the terms of a model with a vocabulary can \
+be pruned")
+
+        vocabulary, idf = self.vocabulary, self.idf
+        if isinstance(vocabulary, dict):
+            rows = np.cumsum(keep) - 1
+            vocabulary = {term: int(rows[row]) for term, row in
+                          vocabulary.items() if keep[row]}
+        elif vocabulary is not None:
+            vocabulary = vocabulary.subset(keep)
+        if idf is not None:
+            idf = np.asarray(idf)[keep]
+
+        weights, scale = weights[keep], None
+        if precision == "int8":
+            scale = np.abs(weights).max(axis=0, initial=0) / 127
+            scale[scale == 0] = 1
+            weights = np.round(weights / scale).astype(np.int8)
+        else:
+            weights = weights.astype(precision)
+        return LinearScorer(vocabulary, self.hasher, idf, weights,
+                            np.asarray(self.intercepts), self.method,
+                            self.calibration, self.binary, self.sublinear_tf,
+                            self.norm, scale)
+
+    def predict_proba(
+        self: object,
+        docs: Union[List[List[str]], sp.csr_matrix]
+    ) -> np.ndarray:
+        """Predicts the probabilities of preprocessed documents, the same as
+        the compiled model.
+
+        Parameters
+        ----------
+        docs : Union[List[List[str]], sp.csr_matrix]
+            The preprocessed documents, a list of tokens each, or their term
+            counts over the rows of the model (see project).
+
+        Returns
+        -------
+        np.ndarray
+            The probabilities of the negative and the positive class.
+
+        """
+        decisions = self.__decide(self.transform(docs))
+        proba = np.empty_like(decisions)
+        for k, (x, y) in enumerate(self.calibration):
+            if self.method == "sigmoid":
+                proba[:, k] = expit(-(x * decisions[:, k] + y))
+            else:
+                proba[:, k] = np.interp(decisions[:, k], x, y)
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return np.column_stack([(1 - proba).mean(axis=1),
+                                proba.mean(axis=1)])
+
+    def save(
+        self: object,
+        path: str,
+        native: bool=False
+    ) -> str:
+        """Saves the compiled model with joblib, or in the native format: a
+        directory of numpy arrays that are memory-mapped when loaded, the
+        weights, the inverse document frequencies and the arrays of the
+        vocabulary as a TermIndex (the weights are reordered as its rows),
+        with a JSON file of the other parameters.
+
+        Parameters
+        ----------
+        path : str
+            The save path, a directory for the native format.
+        native : bool, optional
+            Whether to save in the native format. The default is False.
+
+        Returns
+        -------
+        str
+            The save path.
+
+        """
+        if not native:
+            dump(self, path)
+            return path
+
+        os.makedirs(path, exist_ok=True)
+        weights, idf, index = self.weights, self.idf, self.vocabulary
+        if isinstance(index, dict):
+            index, rows = TermIndex.build(index)
+            weights = weights[rows]
+            idf = idf[rows] if idf is not None else None
+        arrays = {"weights": weights, "idf": idf}
+        if index is not None:
+            arrays.update(keys=index.keys, terms=index.terms,
+                          offsets=index.offsets)
+        for name, array in arrays.items():
+            if array is not None:
+                np.save(os.path.join(path, name + ".npy"), array)
+        with open(os.path.join(path, LinearScorer.PARAMETERS), "w") as f:
+            json.dump({
+                "format": LinearScorer.FORMAT,
+                "n_features": self.hasher.n_features if self.hasher else None,
+                "intercepts": self.intercepts.tolist(),
+                "method": self.method,
+                "calibration": [[np.ravel(x).tolist(), np.ravel(y).tolist()]
+                                for x, y in self.calibration],
+                "binary": self.binary,
+                "sublinear_tf": self.sublinear_tf,
+                "norm": self.norm,
+                "scale": None if getattr(self, "scale", None) is None else
+                self.scale.tolist()}, f)
+        return path
+
+    @classmethod
+    def load(
+        cls: type,
+        path: str
+    ) -> object:
+        """Loads a compiled model, saved with joblib or in the native format.
+        The arrays of the native format are memory-mapped read-only, so they
+        are only read from the disk when used, and shared by the processes
+        that load the same model.
+
+        Parameters
+        ----------
+        path : str
+            The path of the compiled model.
+
+        Raises
+        ------
+        Exception
+            If the native model was saved by another version.
+
+        Returns
+        -------
+        LinearScorer
+            The compiled model.
+
+        """
+        if not os.path.isdir(path):
+            return load(path)
+
+        with open(os.path.join(path, LinearScorer.PARAMETERS)) as f:
+            parameters = json.load(f)
+        if parameters["format"] != LinearScorer.FORMAT:
+            raise Exception("%s was saved in another format, compile the \
+model again" % (path))
+        arrays = {name: np.load(os.path.join(path, name + ".npy"),
+                                mmap_mode="r")
+                  if os.path.exists(os.path.join(path, name + ".npy"))
+                  else None for name in ["weights", "idf", "keys", "terms",
+                                         "offsets"]}
+        index, hasher = None, None
+        if arrays["keys"] is not None:
+            index = TermIndex(arrays["keys"], arrays["terms"],
+                              arrays["offsets"])
+        if parameters["n_features"]:
+            hasher = HashingVectorizer(
+                analyzer=Preprocessor.passthrough,
+                n_features=parameters["n_features"], alternate_sign=False,
+                norm=None, binary=parameters["binary"])
+        return cls(index, hasher, arrays["idf"], arrays["weights"],
+                   np.array(parameters["intercepts"]), parameters["method"],
+                   [(np.array(x), np.array(y))
+                    for x, y in parameters["calibration"]],
+                   parameters["binary"], parameters["sublinear_tf"],
+                   parameters["norm"], np.array(parameters["scale"]) if
+                   parameters.get("scale") else None)
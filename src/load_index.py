@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A CLI entry point for the PyPI package, for loading find_ids outputs into the
+local ID mapping index.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import List
+from parsers import Parser
+from idindex import IdIndex
+
+def launch_load(
+    index: str,
+    id_files: List[str]
+) -> int:
+
+    id_index = IdIndex(index)
+    return sum(id_index.bulk_load(id_file) for id_file in id_files)
+
+def main(
+) -> None:
+
+    parser = Parser.load_index()
+    args = parser.parse_args()
+    args = args.__dict__
+    loaded = launch_load(args["index"], args["input_paths"])
+    print("%d IDs were loaded into %s"%(loaded, args["index"]))
+
+if __name__ == "__main__":
+    main()
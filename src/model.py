@@ -7,19 +7,29 @@ the ML Model class, a TF-IDF/SVM classifier. The class will scrape the articles
 @author: dabane-ghassan
 """
 from __future__ import absolute_import
-from typing import List
+from typing import List, Optional, Union
+import os
+import time
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
+import scipy.sparse as sp
+from scipy.stats import loguniform
+from sklearn.model_selection import train_test_split, GridSearchCV, \
+    RandomizedSearchCV
+from sklearn.feature_extraction.text import TfidfVectorizer, \
+    CountVectorizer, TfidfTransformer
 from sklearn.svm import LinearSVC
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, average_precision_score, \
+    roc_auc_score, f1_score, log_loss
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.utils import shuffle
 from joblib import dump
 from preprocessor import Preprocessor
 from scraper import Scraper
+from cache import ArticleCache, TokenCache
+from feature_store import FeatureStore
+from linear_scorer import LinearScorer
 
 class Model:
     """A class to represent the architecture of CAZy's little helper,
@@ -47,26 +57,72 @@ class Model:
     
     processor: cazy_little_helper.preprocessor.Preprocessor
         A preprocessor object to clean and tokenize documents.
+
+    stream : bool
+        Whether the documents are preprocessed as a stream.
+
+    search : Optional[str]
+        The hyperparameter search, 'grid', 'random' or None to train the
+        default architecture.
+
+    n_iter : int
+        The number of settings tried by the random search.
+
+    features : Optional[str]
+        The path of the feature store of the dataset, None to train on the
+        preprocessed documents.
+
+    previous : Optional[str]
+        The path of the model updated with the dataset, None for a new
+        model.
         
-    X_train: List[str]
-        The training dataset.
+    X_train: Union[List[List[str]], scipy.sparse.csr_matrix]
+        The training dataset, preprocessed token lists, or their term
+        counts with a feature store.
 
     y_train: List[int]
         The training labels.
         
-    X_val: List[str]
-        The validation dataset.
+    X_val: Union[List[List[str]], scipy.sparse.csr_matrix]
+        The validation dataset, preprocessed token lists, or their term
+        counts with a feature store.
 
     y_val: List[int]
         The validation labels.
 
     """
+    SEARCH_GRID = {
+        "tfidf_transformation__sublinear_tf": [False, True],
+        "tfidf_transformation__use_idf": [True, False],
+        "classifier__estimator__C": [0.1, 1, 10, 100],
+        "classifier__method": ["sigmoid", "isotonic"]
+        }
+    SEARCH_DISTRIBUTIONS = dict(SEARCH_GRID, **{
+        "classifier__estimator__C": loguniform(1e-2, 1e3)})
+    SEARCH_METRICS = ["average_precision", "roc_auc", "f1", "neg_log_loss"]
+    # an update fits the SVM again on the whole store, it can't be
+    # warm-started
+    REFIT = True
+
     def __init__(
         self: object,
         path: str,
         dataset: str,
         biblio_address: str,
-        val_size: float
+        val_size: float,
+        workers: int=1,
+        rate: Optional[float]=1/3,
+        cache: Optional[str]=None,
+        resume: bool=False,
+        adaptive: bool=False,
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        stream: bool=False,
+        token_cache: Optional[str]=None,
+        search: Optional[str]=None,
+        n_iter: int=20,
+        features: Optional[str]=None,
+        previous: Optional[str]=None
     ) -> None:
         """Class constructor.
 
@@ -80,6 +136,52 @@ class Model:
             The path of the biblio package.
         val_size : float
             Validation dataset size.
+        workers : int, optional
+            Number of threads used to scrape articles. The default is 1.
+        rate : Optional[float], optional
+            Maximum requests per second sent to Biblio, None for no limit.
+            The default is 1/3.
+        cache : Optional[str], optional
+            The path of an on-disk article cache shared between runs. The
+            default is None (no cache).
+        resume : bool, optional
+            Resume the scraping of a previous run, finished articles are
+            skipped and failed ones retried. The default is False.
+        adaptive : bool, optional
+            Adapt the number of requests in flight (up to workers) to the
+            latency and errors of the upstream services. The default is
+            False.
+        processes : int, optional
+            Number of processes used to preprocess documents. The default
+            is 1.
+        chunk_size : Optional[int], optional
+            Number of documents sent to a preprocessing process at once. The
+            default is None (about four chunks per process).
+        stream : bool, optional
+            Fit the phrasers in two streamed passes and preprocess the
+            documents one at a time, so that only the final documents
+            are held in memory. The default is False.
+        token_cache : Optional[str], optional
+            The path of an on-disk cache of preprocessed documents shared
+            between runs. The default is None (no cache).
+        search : Optional[str], optional
+            Search the hyperparameters, 'grid' or 'random'. The default is
+            None (the default architecture).
+        n_iter : int, optional
+            Settings tried by the random search. The default is 20.
+        features : Optional[str], optional
+            The path of a feature store, loaded instead of scraping and
+            preprocessing the articles if it exists, created otherwise. The
+            default is None (no store).
+        previous : Optional[str], optional
+            The path of a model to update with the articles of the dataset,
+            the new or relabelled ones, trained on the feature store. The
+            default is None (a new model on the dataset).
+
+        Raises
+        ------
+        Exception
+            If a model is updated without its feature store.
 
         Returns
         -------
@@ -91,23 +193,38 @@ class Model:
         self.dataset = shuffle(pd.read_csv(dataset))
         self.val_size = val_size
         self.architecture = Pipeline([
-            ("tfidf_vectorization", TfidfVectorizer()),
+            ("tfidf_vectorization", TfidfVectorizer(
+                analyzer=Preprocessor.passthrough)),
             ("classifier", CalibratedClassifierCV(LinearSVC(C=10)))
             ])
-        self.scraper = Scraper(dataset, biblio_address)
-        self.processor = Preprocessor()
+        self.scraper = Scraper(dataset, biblio_address, workers, rate,
+                               cache=ArticleCache(cache) if cache else None,
+                               resume=resume, adaptive=adaptive)
+        self.processor = Preprocessor(
+            processes=processes, chunk_size=chunk_size,
+            cache=TokenCache(token_cache) if token_cache else None)
+        self.processor.load(Preprocessor.artifact(path), table_only=True)
+        self.stream = stream
+        self.search = search
+        self.n_iter = n_iter
+        if previous and not FeatureStore.exists(features):
+            raise Exception("A model can only be updated with the feature \
+store it was trained on")
+        self.features = features
+        self.previous = previous
         self.__X_train, self.__y_train = None, None
         self.__X_val, self.__y_val = None, None
+        self.__store = None
 
     @property
     def X_train(
         self: object
-    ) -> List[str]:
+    ) -> Union[List[List[str]], sp.csr_matrix]:
         """X_train property getter.
 
         Returns
         -------
-        List[str]
+        Union[List[List[str]], sp.csr_matrix]
             The training set.
 
         """
@@ -116,13 +233,13 @@ class Model:
     @X_train.setter
     def X_train(
         self: object,
-        param_x_train: List[str]
+        param_x_train: Union[List[List[str]], sp.csr_matrix]
     ) -> None:
         """X_train property setter.
 
         Parameters
         ----------
-        param_x_train : List[str]
+        param_x_train : Union[List[List[str]], sp.csr_matrix]
             The new value.
 
         Returns
@@ -170,12 +287,12 @@ class Model:
     @property
     def X_val(
         self: object
-    ) -> List[str]:
+    ) -> Union[List[List[str]], sp.csr_matrix]:
         """X_val property getter.
 
         Returns
         -------
-        List[str]
+        Union[List[List[str]], sp.csr_matrix]
             The validation set.
 
         """
@@ -184,13 +301,13 @@ class Model:
     @X_val.setter
     def X_val(
         self: object,
-        param_x_val: List[str]
+        param_x_val: Union[List[List[str]], sp.csr_matrix]
     ) -> None:
         """X_val property setter.
 
         Parameters
         ----------
-        param_x_val : List[str]
+        param_x_val : Union[List[List[str]], sp.csr_matrix]
             The new value.
 
         Returns
@@ -235,22 +352,49 @@ class Model:
         """
         self.__y_val = param_y_val
 
-    def dataset_prep(
+    @property
+    def store(
         self: object
+    ) -> Optional[FeatureStore]:
+        """store property getter.
+
+        Returns
+        -------
+        Optional[FeatureStore]
+            The feature store of the training and validation counts, None
+            without one.
+
+        """
+        return self.__store
+
+    def scrape(
+        self: object,
+        merge: bool=True
     ) -> None:
-        """This method prepares the dataset for training, first start by
-        scraping articles using the bilbio tool, then process to parse them
-        and preprocess them for training (including tokenization), then lastly
-        finish by splitting it into a training and validation datasets.
+        """This method scrapes the articles of the dataset using the biblio
+        tool and adds their documents (title and text) to the dataset.
+
+        Parameters
+        ----------
+        merge : bool, optional
+            Whether the documents are added to the dataset, otherwise they
+            are only written to the text dataset. The default is True.
 
         Returns
         -------
         None
-            Sets the training and validation object properties.
+            Sets the "docs" column of the dataset.
 
         """
         print("Scraping articles...")
         self.scraper.scrape_biblio(self.dataset.id.to_list())
+        if self.scraper.cache:
+            print(self.scraper.cache.stats())
+        print(self.scraper.client.stats())
+        if self.scraper.controller:
+            print(self.scraper.controller.stats())
+        if not merge:
+            return
 
         print("Parsing scraped documents and preparing the dataset...")
         df_data_text = pd.read_csv(self.scraper.text_dataset)
@@ -261,15 +405,160 @@ class Model:
                           inplace=True, axis=1)
         self.dataset = pd.merge(self.dataset, df_data_text, on='id')
 
-        print("Preprocessing documents for training...")
-        self.processor.docs = self.dataset.docs.to_list()
-        data_words = self.processor.pipeline()
+    def dataset_prep(
+        self: object
+    ) -> None:
+        """This method prepares the dataset for training, first start by
+        scraping articles using the bilbio tool, then process to parse them
+        and preprocess them for training (including tokenization), then lastly
+        finish by splitting it into a training and validation datasets. With
+        a feature store, the term counts of the documents are saved to it, or
+        loaded from it when it exists instead of scraping and preprocessing.
+
+        Returns
+        -------
+        None
+            Sets the training and validation object properties.
+
+        """
+        if FeatureStore.exists(self.features):
+            self.load_features()
+            return
+
+        self.scrape()
+        data_words = self.preprocess()
+
+        if self.features:
+            store = FeatureStore.build(data_words, self.dataset)
+            print("The feature store was saved to %s" % (store.save(
+                self.features, self.processor)))
+            self.__use_store(store)
+            data_words = store.counts
 
         self.X_train, self.X_val, self.y_train, self.y_val = train_test_split(
-           np.array([" ".join(doc) for doc in data_words]),
+           data_words,
            self.dataset.label.values,
            test_size=self.val_size)
 
+    def preprocess(
+        self: object
+    ) -> List[List[str]]:
+        """This method preprocesses the documents of the dataset, the
+        phrasers are fitted on them unless they were loaded.
+
+        Returns
+        -------
+        List[List[str]]
+            The preprocessed documents.
+
+        """
+        print("Preprocessing documents for training...")
+        self.processor.docs = self.dataset.docs.to_list()
+        if self.stream:
+            if self.processor.phrasers is None:
+                self.processor.fit()
+            data_words = self.processor.stream()
+        else:
+            data_words = self.processor.pipeline()
+
+        data_words = list(data_words)
+        if self.processor.cache:
+            print(self.processor.cache.stats())
+        return data_words
+
+    def load_features(
+        self: object
+    ) -> None:
+        """This method loads the term counts of the dataset's articles from
+        the feature store, with the preprocessor that produced them. Only
+        the articles of the dataset missing from the store are scraped and
+        preprocessed (with the phrasers of the store), and added to it; the
+        labels of the dataset replace the stored ones. The counts are then
+        split into a training and validation datasets. When updating a
+        previous model, the validation dataset is a part of the articles new
+        to the store, which the previous model can't have been trained on,
+        and the model is trained on the rest of the store (REFIT) or only on
+        the rest of the dataset's articles.
+
+        Raises
+        ------
+        Exception
+            If a model is updated without new articles to validate it on.
+
+        Returns
+        -------
+        None
+            Sets the training and validation object properties.
+
+        """
+        print("Loading the feature store %s..." % (self.features))
+        store = FeatureStore.load(self.features)
+        self.processor.load(Preprocessor.artifact(self.features))
+        dataset = self.dataset
+        missing = store.rows(dataset.id.to_list()) < 0
+        added = 0
+        if missing.any():
+            print("%d articles of the dataset are not in the feature store" % (
+                missing.sum()))
+            self.dataset = dataset[missing]
+            self.scrape()
+            if len(self.dataset):
+                store = store.add(self.preprocess(), self.dataset)
+                added = len(self.dataset)
+        relabelled = store.relabel(dataset)
+        if added or relabelled:
+            print("%d articles added and %d relabelled, the feature store was \
+saved to %s" % (added, relabelled, store.save(self.features,
+                                               self.processor)))
+
+        rows = store.rows(dataset.id.to_list())
+        self.dataset = dataset[rows >= 0]
+        rows = rows[rows >= 0]
+        self.__use_store(store)
+        print("%d articles, %d terms" % (len(self.dataset),
+                                         len(store.terms)))
+
+        if not self.previous:
+            self.X_train, self.X_val, self.y_train, self.y_val = \
+                train_test_split(store.counts[rows],
+                                 self.dataset.label.values,
+                                 test_size=self.val_size)
+            return
+        if not added:
+            raise Exception("None of the articles of the dataset is new to \
+the feature store, the update can't be validated")
+        _, val = train_test_split(np.arange(len(store) - added, len(store)),
+                                  test_size=self.val_size)
+        train = np.setdiff1d(np.arange(len(store)) if self.REFIT else rows,
+                             val)
+        labels = store.index.label.to_numpy()
+        self.X_train, self.X_val = store.counts[train], store.counts[val]
+        self.y_train, self.y_val = labels[train], labels[val]
+        print("Updating %s: trained on %d articles, validated on %d new \
+ones" % (self.previous, len(train), len(val)))
+
+    def __use_store(
+        self: object,
+        store: FeatureStore
+    ) -> None:
+        """Trains on the term counts of a store, its vocabulary is the first
+        step of the architecture."""
+        self.__store = store
+        self.architecture = Pipeline([
+            ("count_vectorization", store.vectorizer()),
+            ("tfidf_transformation", TfidfTransformer()),
+            ("classifier", CalibratedClassifierCV(LinearSVC(C=10)))
+            ])
+
+    def __trained(
+        self: object
+    ) -> Pipeline:
+        """The steps of the architecture fitted on the training dataset, all
+        but the term counting with a feature store."""
+        if isinstance(self.X_train, sp.spmatrix):
+            return self.architecture[1:]
+        return self.architecture
+
     def fit(
         self: object
     ) -> None:
@@ -281,7 +570,68 @@ class Model:
             Fits the architecture property.
 
         """
-        self.architecture.fit(self.X_train, self.y_train)
+        self.__trained().fit(self.X_train, self.y_train)
+
+    def tune(
+        self: object
+    ) -> None:
+        """This method searches the TF-IDF options, the regularization of the
+        SVM and the calibration method by cross-validation on the training
+        dataset, on all cores. The terms are counted once, every fold and
+        setting then only weighs the cached counts (the counts of the feature
+        store when there is one). A report of the time
+        and metrics of every setting is written to '<model>_search.csv', and
+        the best setting is refitted on the whole training dataset.
+
+        Returns
+        -------
+        None
+            Sets the architecture property to the best pipeline.
+
+        """
+        start = time.perf_counter()
+        if isinstance(self.X_train, sp.spmatrix):
+            counts, X_train = self.architecture.steps[0][1], self.X_train
+        else:
+            print("Counting terms for the search...")
+            counts = CountVectorizer(analyzer=Preprocessor.passthrough)
+            X_train = counts.fit_transform(self.X_train)
+        vectorization = time.perf_counter() - start
+
+        candidate = Pipeline([
+            ("tfidf_transformation", TfidfTransformer()),
+            ("classifier", CalibratedClassifierCV(LinearSVC(C=10)))
+            ])
+        if self.search == "random":
+            search = RandomizedSearchCV(
+                candidate, Model.SEARCH_DISTRIBUTIONS, n_iter=self.n_iter,
+                scoring=Model.SEARCH_METRICS, refit=Model.SEARCH_METRICS[0],
+                n_jobs=-1)
+        else:
+            search = GridSearchCV(
+                candidate, Model.SEARCH_GRID, scoring=Model.SEARCH_METRICS,
+                refit=Model.SEARCH_METRICS[0], n_jobs=-1)
+        print("Searching hyperparameters (%s search) on all cores..." % (
+            self.search))
+        start = time.perf_counter()
+        search.fit(X_train, self.y_train)
+        elapsed = time.perf_counter() - start
+
+        report = pd.DataFrame(search.cv_results_)
+        report = report[[column for column in report.columns if
+                         column.startswith(("param_", "mean_", "std_",
+                                            "rank_"))]]
+        report = report.sort_values("rank_test_%s" % (
+            Model.SEARCH_METRICS[0]))
+        path = "%s_search.csv" % (os.path.splitext(self.path)[0])
+        report.to_csv(path, index=False)
+        print("Terms counted in %.1f s, %d settings searched in %.1f s, the \
+report was saved to %s" % (vectorization, len(report), elapsed, path))
+        print("Best setting (%s %.3f): %s" % (
+            Model.SEARCH_METRICS[0], search.best_score_, search.best_params_))
+
+        self.architecture = Pipeline([("count_vectorization", counts)] +
+                                     search.best_estimator_.steps)
 
     def performance(
         self: object
@@ -296,21 +646,61 @@ class Model:
 
         """
         print(classification_report(self.y_val,
-                                    self.architecture.predict(self.X_val)))
+                                    self.__trained().predict(self.X_val)))
+        if self.previous:
+            print(self.compare())
+
+    def compare(
+        self: object
+    ) -> pd.DataFrame:
+        """This method compares the model to the previous one on the
+        validation dataset, both are compiled and the stored counts are
+        projected on the vocabulary of each.
+
+        Returns
+        -------
+        pd.DataFrame
+            The average precision, ROC-AUC, f1-score and log loss of the
+            previous and the updated model.
+
+        """
+        # only the terms of the validation articles are projected
+        used = np.unique(self.X_val.indices)
+        X_val = self.X_val[:, used]
+        terms = [self.__store.terms[i] for i in used]
+        probas = {}
+        for name, model in [("previous", LinearScorer.load(self.previous)),
+                            ("updated", self.architecture)]:
+            if not isinstance(model, LinearScorer):
+                model = LinearScorer.compile(model)
+            probas[name] = model.predict_proba(model.project(X_val, terms))[
+                :, 1]
+        metrics = {"average_precision": average_precision_score,
+                   "roc_auc": roc_auc_score,
+                   "f1": lambda y, proba: f1_score(y, proba > 0.5),
+                   "log_loss": lambda y, proba: log_loss(y, proba,
+                                                         labels=[0, 1])}
+        return pd.DataFrame({name: [metric(self.y_val, proba) for metric
+                                    in metrics.values()]
+                             for name, proba in probas.items()},
+                            index=list(metrics))
 
     def save(
         self: object
     ) -> None:
-        """Saves the model to the specified path with joblib.
+        """Saves the model to the specified path with joblib, and the
+        normalization table of the preprocessor alongside it.
 
         Returns
         -------
         None
-            Prints the save path of the model.
+            Prints the save paths of the model and the table.
 
         """
         print("The model was saved to %s" % (dump(self.architecture,
                                                   self.path)[0]))
+        print("The preprocessor was saved to %s" % (self.processor.save(
+            Preprocessor.artifact(self.path))))
 
     @classmethod
     def create_model(
@@ -318,7 +708,20 @@ class Model:
         path: str,
         dataset: str,
         biblio_address: str  ,
-        val_size: float
+        val_size: float,
+        workers: int=1,
+        rate: Optional[float]=1/3,
+        cache: Optional[str]=None,
+        resume: bool=False,
+        adaptive: bool=False,
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        stream: bool=False,
+        token_cache: Optional[str]=None,
+        search: Optional[str]=None,
+        n_iter: int=20,
+        features: Optional[str]=None,
+        previous: Optional[str]=None
     ) -> object:
         """A class method to construct a model and train it with a one-liner.
 
@@ -334,6 +737,46 @@ class Model:
             The path of the biblio package.
         val_size : float
             Validation dataset size.
+        workers : int, optional
+            Number of threads used to scrape articles. The default is 1.
+        rate : Optional[float], optional
+            Maximum requests per second sent to Biblio, None for no limit.
+            The default is 1/3.
+        cache : Optional[str], optional
+            The path of an on-disk article cache shared between runs. The
+            default is None (no cache).
+        resume : bool, optional
+            Resume the scraping of a previous run, finished articles are
+            skipped and failed ones retried. The default is False.
+        adaptive : bool, optional
+            Adapt the number of requests in flight (up to workers) to the
+            latency and errors of the upstream services. The default is
+            False.
+        processes : int, optional
+            Number of processes used to preprocess documents. The default
+            is 1.
+        chunk_size : Optional[int], optional
+            Number of documents sent to a preprocessing process at once. The
+            default is None (about four chunks per process).
+        stream : bool, optional
+            Fit the phrasers in two streamed passes and preprocess the
+            documents one at a time, so that only the final documents
+            are held in memory. The default is False.
+        token_cache : Optional[str], optional
+            The path of an on-disk cache of preprocessed documents shared
+            between runs. The default is None (no cache).
+        search : Optional[str], optional
+            Search the hyperparameters, 'grid' or 'random', instead of
+            training the default architecture. The default is None.
+        n_iter : int, optional
+            Settings tried by the random search. The default is 20.
+        features : Optional[str], optional
+            The path of a feature store, loaded instead of scraping and
+            preprocessing the articles if it exists, created otherwise. The
+            default is None (no store).
+        previous : Optional[str], optional
+            The path of a model to update with the articles of the dataset,
+            trained on the feature store. The default is None.
 
         Returns
         -------
@@ -341,9 +784,14 @@ class Model:
             A class instance.
 
         """
-        model = cls(path, dataset, biblio_address, val_size)
+        model = cls(path, dataset, biblio_address, val_size, workers, rate,
+                    cache, resume, adaptive, processes, chunk_size, stream,
+                    token_cache, search, n_iter, features, previous)
         model.dataset_prep()
-        model.fit()
+        if search:
+            model.tune()
+        else:
+            model.fit()
         model.performance()
         model.save()
         return model
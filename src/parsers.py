@@ -72,6 +72,89 @@ on the php server, default is http://10.1.22.212/Biblio")
 predictions, default is the CAZy's little helper already trained model \
 based on Aug 2021 data, '../model/cazy_helper.joblib'")
 
+        parser.add_argument('-w','--workers',
+                            type=int,
+                            required=False,
+                            default=1,
+                            help="[OPTIONAL] The number of threads used to \
+scrape articles concurrently, default is 1")
+
+        parser.add_argument('-r','--rate',
+                            type=float,
+                            required=False,
+                            default=1/3,
+                            help="[OPTIONAL] The maximum number of requests \
+per second sent to the biblio package, 0 for no limit, default is 1/3 \
+(one article every 3 seconds)")
+
+        parser.add_argument('-c','--cache',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of an on-disk article \
+cache (SQLite), articles found in it are not scraped again, default is None \
+(no cache)")
+
+        parser.add_argument('--resume',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Resume an interrupted run on the \
+same input, finished articles are skipped and failed ones are retried, the \
+articles that never succeeded are listed in '<input>_failed.csv'")
+
+        parser.add_argument('--adaptive',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Adapt the number of requests in \
+flight (up to the number of workers) to the latency and errors of the \
+upstream services, backing off on throttling")
+
+        parser.add_argument('-j','--processes',
+                            type=int,
+                            required=False,
+                            default=1,
+                            help="[OPTIONAL] The number of processes used to \
+preprocess documents in parallel, default is 1")
+
+        parser.add_argument('--chunk_size',
+                            type=int,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The number of documents sent to a \
+preprocessing process at once, default is about four chunks per process")
+
+        parser.add_argument('--stream',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Preprocess and score the \
+documents as a stream, by chunks of chunk_size (1000 by default), so that \
+memory does not grow with the number of articles")
+
+        parser.add_argument('-k','--token_cache',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of an on-disk cache \
+(SQLite) of preprocessed documents, documents found in it are not \
+preprocessed again, default is None (no cache)")
+
+        parser.add_argument('-x','--index',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of a local ID mapping \
+index (SQLite), IDs found in it are not converted again, default is None \
+(no index)")
+
+        parser.add_argument('-s','--server',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The address of a running scoring \
+service (serve.py), e.g. http://127.0.0.1:8421, the prediction is run by the \
+service with its warm model (-m, -j, --chunk_size, --stream and -k are the \
+service's), default is None (run locally)")
+
         return parser
 
     @staticmethod
@@ -117,6 +200,324 @@ a .csv file with a column of article IDs")
                             help="[REQUIRED] The type of ID to find, \
 ['PMID', 'PMCID', 'DOI'], uppercase only")
 
+        parser.add_argument('-x','--index',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of a local ID mapping \
+index (SQLite), IDs found in it are not converted again, default is None \
+(no index)")
+
+        return parser
+
+    @staticmethod
+    def load_index(
+    ) -> ArgumentParser:
+        """The load_index CLI parser.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        ArgumentParser
+            Parser class instance.
+
+        """
+        describe= "Welcome to CAZy's little helper ▼(´ᴥ`)▼ !\n\
+The biocuration assistant of the CAZy database, woof woof.\n\
+This special functionality fills the local ID mapping index with the output \
+files of find_ids (two columns, 'id' and one of 'PMID', 'PMCID' or 'DOI'), \
+so these IDs are not converted again by the prediction pipeline or find_ids.\n\
+Please visit https://github.com/dabane-ghassan/cazy-little-helper \
+for more information about the package."
+
+        parser = ArgumentParser(add_help=True,
+                                         description=describe,
+                                         formatter_class=RawTextHelpFormatter)
+
+        parser.add_argument('-x','--index',
+                            type=str,
+                            required=True,
+                            default=sys.stdin,
+                            help="[REQUIRED] The path of the ID mapping index, \
+created if it does not exist.")
+
+        parser.add_argument('-i','--input_paths',
+                            type=str,
+                            nargs='+',
+                            required=True,
+                            default=sys.stdin,
+                            help="[REQUIRED] One or more find_ids output \
+files.")
+
+        return parser
+
+    @staticmethod
+    def clear_cache(
+    ) -> ArgumentParser:
+        """The clear_cache CLI parser.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        ArgumentParser
+            Parser class instance.
+
+        """
+        describe= "Welcome to CAZy's little helper ▼(´ᴥ`)▼ !\n\
+The biocuration assistant of the CAZy database, woof woof.\n\
+This special functionality invalidates the cache of preprocessed documents, \
+entirely or only the documents that a given model can't use anymore.\n\
+Please visit https://github.com/dabane-ghassan/cazy-little-helper \
+for more information about the package."
+
+        parser = ArgumentParser(add_help=True,
+                                         description=describe,
+                                         formatter_class=RawTextHelpFormatter)
+
+        parser.add_argument('-k','--token_cache',
+                            type=str,
+                            required=True,
+                            default=sys.stdin,
+                            help="[REQUIRED] The path of the cache of \
+preprocessed documents.")
+
+        parser.add_argument('-m','--model',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] Keep the documents preprocessed \
+with the phrasers of this model (and the normalized documents of the current \
+preprocessing), default is None (remove everything)")
+
+        parser.add_argument('-d','--days',
+                            type=float,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] Only remove the documents cached \
+more than this many days ago, default is None (any age)")
+
+        return parser
+
+    @staticmethod
+    def compile_model(
+    ) -> ArgumentParser:
+        """The compile_model CLI parser.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        ArgumentParser
+            Parser class instance.
+
+        """
+        describe= "Welcome to CAZy's little helper ▼(´ᴥ`)▼ !\n\
+The biocuration assistant of the CAZy database, woof woof.\n\
+This special functionality compiles a trained model into a compact linear \
+scorer, which gives the same confidence scores faster, and can be given to \
+predict.py instead of the model, optionally in a memory-mapped format.\n\
+Please visit https://github.com/dabane-ghassan/cazy-little-helper \
+for more information about the package."
+
+        parser = ArgumentParser(add_help=True,
+                                         description=describe,
+                                         formatter_class=RawTextHelpFormatter)
+
+        parser.add_argument('-m','--model',
+                            type=str,
+                            required=True,
+                            default=sys.stdin,
+                            help="[REQUIRED] The path of the trained model.")
+
+        parser.add_argument('-o','--output_path',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The save path of the compiled \
+model, default is '<model>_compiled.joblib' ('<model>_compiled' with \
+--native)")
+
+        parser.add_argument('-n','--native',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Save the compiled model in the \
+native format, a directory of arrays memory-mapped by predict.py, which \
+loads faster and is shared by the processes using it; the model can also be \
+an already compiled .joblib model")
+
+        return parser
+
+    @staticmethod
+    def compact_model(
+    ) -> ArgumentParser:
+        """The compact_model CLI parser.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        ArgumentParser
+            Parser class instance.
+
+        """
+        describe= "Welcome to CAZy's little helper ▼(´ᴥ`)▼ !\n\
+The biocuration assistant of the CAZy database, woof woof.\n\
+This special functionality compacts a model into a smaller compiled model, \
+the terms of the vocabulary that weigh little or are rare are pruned and the \
+weights are stored in a reduced precision; the size, load time, scoring \
+throughput and scores of both models are compared.\n\
+Please visit https://github.com/dabane-ghassan/cazy-little-helper \
+for more information about the package."
+
+        parser = ArgumentParser(add_help=True,
+                                         description=describe,
+                                         formatter_class=RawTextHelpFormatter)
+
+        parser.add_argument('-m','--model',
+                            type=str,
+                            required=True,
+                            default=sys.stdin,
+                            help="[REQUIRED] The path of the model, trained \
+or compiled.")
+
+        parser.add_argument('-o','--output_path',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The save path of the compacted \
+model, default is '<model>_compact.joblib' ('<model>_compact' with --native)")
+
+        parser.add_argument('-w','--min_weight',
+                            type=float,
+                            required=False,
+                            default=0.0,
+                            help="[OPTIONAL] Prune the terms whose absolute \
+weight is below this value in every fold of the classifier, default is 0 \
+(no pruning)")
+
+        parser.add_argument('--min_df',
+                            type=float,
+                            required=False,
+                            default=0.0,
+                            help="[OPTIONAL] Prune the terms found in less \
+than this proportion of the training articles (derived from their IDF), \
+default is 0 (no pruning)")
+
+        parser.add_argument('-q','--precision',
+                            type=str,
+                            required=False,
+                            default="float16",
+                            choices=["float64", "float32", "float16", "int8"],
+                            help="[OPTIONAL] The precision of the weights, \
+int8 weights are scaled by fold, default is 'float16'")
+
+        parser.add_argument('-n','--native',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Save the compacted model in the \
+native format, a directory of arrays memory-mapped by predict.py")
+
+        parser.add_argument('-d','--dataset',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] A scraped dataset to compare the \
+scores of both models on, a .csv file of 'id' and 'label' columns with its \
+'<dataset>_text.csv' (as left by create.py), default is None (only the size \
+and load time are compared)")
+
+        return parser
+
+    @staticmethod
+    def serve(
+    ) -> ArgumentParser:
+        """The serve CLI parser.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        ArgumentParser
+            Parser class instance.
+
+        """
+        describe= "Welcome to CAZy's little helper ▼(´ᴥ`)▼ !\n\
+The biocuration assistant of the CAZy database, woof woof.\n\
+This special functionality runs a local scoring service which keeps the \
+model loaded between predictions, predict.py sends it its input with \
+--server; the requests received together are scored together, and the model \
+is reloaded when its files change.\n\
+Please visit https://github.com/dabane-ghassan/cazy-little-helper \
+for more information about the package."
+
+        parser = ArgumentParser(add_help=True,
+                                         description=describe,
+                                         formatter_class=RawTextHelpFormatter)
+
+        parser.add_argument('-m','--model',
+                                type=str,
+                                required=False,
+                                default="../model/cazy_helper.joblib",
+                                help="[OPTIONAL] The model path to serve, a \
+trained or a compiled model, default is the CAZy's little helper already \
+trained model based on Aug 2021 data, '../model/cazy_helper.joblib'")
+
+        parser.add_argument('--host',
+                            type=str,
+                            required=False,
+                            default="127.0.0.1",
+                            help="[OPTIONAL] The address to listen on, default \
+is 127.0.0.1 (only local clients)")
+
+        parser.add_argument('--port',
+                            type=int,
+                            required=False,
+                            default=8421,
+                            help="[OPTIONAL] The port to listen on, default is \
+8421")
+
+        parser.add_argument('-k','--token_cache',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of an on-disk cache \
+(SQLite) of preprocessed documents, documents found in it are not \
+preprocessed again, default is None (no cache)")
+
+        parser.add_argument('--max_batch',
+                            type=int,
+                            required=False,
+                            default=100,
+                            help="[OPTIONAL] The maximum number of documents \
+scored at once, default is 100")
+
+        parser.add_argument('--max_delay',
+                            type=float,
+                            required=False,
+                            default=10,
+                            help="[OPTIONAL] The time in milliseconds a batch \
+waits for other requests, default is 10")
+
+        parser.add_argument('--interval',
+                            type=float,
+                            required=False,
+                            default=2,
+                            help="[OPTIONAL] The time in seconds between two \
+checks of the model files, which is reloaded when they change, 0 to only \
+reload on demand (POST /reload), default is 2")
+
         return parser
 
     @staticmethod
@@ -175,4 +576,118 @@ on the php server, default is http://10.1.22.212/Biblio")
                             help="[OPTIONAL] The validation dataset size, \
 default is 0.15")
 
+        parser.add_argument('-w','--workers',
+                            type=int,
+                            required=False,
+                            default=1,
+                            help="[OPTIONAL] The number of threads used to \
+scrape articles concurrently, default is 1")
+
+        parser.add_argument('-r','--rate',
+                            type=float,
+                            required=False,
+                            default=1/3,
+                            help="[OPTIONAL] The maximum number of requests \
+per second sent to the biblio package, 0 for no limit, default is 1/3 \
+(one article every 3 seconds)")
+
+        parser.add_argument('-c','--cache',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of an on-disk article \
+cache (SQLite), articles found in it are not scraped again, default is None \
+(no cache)")
+
+        parser.add_argument('--resume',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Resume an interrupted run on the \
+same input, finished articles are skipped and failed ones are retried, the \
+articles that never succeeded are listed in '<input>_failed.csv'")
+
+        parser.add_argument('--adaptive',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Adapt the number of requests in \
+flight (up to the number of workers) to the latency and errors of the \
+upstream services, backing off on throttling")
+
+        parser.add_argument('-j','--processes',
+                            type=int,
+                            required=False,
+                            default=1,
+                            help="[OPTIONAL] The number of processes used to \
+preprocess documents in parallel, default is 1")
+
+        parser.add_argument('--chunk_size',
+                            type=int,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The number of documents sent to a \
+preprocessing process at once, default is about four chunks per process")
+
+        parser.add_argument('--stream',
+                            action='store_true',
+                            required=False,
+                            help="[OPTIONAL] Preprocess the training \
+documents as a stream, so that only the final documents are held in memory")
+
+        parser.add_argument('-k','--token_cache',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of an on-disk cache \
+(SQLite) of preprocessed documents, documents found in it are not \
+preprocessed again, default is None (no cache)")
+
+        parser.add_argument('-a','--architecture',
+                            type=str,
+                            required=False,
+                            default="tfidf_svm",
+                            choices=["tfidf_svm", "hashing_sgd"],
+                            help="[OPTIONAL] The model architecture, \
+'tfidf_svm' (TF-IDF/SVM trained in memory) or 'hashing_sgd' (hashed TF-IDF \
+and a linear SVM trained by mini-batches from disk, for training sets that \
+do not fit in memory), default is 'tfidf_svm'")
+
+        parser.add_argument('--search',
+                            type=str,
+                            required=False,
+                            default=None,
+                            choices=["grid", "random"],
+                            help="[OPTIONAL] Search the TF-IDF options, the \
+regularization of the SVM and the calibration method by cross-validation on \
+all cores ('grid' or 'random', tfidf_svm only), the terms are counted once \
+for all the settings, a report is written to '<output>_search.csv' and the \
+best model is saved, default is None (no search)")
+
+        parser.add_argument('--n_iter',
+                            type=int,
+                            required=False,
+                            default=20,
+                            help="[OPTIONAL] The number of settings tried by \
+the random search, default is 20")
+
+        parser.add_argument('-f','--features',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of a feature store (a \
+directory), the term counts of the dataset's articles are saved to it, and \
+loaded from it when it exists to train again without scraping and \
+preprocessing, default is None (no store)")
+
+        parser.add_argument('-u','--update',
+                            type=str,
+                            required=False,
+                            default=None,
+                            help="[OPTIONAL] The path of a model to update \
+with the new or relabelled articles of the dataset: only the articles \
+missing from the feature store (-f, required) are scraped and preprocessed, \
+a hashing_sgd model is trained further on the dataset's articles only, a \
+tfidf_svm model is trained again on the whole store (its SVM can't be \
+warm-started), and both are validated against the previous model on a part \
+of the articles new to the store, default is None (a new model)")
+
         return parser
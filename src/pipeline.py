@@ -6,14 +6,17 @@ Pipeline class for predictions.
 @author: dabane-ghassan
 """
 from __future__ import absolute_import
+from typing import Optional
 import os
-import numpy as np
 import pandas as pd
-from metapub.pubmedcentral import get_pmcid_for_otherid
 from scraper import Scraper
-from preprocessor import Preprocessor
+from cache import ArticleCache, TokenCache
 from scorer import Scorer
 from toolkit import Toolkit
+from converter import IdConverter
+from idindex import IdIndex
+from client import HttpClient
+from batcher import Batcher
 
 class Pipeline:
     """A prediction pipeline class.
@@ -30,22 +33,51 @@ class Pipeline:
     output_data: str
         The output confidence score file path.
 
+    model: str
+        The model path, its normalization table is loaded from
+        '<model>_preprocessor.joblib' and only grows in memory, the saved
+        one is never written by a prediction.
+
+    client: cazy_little_helper.client.HttpClient
+        The HTTP client shared by the ID converter and the scraper.
+
     scraper: cazy_little_helper.scraper.Scraper
         A scraper object.
 
+    converter: cazy_little_helper.converter.IdConverter
+        An ID converter object (to find the PMCIDs of the input articles).
+
     preprocessor: cazy_little_helper.preprocessor.Preprocessor
-        A preprocessor object.
+        A preprocessor object, the one saved with the model.
 
     scorer: cazy_little_helper.scorer.Scorer
         A scorer object (to predict the confidence given a specified model).
 
+    stream: bool
+        Whether the documents are read, preprocessed and scored as a stream.
+
+    batcher: Optional[cazy_little_helper.batcher.Batcher]
+        The batcher of the scoring service that runs the pipeline, which
+        preprocesses and scores the documents instead of the scorer.
+
     """
     def __init__(
         self: object,
         input_data: str,
         id_pos: int,
         biblio_address: str,
-        model: str
+        model: str,
+        workers: int=1,
+        rate: Optional[float]=1/3,
+        cache: Optional[str]=None,
+        index: Optional[str]=None,
+        resume: bool=False,
+        adaptive: bool=False,
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        stream: bool=False,
+        token_cache: Optional[str]=None,
+        batcher: Optional[Batcher]=None
     ) -> None:
         """Class constructor.
 
@@ -59,6 +91,41 @@ class Pipeline:
             Bibliograpy tool address on the server.
         model : str
             The model that will be used to make prediction.
+        workers : int, optional
+            Number of threads used to scrape articles. The default is 1.
+        rate : Optional[float], optional
+            Maximum requests per second sent to Biblio, None for no limit.
+            The default is 1/3.
+        cache : Optional[str], optional
+            The path of an on-disk article cache shared between runs. The
+            default is None (no cache).
+        index : Optional[str], optional
+            The path of a local ID mapping index, looked up before the ID
+            Converter API. The default is None (no index).
+        resume : bool, optional
+            Resume the scraping of a previous run, finished articles are
+            skipped and failed ones retried. The default is False.
+        adaptive : bool, optional
+            Adapt the number of requests in flight (up to workers) to the
+            latency and errors of the upstream services. The default is
+            False.
+        processes : int, optional
+            Number of processes used to preprocess documents. The default
+            is 1.
+        chunk_size : Optional[int], optional
+            Number of documents sent to a preprocessing process at once. The
+            default is None (about four chunks per process).
+        stream : bool, optional
+            Preprocess the documents one at a time and score them by chunks
+            of chunk_size (1000 by default), so that memory does not grow
+            with the corpus. The default is False.
+        token_cache : Optional[str], optional
+            The path of an on-disk cache of preprocessed documents shared
+            between runs. The default is None (no cache).
+        batcher : Optional[Batcher], optional
+            The batcher of a scoring service, its warm model is used instead
+            of loading the model, which is then only the path it serves.
+            The default is None.
 
         Returns
         -------
@@ -70,9 +137,104 @@ class Pipeline:
         self.id_pos = id_pos
         self.output_data = "%s_confidence.csv" % (os.path.splitext(
             self.input_data)[0])
-        self.scraper = Scraper(self.input_data, biblio_address)
-        self.preprocessor = Preprocessor()
-        self.scorer = Scorer(model)
+        self.client = HttpClient(pool_size=max(workers, 10))
+        self.scraper = Scraper(
+            self.input_data, biblio_address, workers, rate,
+            cache=ArticleCache(cache) if cache else None, resume=resume,
+            client=self.client, adaptive=adaptive)
+        self.converter = IdConverter(
+            index=IdIndex(index) if index else None, client=self.client,
+            adaptive=adaptive)
+        self.model = model
+        self.batcher = batcher
+        self.scorer, self.preprocessor = None, None
+        if batcher is None:
+            self.scorer = Scorer(model)
+            self.preprocessor = self.scorer.preprocessor
+            self.preprocessor.processes = processes
+            self.preprocessor.chunk_size = chunk_size
+            self.preprocessor.cache = TokenCache(token_cache) if \
+                token_cache else None
+        self.stream = stream
+
+    def confidence(
+        self: object
+    ) -> pd.DataFrame:
+        """Reads, preprocesses and scores all the scraped documents at once.
+
+        Returns
+        -------
+        pd.DataFrame
+            The "id" and "%confidence" of the scraped documents.
+
+        """
+        print("Parsing scraped documents...")
+        df_data_text = pd.read_csv(self.scraper.text_dataset)
+        df_data_text  = df_data_text.fillna('')
+        df_data_text["docs"] = df_data_text["title"] + " " + \
+            df_data_text["text"]
+        df_data_text.drop(['title','text','only_abstract'],
+                          inplace=True, axis=1)
+
+        print("Preprocessing documents...")
+        self.preprocessor.docs = df_data_text.docs.to_list()
+        if self.preprocessor.phrasers is None:
+            print("No phrasers were saved with the model, fitting them on \
+this batch")
+        fitted = self.preprocessor.phrasers
+        df_data_words = self.preprocessor.pipeline()
+        self.preprocessor.phrasers = fitted
+
+        print("Predicting confidence score...")
+        self.scorer.docs = df_data_words
+        df_data_text['%confidence'] = self.scorer.confidence()
+        return df_data_text
+
+    def stream_confidence(
+        self: object
+    ) -> pd.DataFrame:
+        """Reads the scraped documents by chunks and streams them through the
+        preprocessor and the scorer, only a chunk is held in memory.
+
+        Returns
+        -------
+        pd.DataFrame
+            The "id" and "%confidence" of the scraped documents.
+
+        """
+        chunk_size = self.preprocessor.chunk_size or 1000
+        ids = []
+
+        def documents():
+            for chunk in pd.read_csv(self.scraper.text_dataset,
+                                     dtype={"id": str}, chunksize=chunk_size):
+                chunk = chunk.fillna('')
+                ids.extend(chunk.id)
+                yield from chunk.title + " " + chunk.text
+
+        print("Streaming documents through preprocessing and prediction...")
+        confidence = list(self.scorer.stream(
+            self.preprocessor.stream(documents()), chunk_size))
+        return pd.DataFrame({"id": ids, "%confidence": confidence})
+
+    def batched_confidence(
+        self: object
+    ) -> pd.DataFrame:
+        """Sends the scraped documents to the batcher of the scoring
+        service, which scores them with the documents of other requests.
+
+        Returns
+        -------
+        pd.DataFrame
+            The "id" and "%confidence" of the scraped documents.
+
+        """
+        print("Sending documents to the scoring service...")
+        df_data_text = pd.read_csv(self.scraper.text_dataset,
+                                   dtype={"id": str}).fillna('')
+        return pd.DataFrame({"id": df_data_text.id, "%confidence":
+                             self.batcher.score((df_data_text.title + " " +
+                                                 df_data_text.text).to_list())})
 
     def run(
         self: object
@@ -91,9 +253,11 @@ class Pipeline:
         ids = df[self.id_pos].dropna()
 
         print("Trying to find PMCIDs...")
-        pmcids = ids.apply(lambda idi: pmcid if (
-            pmcid := get_pmcid_for_otherid(idi)
-            ) else "not found")
+        pmcids = pd.Series([pmcid if pmcid else "not found" for pmcid in
+                            self.converter.convert(ids.to_list(), "pmcid")],
+                           index=ids.index)
+        if self.converter.index:
+            print(self.converter.index.stats())
         df_data = pd.DataFrame(
             {"id" : ids, "pmcid": pmcids}
             ).sort_values("pmcid").reset_index(drop=True)
@@ -109,22 +273,23 @@ class Pipeline:
                 & df_data.id.astype(str).apply(
                     lambda pmid: not Toolkit.is_doi(pmid))),'id']
             )
+        if self.scraper.cache:
+            print(self.scraper.cache.stats())
+        print(self.client.stats())
+        for controller in [self.converter.controller,
+                           self.scraper.controller]:
+            if controller:
+                print(controller.stats())
 
-        print("Parsing scraped documents...")
-        df_data_text = pd.read_csv(self.scraper.text_dataset)
-        df_data_text  = df_data_text.fillna('')
-        df_data_text["docs"] = df_data_text["title"] + " " + \
-            df_data_text["text"]
-        df_data_text.drop(['title','text','only_abstract'],
-                          inplace=True, axis=1)
-
-        print("Preprocessing documents...")
-        self.preprocessor.docs = df_data_text.docs.to_list()
-        df_data_words = self.preprocessor.pipeline()
-
-        print("Predicting confidence score...")
-        self.scorer.docs = np.array([" ".join(doc) for doc in df_data_words])
-        df_data_text['%confidence'] = self.scorer.confidence()
+        if self.batcher is not None:
+            df_data_text = self.batched_confidence()
+        else:
+            if self.stream and self.preprocessor.phrasers is not None:
+                df_data_text = self.stream_confidence()
+            else:
+                df_data_text = self.confidence()
+            if self.preprocessor.cache:
+                print(self.preprocessor.cache.stats())
 
         print("Building the final beautiful results table...")
         df_data['%confidence'] = [df_data_text[
@@ -145,3 +310,21 @@ class Pipeline:
 
         print("Table saved to %s" % (self.output_data))
         new_df.to_csv(self.output_data, index=False)
+
+    def close(
+        self: object
+    ) -> None:
+        """Closes the connections of the HTTP client and the on-disk caches
+        and index opened by the pipeline.
+
+        Returns
+        -------
+        None
+
+        """
+        self.client.close()
+        for database in [self.scraper.cache, self.converter.index,
+                         self.preprocessor.cache if self.preprocessor else
+                         None]:
+            if database:
+                database.close()
@@ -7,18 +7,60 @@ little helper.
 @author: dabane-ghassan
 """
 from __future__ import absolute_import
+from typing import Optional
+import os
 from parsers import Parser
-from pipeline import Pipeline
+from service_client import ServiceClient
 
 def launch_pipeline( 
     input_data: str,
     id_pos: int,
     biblio_address: str,
     model: str,
+    workers: int,
+    rate: float,
+    cache: str,
+    index: str,
+    resume: bool,
+    adaptive: bool,
+    processes: int,
+    chunk_size: int,
+    stream: bool,
+    token_cache: str
 ) -> None:
 
-    process = Pipeline(input_data, id_pos, biblio_address, model)
-    process.run()
+    # imported here so that the thin client does not load the libraries
+    from pipeline import Pipeline
+    process = Pipeline(input_data, id_pos, biblio_address, model,
+                       workers, rate, cache, index, resume, adaptive,
+                       processes, chunk_size, stream,
+                       token_cache)
+    try:
+        process.run()
+    finally:
+        process.close()
+
+def launch_client(
+    server: str,
+    input_data: str,
+    id_pos: int,
+    biblio_address: str,
+    workers: int,
+    rate: float,
+    cache: Optional[str],
+    index: Optional[str],
+    resume: bool,
+    adaptive: bool
+) -> str:
+
+    def absolute(path):
+        return os.path.abspath(path) if path else None
+
+    return ServiceClient(server).predict({
+        "input_path": absolute(input_data), "id_pos": id_pos,
+        "biblio_add": biblio_address, "workers": workers, "rate": rate,
+        "cache": absolute(cache), "index": absolute(index),
+        "resume": resume, "adaptive": adaptive})
 
 def main(
 ) -> None:
@@ -26,8 +68,21 @@ def main(
     parser = Parser.predict()
     args = parser.parse_args()
     args = args.__dict__
+    if args["server"]:
+        output_data = launch_client(args["server"], args["input_path"],
+                                    args["id_pos"], args["biblio_add"],
+                                    args["workers"], args["rate"],
+                                    args["cache"], args["index"],
+                                    args["resume"], args["adaptive"])
+        print("Table saved to %s" % (output_data))
+        return
     launch_pipeline(args["input_path"], args["id_pos"],
-                    args["biblio_add"], args["model"])
+                    args["biblio_add"], args["model"],
+                    args["workers"], args["rate"], args["cache"],
+                    args["index"], args["resume"],
+                    args["adaptive"], args["processes"],
+                    args["chunk_size"], args["stream"],
+                    args["token_cache"])
 
 if __name__ == "__main__":
     main()
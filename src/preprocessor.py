@@ -6,13 +6,18 @@ A Preprocessor class.
 @author: dabane-ghassan
 """
 from __future__ import absolute_import
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+import hashlib
+import os
 import re
+from joblib import dump, load
 from gensim.models import Phrases
 from gensim.models.phrases import Phraser
 from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
 from nltk.stem import WordNetLemmatizer, PorterStemmer
-from typing import List, Generator, Optional
+from typing import Callable, List, Generator, Iterable, Optional, Tuple
+from cache import TokenCache
 
 class Preprocessor:
     """A preprocessing class to clean documents, tokenize, and create bi-gram
@@ -23,10 +28,42 @@ class Preprocessor:
     docs: Optional[List[str]]
         The documents to be processed, a list of strings.
 
+    processes: int
+        The number of worker processes, 1 to preprocess in this process.
+
+    chunk_size: Optional[int]
+        The number of documents sent to a worker at once, None to split the
+        corpus into about four chunks per worker.
+
+    table: dict
+        The normalization table, the stemmed and lemmatized form of every
+        token seen, saved alongside the model.
+
+    phrasers: Optional[Tuple[Phraser, Phraser]]
+        The bi- and tri-gram phrasers, fitted on the training corpus and
+        saved alongside the model, None until fitted or loaded.
+
+    cache: Optional[cazy_little_helper.cache.TokenCache]
+        An on-disk cache of preprocessed documents, None for no cache.
+
     """
+    HTML_TAG = re.compile('<.*?>')
+    URL = re.compile(r'http\S+')
+    WWW = re.compile(r'www\S+')
+    ENTREZ = re.compile(r'\{([^)]+)\}')
+    NUMBER = re.compile(r'^\d+(?:,\d*)?$')
+    TOKEN = re.compile(r'\w+')
+    EXTRA_STOP_WORDS = ['from', 'subject', 're', 'edu', 'use', 'however',
+                        'et', 'al', 'fig', 'also', 'conflict', 'interest']
+    VERSION = 1
+    __stop_words = None
+
     def __init__(
         self: object,
-        docs: Optional[List[str]]=None
+        docs: Optional[List[str]]=None,
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        cache: Optional[TokenCache]=None
     ) -> None:
         """Class constructor
 
@@ -34,6 +71,12 @@ class Preprocessor:
         ----------
         docs : Optional[List[str]], optional
             The documents to be processed. The default is None.
+        processes : int, optional
+            The number of worker processes. The default is 1.
+        chunk_size : Optional[int], optional
+            The number of documents per worker task. The default is None.
+        cache : Optional[TokenCache], optional
+            A cache of preprocessed documents. The default is None.
 
         Returns
         -------
@@ -42,6 +85,11 @@ class Preprocessor:
 
         """
         self.docs = docs
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.table = {}
+        self.phrasers = None
+        self.cache = cache
 
     @staticmethod
     def clean_doc(
@@ -62,14 +110,75 @@ class Preprocessor:
         """
         doc = str(doc).lower()
         doc = doc.replace('{html}', "")
-        cleanr = re.compile('<.*?>')
-        cleantext = re.sub(cleanr, '', doc)
-        rem_url = re.sub(r'http\S+', '', cleantext)
-        rem_www = re.sub(r'www\S+', '', rem_url)
-        rem_entrez = re.sub(r'\{([^)]+)\}', '', rem_www)
-        rem_num = re.sub(r'^\d+(?:,\d*)?$', '', rem_entrez)
+        cleantext = Preprocessor.HTML_TAG.sub('', doc)
+        rem_url = Preprocessor.URL.sub('', cleantext)
+        rem_www = Preprocessor.WWW.sub('', rem_url)
+        rem_entrez = Preprocessor.ENTREZ.sub('', rem_www)
+        rem_num = Preprocessor.NUMBER.sub('', rem_entrez)
         return rem_num
 
+    @classmethod
+    def stop_words(
+        cls: type
+    ) -> frozenset:
+        """The english NLTK stopwords and the corpus specific ones, loaded
+        once per process.
+
+        Returns
+        -------
+        frozenset
+            The stopwords.
+
+        """
+        if cls.__stop_words is None:
+            cls.__stop_words = frozenset(
+                stopwords.words('english') + cls.EXTRA_STOP_WORDS)
+        return cls.__stop_words
+
+    @staticmethod
+    def normalize(
+        doc: str
+    ) -> List[str]:
+        """Cleans, tokenizes and removes the stopwords of a document in a
+        single pass, same output as tokenize followed by remove_stopwords.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be normalized.
+
+        Returns
+        -------
+        List[str]
+            The kept tokens.
+
+        """
+        stop_words = Preprocessor.stop_words()
+        return [
+            w for w in Preprocessor.TOKEN.findall(Preprocessor.clean_doc(doc))
+            if len(w) > 3 if w not in stop_words if not w.isnumeric()
+        ]
+
+    @staticmethod
+    def passthrough(
+        doc: List[str]
+    ) -> List[str]:
+        """The analyzer of the model vectorizers, the documents are already
+        tokenized by the preprocessing.
+
+        Parameters
+        ----------
+        doc : List[str]
+            A preprocessed document.
+
+        Returns
+        -------
+        List[str]
+            The same tokens.
+
+        """
+        return doc
+
     @staticmethod
     def tokenize(
         texts: List[str]
@@ -89,9 +198,7 @@ class Preprocessor:
         """
         for doc in texts:
             cleaned_doc = Preprocessor.clean_doc(doc)
-            tokenizer = RegexpTokenizer(r'\w+')
-            tokens = tokenizer.tokenize(cleaned_doc)
-            yield tokens
+            yield Preprocessor.TOKEN.findall(cleaned_doc)
 
     @staticmethod
     def remove_stopwords(
@@ -110,17 +217,57 @@ class Preprocessor:
             The cleaned documents.
 
         """
-        stop_words = stopwords.words('english')
-        stop_words.extend(
-            ['from', 'subject', 're', 'edu', 'use', 'however',
-             'et', 'al', 'fig', 'also', 'conflict', 'interest']
-            )
-
+        stop_words = Preprocessor.stop_words()
         return [[
             w for w in doc if len(w) > 3 if w not in stop_words
             if not w.isnumeric()
         ] for doc in texts]
 
+    @staticmethod
+    def fit_phrasers(
+        texts: List[List[str]]
+    ) -> Tuple[Phraser, Phraser]:
+        """Learns the bi- and tri-gram phrase models of a corpus, they need
+        the statistics of the whole corpus.
+
+        Parameters
+        ----------
+        texts : List[List[str]]
+            The corpus of documents.
+
+        Returns
+        -------
+        Tuple[Phraser, Phraser]
+            The bi-gram and tri-gram phrasers.
+
+        """
+        bigram = Phrases(texts, min_count=5, threshold=100)
+        bigram_mod = Phraser(bigram)
+        trigram = Phrases(bigram[texts], threshold=100)
+        trigram_mod = Phraser(trigram)
+        return bigram_mod, trigram_mod
+
+    def fit(
+        self: object
+    ) -> Tuple[Phraser, Phraser]:
+        """Fits the phrasers on the documents of the object in two streamed
+        passes, without keeping the tokenized corpus, same phrasers as
+        fit_phrasers. The documents have to be iterable twice (a list, or an
+        object reading them again on every iteration).
+
+        Returns
+        -------
+        Tuple[Phraser, Phraser]
+            The bi-gram and tri-gram phrasers, also set on the object.
+
+        """
+        bigram = Phrases(map(Preprocessor.normalize, self.docs), min_count=5,
+                         threshold=100)
+        trigram = Phrases(bigram[map(Preprocessor.normalize, self.docs)],
+                          threshold=100)
+        self.phrasers = Phraser(bigram), Phraser(trigram)
+        return self.phrasers
+
     @staticmethod
     def make_ngrams(
         texts: List[List[str]]
@@ -138,10 +285,33 @@ class Preprocessor:
             The corpus with bi- and tri-grams.   
 
         """
-        bigram = Phrases(texts, min_count=5, threshold=100)
-        bigram_mod = Phraser(bigram)
-        trigram = Phrases(bigram[texts], threshold=100)
-        trigram_mod = Phraser(trigram)
+        bigram_mod, trigram_mod = Preprocessor.fit_phrasers(texts)
+        return [trigram_mod[bigram_mod[doc]] for doc in texts]
+
+    @staticmethod
+    def apply_phrasers(
+        texts: List[List[str]],
+        bigram_mod: Phraser,
+        trigram_mod: Phraser
+    ) -> List[List[str]]:
+        """Applies fitted phrasers to some documents, the per-document part of
+        the n-gram step that runs in the worker processes.
+
+        Parameters
+        ----------
+        texts : List[List[str]]
+            The tokenized documents without stopwords.
+        bigram_mod : Phraser
+            The bi-gram phraser.
+        trigram_mod : Phraser
+            The tri-gram phraser.
+
+        Returns
+        -------
+        List[List[str]]
+            The documents with bi- and tri-grams.
+
+        """
         return [trigram_mod[bigram_mod[doc]] for doc in texts]
 
     @staticmethod
@@ -184,9 +354,77 @@ class Preprocessor:
         lemmatizer = WordNetLemmatizer()
         return [[lemmatizer.lemmatize(w) for w in doc] for doc in texts]
 
+    @staticmethod
+    def stem_lemma(
+        tokens: List[str]
+    ) -> List[str]:
+        """Stems then lemmatizes distinct tokens, the entries of the
+        normalization table.
+
+        Parameters
+        ----------
+        tokens : List[str]
+            The tokens.
+
+        Returns
+        -------
+        List[str]
+            Their normalized forms, in the same order.
+
+        """
+        stemmer, lemmatizer = PorterStemmer(), WordNetLemmatizer()
+        return [lemmatizer.lemmatize(stemmer.stem(w)) for w in tokens]
+
+    @staticmethod
+    def update_table(
+        texts: List[List[str]],
+        table: dict,
+        executor: Optional[ProcessPoolExecutor]=None,
+        processes: int=1
+    ) -> int:
+        """Adds the tokens of a corpus missing from a normalization table,
+        only they are stemmed and lemmatized (WordNet is not loaded when
+        nothing is missing).
+
+        Parameters
+        ----------
+        texts : List[List[str]]
+            The corpus of documents.
+        table : dict
+            The token to normalized form table, updated in place.
+        executor : Optional[ProcessPoolExecutor], optional
+            A process pool to share the missing tokens across. The default
+            is None.
+        processes : int, optional
+            The number of processes of the pool. The default is 1.
+
+        Returns
+        -------
+        int
+            The number of tokens added.
+
+        """
+        missing = sorted({w for doc in texts for w in doc} - table.keys())
+        if not missing:
+            return 0
+        if executor is None:
+            forms = Preprocessor.stem_lemma(missing)
+        else:
+            size = -(-len(missing) // (processes * 4))
+            forms = [form for chunk in executor.map(
+                Preprocessor.stem_lemma,
+                [missing[i:i + size] for i in range(0, len(missing), size)])
+                for form in chunk]
+        table.update(zip(missing, forms))
+        return len(missing)
+
     @staticmethod
     def preprocess(
-        docs: List[str]
+        docs: List[str],
+        processes: int=1,
+        chunk_size: Optional[int]=None,
+        table: Optional[dict]=None,
+        phrasers: Optional[Tuple[Phraser, Phraser]]=None
     ) -> List[List[str]]:
         """This function is used to run the whole preprocessing on a corpus.
         very easy to use outside the pipeline.
@@ -195,6 +433,17 @@ class Preprocessor:
         ----------
         docs : List[str]
             A corpus of unprocessed documents.
+        processes : int, optional
+            The number of worker processes. The default is 1.
+        chunk_size : Optional[int], optional
+            The number of documents per worker task. The default is None
+            (about four chunks per worker).
+        table : Optional[dict], optional
+            A token to normalized form table, updated in place. The default
+            is None (a new table).
+        phrasers : Optional[Tuple[Phraser, Phraser]], optional
+            Fitted bi- and tri-gram phrasers. The default is None (fitted on
+            the corpus).
 
         Returns
         -------
@@ -202,18 +451,20 @@ class Preprocessor:
             The preprocessed corpus.
 
         """
-        data_words_raw = list(Preprocessor.tokenize(docs))
-        data_words_no_stop = Preprocessor.remove_stopwords(data_words_raw)
-        data_words_ngrams = Preprocessor.make_ngrams(data_words_no_stop)
-        data_words_stemmed = Preprocessor.stemmer(data_words_ngrams)
-        data_words = Preprocessor.lemmatizer(data_words_stemmed)
-        return data_words
+        preprocessor = Preprocessor(docs, processes, chunk_size)
+        preprocessor.table = {} if table is None else table
+        preprocessor.phrasers = phrasers
+        return preprocessor.pipeline()
 
     def pipeline(
         self: object
     ) -> List[List[str]]:
         """Thie class method is used to run the preprocessing pipeline on the 
-        object, intended as a one-liner for the Pipeline class.
+        object, intended as a one-liner for the Pipeline class. The phrasers
+        are fitted on the documents only when the object has none. With a
+        token cache, the final token lists of documents already preprocessed
+        with the same phrasers are read from it, and when the phrasers are
+        to be fitted, the normalized documents are.
 
         Returns
         -------
@@ -221,4 +472,217 @@ class Preprocessor:
             The preprocessed corpus of documents.
 
         """
-        return Preprocessor.preprocess(self.docs)
+        if self.cache is None or self.phrasers is None:
+            return self.__preprocess(self.docs, self.processes)
+        return self.__through_cache(
+            self.docs, self.versions()[1],
+            lambda docs: self.__preprocess(docs, self.processes))
+
+    def __preprocess(
+        self: object,
+        docs: List[str],
+        processes: int
+    ) -> List[List[str]]:
+        """With several processes, the documents are normalized in chunks
+        across a process pool and the chunks go back to the pool to get their
+        n-grams, in order. Stemming and lemmatization go through the
+        normalization table."""
+        if processes > 1:
+            chunk_size = self.chunk_size or max(
+                1, -(-len(docs) // (processes * 4)))
+            with ProcessPoolExecutor(processes) as executor:
+                data_words_no_stop = self.__normalize(
+                    docs, lambda docs: list(executor.map(
+                        Preprocessor.normalize, docs, chunksize=chunk_size)))
+                if self.phrasers is None:
+                    self.phrasers = Preprocessor.fit_phrasers(
+                        data_words_no_stop)
+                chunks = executor.map(
+                    Preprocessor.apply_phrasers,
+                    [data_words_no_stop[i:i + chunk_size]
+                     for i in range(0, len(docs), chunk_size)],
+                    repeat(self.phrasers[0]), repeat(self.phrasers[1]))
+                data_words_ngrams = [doc for chunk in chunks for doc in chunk]
+                Preprocessor.update_table(data_words_ngrams, self.table,
+                                          executor, processes)
+        else:
+            data_words_no_stop = self.__normalize(
+                docs, lambda docs: [Preprocessor.normalize(doc)
+                                    for doc in docs])
+            if self.phrasers is None:
+                self.phrasers = Preprocessor.fit_phrasers(data_words_no_stop)
+            data_words_ngrams = Preprocessor.apply_phrasers(
+                data_words_no_stop, *self.phrasers)
+            Preprocessor.update_table(data_words_ngrams, self.table)
+        return [[self.table[w] for w in doc] for doc in data_words_ngrams]
+
+    def __normalize(
+        self: object,
+        docs: List[str],
+        normalize: Callable[[List[str]], List[List[str]]]
+    ) -> List[List[str]]:
+        """Normalizes documents, through the token cache when the phrasers
+        are to be fitted on them."""
+        if self.cache is None or self.phrasers is not None:
+            return normalize(docs)
+        return self.__through_cache(docs, self.versions()[0], normalize)
+
+    def __through_cache(
+        self: object,
+        docs: List[str],
+        version: str,
+        process: Callable[[List[str]], List[List[str]]]
+    ) -> List[List[str]]:
+        """Reads the cached token lists of documents, processes and stores the
+        missing ones."""
+        keys = [TokenCache.key(doc, version) for doc in docs]
+        found = self.cache.get_many(keys)
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            texts = dict(zip(keys, docs))
+            processed = process([texts[key] for key in missing])
+            self.cache.put_many(zip(missing, processed), version)
+            found.update(zip(missing, processed))
+        return [found[key] for key in keys]
+
+    def versions(
+        self: object
+    ) -> List[str]:
+        """The token cache versions of the normalized documents and of the
+        final token lists, the latter depends on the phrasers.
+
+        Returns
+        -------
+        List[str]
+            The versions, only the first one without phrasers.
+
+        """
+        versions = ["%d" % (Preprocessor.VERSION)]
+        if self.phrasers is not None:
+            digest = hashlib.sha1()
+            for phraser in self.phrasers:
+                for phrase, score in sorted(phraser.phrasegrams.items()):
+                    digest.update(("%s %r\n" % (phrase, score)).encode())
+            versions.append("%d:%s" % (Preprocessor.VERSION,
+                                       digest.hexdigest()))
+        return versions
+
+    def stream(
+        self: object,
+        docs: Optional[Iterable[str]]=None
+    ) -> Generator[List[str], None, None]:
+        """Preprocesses documents one at a time, every stage is a generator
+        so that only the document being consumed is held in memory. The
+        phrasers have to be fitted or loaded first. With a token cache, the
+        documents go through it by chunks of chunk_size (1000 by default).
+
+        Parameters
+        ----------
+        docs : Optional[Iterable[str]], optional
+            The documents, any iterable. The default is None (the documents
+            of the object).
+
+        Raises
+        ------
+        Exception
+            When the object has no phrasers.
+
+        Yields
+        ------
+        Generator[List[str], None, None]
+            The preprocessed documents, in order.
+
+        """
+        if self.phrasers is None:
+            raise Exception("The documents can't be streamed without fitted \
+phrasers, fit them first or load them with the model.")
+        docs = iter(self.docs if docs is None else docs)
+        if self.cache is not None:
+            version = self.versions()[1]
+            while chunk := list(islice(docs, self.chunk_size or 1000)):
+                yield from self.__through_cache(
+                    chunk, version, lambda docs: self.__preprocess(docs, 1))
+            return
+        bigram_mod, trigram_mod = self.phrasers
+        data_words_no_stop = map(Preprocessor.normalize, docs)
+        data_words_ngrams = (trigram_mod[bigram_mod[doc]]
+                             for doc in data_words_no_stop)
+        for doc in data_words_ngrams:
+            if not self.table.keys() >= set(doc):
+                Preprocessor.update_table([doc], self.table)
+            yield [self.table[w] for w in doc]
+
+    @staticmethod
+    def artifact(
+        model: str
+    ) -> str:
+        """The path of the preprocessing state saved alongside a model, or
+        inside a model saved in the native format (a directory).
+
+        Parameters
+        ----------
+        model : str
+            The model path.
+
+        Returns
+        -------
+        str
+            '<model>_preprocessor.joblib' or '<model>/preprocessor.joblib'.
+
+        """
+        if os.path.isdir(model):
+            return os.path.join(model, "preprocessor.joblib")
+        return "%s_preprocessor.joblib" % (os.path.splitext(model)[0])
+
+    def load(
+        self: object,
+        path: str,
+        table_only: bool=False
+    ) -> bool:
+        """Loads a saved normalization table and the phrasers fitted with
+        the model, a missing file or one saved by another version of the
+        preprocessing is ignored.
+
+        Parameters
+        ----------
+        path : str
+            The path of the saved state.
+        table_only : bool, optional
+            Only load the normalization table, to fit new phrasers. The
+            default is False.
+
+        Returns
+        -------
+        bool
+            Whether the state was loaded.
+
+        """
+        if not os.path.exists(path):
+            return False
+        state = load(path)
+        if state.get("version") != Preprocessor.VERSION:
+            return False
+        self.table = state["table"]
+        if not table_only:
+            self.phrasers = state.get("phrasers")
+        return True
+
+    def save(
+        self: object,
+        path: str
+    ) -> str:
+        """Saves the normalization table and the phrasers with joblib.
+
+        Parameters
+        ----------
+        path : str
+            The save path.
+
+        Returns
+        -------
+        str
+            The save path.
+
+        """
+        return dump({"version": Preprocessor.VERSION, "table": self.table,
+                     "phrasers": self.phrasers}, path)[0]
@@ -1,18 +1,209 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-A scraper class.
+A scraper class, and the parser of the Biblio pages it scrapes.
 
 @author: dabane-ghassan
 """
 from __future__ import absolute_import
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape
+from html.parser import HTMLParser
+from xml.etree import ElementTree
 import os
-import time
 import csv
 import requests
 from bs4 import BeautifulSoup
-from metapub import PubMedFetcher
+from bs4.builder import HTMLParserTreeBuilder
+from bs4.dammit import EntitySubstitution
+from metapub import PubMedArticle
+from limiter import RateLimiter
+from cache import ArticleCache
+from journal import Journal
+from client import HttpClient
+from controller import AdaptiveLimiter
+
+EUTILS = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+class ArticleParser(HTMLParser):
+    """Extracts the article of a Biblio page in a single pass of the
+    html.parser tokenizer, without building a tree: only the open tags are
+    tracked, and the text is collected into the first h1 and every p. The
+    tags are opened and closed as by the html.parser tree builder of
+    BeautifulSoup (an end tag closes every tag opened after the last one of
+    its name, void elements are closed at once), and the strings are the ones
+    of its tree (entities, collapsed whitespace, no script, style or comment),
+    so that the text of malformed pages is the same.
+
+    Attributes
+    ----------
+    title: Optional[List[str]]
+        The strings of the first h1, None if there is none.
+
+    paragraphs: List[List[str]]
+        The strings of every p, in the order they were opened.
+
+    sections: int
+        The number of h2 tags.
+
+    """
+    BUILDER = HTMLParserTreeBuilder()
+    VOID = frozenset(BUILDER.empty_element_tags)
+    CONTAINERS = frozenset(BUILDER.string_containers)
+    PRESERVE = frozenset(BUILDER.preserve_whitespace_tags)
+    SPACES = BeautifulSoup.ASCII_SPACES
+
+    def __init__(
+        self: object
+    ) -> None:
+        """Class constructor.
+
+        Returns
+        -------
+        None
+            A class instance.
+
+        """
+        super().__init__(convert_charrefs=False)
+        self.title, self.paragraphs, self.sections = None, [], 0
+        self.__stack, self.__closed, self.__data = [], [], []
+        self.__open = {}
+        self.__collecting, self.__containers, self.__preserve = 0, 0, 0
+
+    def __flush(
+        self: object,
+        string: bool=True
+    ) -> None:
+        """Ends the current string, it goes to the open h1 and p tags unless
+        it is in a script, style or template tag."""
+        if not self.__data:
+            return
+        data = "".join(self.__data)
+        self.__data = []
+        if not self.__collecting or (string and self.__containers):
+            return
+        if not self.__preserve and not data.strip(ArticleParser.SPACES):
+            data = "\n" if "\n" in data else " "
+        for _, strings in self.__stack:
+            if strings is not None:
+                strings.append(data)
+
+    def __push(
+        self: object,
+        tag: str
+    ) -> None:
+        strings = None
+        if tag == 'p':
+            strings = []
+            self.paragraphs.append(strings)
+        elif tag == 'h1' and self.title is None:
+            strings = self.title = []
+        elif tag == 'h2':
+            self.sections += 1
+        self.__stack.append((tag, strings))
+        self.__open[tag] = self.__open.get(tag, 0) + 1
+        self.__collecting += strings is not None
+        self.__containers += tag in ArticleParser.CONTAINERS
+        self.__preserve += tag in ArticleParser.PRESERVE
+
+    def __pop_to(
+        self: object,
+        tag: str
+    ) -> None:
+        if not self.__open.get(tag):
+            return
+        while self.__stack:
+            name, strings = self.__stack.pop()
+            self.__open[name] -= 1
+            self.__collecting -= strings is not None
+            self.__containers -= name in ArticleParser.CONTAINERS
+            self.__preserve -= name in ArticleParser.PRESERVE
+            if name == tag:
+                return
+
+    def handle_starttag(
+        self: object,
+        tag: str,
+        attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        self.__flush()
+        self.__push(tag)
+        if tag in ArticleParser.VOID:
+            self.__pop_to(tag)
+            self.__closed.append(tag)
+
+    def handle_startendtag(
+        self: object,
+        tag: str,
+        attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        self.__flush()
+        self.__push(tag)
+        self.__pop_to(tag)
+
+    def handle_endtag(
+        self: object,
+        tag: str
+    ) -> None:
+        if tag in self.__closed:
+            self.__closed.remove(tag)
+            return
+        self.__flush()
+        self.__pop_to(tag)
+
+    def handle_data(
+        self: object,
+        data: str
+    ) -> None:
+        self.__data.append(data)
+
+    def handle_charref(
+        self: object,
+        name: str
+    ) -> None:
+        self.__data.append(unescape("&#%s;" % (name)))
+
+    def handle_entityref(
+        self: object,
+        name: str
+    ) -> None:
+        self.__data.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(
+            name, "&%s" % (name)))
+
+    def handle_comment(
+        self: object,
+        data: str
+    ) -> None:
+        self.__flush()
+
+    def handle_decl(
+        self: object,
+        decl: str
+    ) -> None:
+        self.__flush()
+
+    def handle_pi(
+        self: object,
+        data: str
+    ) -> None:
+        self.__flush()
+
+    def unknown_decl(
+        self: object,
+        data: str
+    ) -> None:
+        self.__flush()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections are kept, even in script, style or template
+            self.__data.append(data[len("CDATA["):])
+            self.__flush(string=False)
+
+    def close(
+        self: object
+    ) -> None:
+        super().close()
+        self.__flush()
 
 class Scraper:
     """A scraper class that uses the Biblio package to scrape articles,
@@ -26,11 +217,56 @@ class Scraper:
     biblio_adress: str
         The Bilbio package address on the server.
 
+    workers: int
+        The number of threads used to scrape articles concurrently.
+
+    limiter: cazy_little_helper.limiter.RateLimiter
+        The rate limiter shared by the scraping threads.
+
+    cache: Optional[cazy_little_helper.cache.ArticleCache]
+        The on-disk article cache checked before touching the network.
+
+    eutils_address: str
+        The NCBI E-utilities address, used to fetch PubMed abstracts.
+
+    batch_size: int
+        The number of PMIDs fetched with a single efetch request.
+
+    eutils_limiter: cazy_little_helper.limiter.RateLimiter
+        The rate limiter of the E-utilities requests, 3 requests per second
+        as required by NCBI (10 with an NCBI_API_KEY).
+
+    resume: bool
+        Whether to resume a previous run of the same input data.
+
+    journal: cazy_little_helper.journal.Journal
+        The journal of the status of each article, '<input>_journal.csv',
+        only opened while scraping.
+
+    dead_letter: str
+        The path of the articles that never succeeded, '<input>_failed.csv'.
+
+    client: cazy_little_helper.client.HttpClient
+        The pooled HTTP client used for Biblio and E-utilities requests.
+
+    controller: Optional[cazy_little_helper.controller.AdaptiveLimiter]
+        An adaptive limit of the Biblio requests in flight, between 1 and
+        the number of workers, None for a fixed number of workers.
+
     """
     def __init__(
         self: object,
         input_data: str,
-        biblio_address: str
+        biblio_address: str,
+        workers: int=1,
+        rate: Optional[float]=1/3,
+        max_in_flight: Optional[int]=None,
+        cache: Optional[ArticleCache]=None,
+        eutils_address: str=EUTILS,
+        batch_size: int=200,
+        resume: bool=False,
+        client: Optional[HttpClient]=None,
+        adaptive: bool=False
     ) -> None:
         """Class constructor
 
@@ -40,6 +276,28 @@ class Scraper:
             The input data path.
         biblio_address : str
             The biblio package web address.
+        workers : int, optional
+            Number of scraping threads. The default is 1.
+        rate : Optional[float], optional
+            Maximum requests per second sent to Biblio, None for no limit.
+            The default is 1/3 (one article every 3 seconds).
+        max_in_flight : Optional[int], optional
+            Maximum number of concurrent requests to Biblio. The default is
+            None (same as the number of workers).
+        cache : Optional[ArticleCache], optional
+            An article cache shared between runs. The default is None.
+        eutils_address : str, optional
+            The E-utilities address. The default is NCBI's.
+        batch_size : int, optional
+            Number of PMIDs per efetch request. The default is 200.
+        resume : bool, optional
+            Skip the articles finished by a previous run and retry the failed
+            ones. The default is False.
+        client : Optional[HttpClient], optional
+            A shared HTTP client. The default is None (a new client).
+        adaptive : bool, optional
+            Adapt the number of Biblio requests in flight to the server's
+            latency and errors (AIMD). The default is False.
 
         Returns
         -------
@@ -49,12 +307,134 @@ class Scraper:
         """
         self.text_dataset = "%s_text.csv" %(os.path.splitext(input_data)[0])
         self.biblio_address = biblio_address
+        self.workers = workers
+        self.limiter = RateLimiter(rate, max_in_flight or workers)
+        self.cache = cache
+        self.eutils_address = eutils_address
+        self.batch_size = batch_size
+        self.eutils_limiter = RateLimiter(
+            10 if os.environ.get("NCBI_API_KEY") else 3)
+        self.resume = resume
+        self.journal = Journal(
+            "%s_journal.csv" % (os.path.splitext(input_data)[0]), resume)
+        self.dead_letter = "%s_failed.csv" % (os.path.splitext(input_data)[0])
+        self.client = client or HttpClient(pool_size=max(workers, 10))
+        self.controller = AdaptiveLimiter("Biblio", workers) if adaptive \
+            else None
+
+    @staticmethod
+    def parse_article(
+        html: str
+    ) -> Tuple[str, bool, str]:
+        """Extracts an article from a Biblio page with an ArticleParser, in
+        a single pass over the page that does not build its tree. The tags
+        left unclosed in malformed markup are closed by their containers as
+        in the tree of BeautifulSoup.
+
+        Parameters
+        ----------
+        html : str
+            The Biblio page.
+
+        Raises
+        ------
+        IndexError
+            When the page has no title (article not found).
+
+        Returns
+        -------
+        Tuple[str, bool, str]
+            The title, whether only the abstract is available (the page has
+            at most one h2 section), and the text of all paragraphs.
+
+        """
+        parser = ArticleParser()
+        parser.feed(html)
+        parser.close()
+        if parser.title is None:
+            raise IndexError("The page has no title")
+        return ''.join(parser.title), parser.sections <= 1, ''.join(
+            ''.join(strings) for strings in parser.paragraphs)
+
+    def scrape_article(
+        self: object,
+        pmcid: str
+    ) -> List[object]:
+        """Scrapes a single full PMC article with the Biblio package.
+
+        Parameters
+        ----------
+        pmcid : str
+            The PMCID of the article.
+
+        Raises
+        ------
+        IndexError
+            When the Biblio page has no title (article not found).
+        requests.RequestException
+            When the Biblio server can not be reached or keeps failing.
+
+        Returns
+        -------
+        List[object]
+            The csv row of the article.
+
+        """
+        biblio = self.biblio_address + \
+            "/utils/fromPMCID/fromPMCID.php?PMCID=%s&print&content&title"
+        if self.cache and (row := self.cache.get(pmcid)):
+            return row
+        pmcidi = pmcid[3:].strip()
+        response = self.client.get(biblio%(pmcidi), limiter=self.limiter,
+                                   controller=self.controller)
+        response.raise_for_status()
+        title, only_abstract, text = Scraper.parse_article(response.text)
+        row = [pmcid, title, only_abstract, text]
+        if self.cache:
+            self.cache.put(row)
+        return row
+
+    def __try_scrape(
+        self: object,
+        pmcid: str
+    ) -> Tuple[Optional[List[object]], str]:
+        try:
+            return self.scrape_article(pmcid), ""
+        except (IndexError, requests.RequestException) as error:
+            print("problem with article %s"%(pmcid.strip()))
+            return None, repr(error)
+
+    def finished(
+        self: object
+    ) -> Set[str]:
+        """The IDs that are already scraped when resuming a run, the ones
+        marked as done in the journal or already written to the text dataset.
+
+        Returns
+        -------
+        Set[str]
+            The finished IDs, empty if the run is not resumed.
+
+        """
+        if not self.resume:
+            return set()
+        finished = self.journal.done()
+        if os.path.exists(self.text_dataset):
+            with open(self.text_dataset) as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                finished.update(row[0] for row in reader if row)
+        return finished
 
     def scrape_biblio(
         self: object,
         pmcids: List[str]
     ) -> None:
-        """This method uses the Biblio package to scrape full PMC articles.
+        """This method uses the Biblio package to scrape full PMC articles,
+        articles are fetched concurrently by the worker threads but rows are
+        written in the same order as the given PMCIDs. The status of each
+        article is recorded in the journal, and when resuming, finished
+        articles are skipped and the text dataset is appended to.
 
         Parameters
         ----------
@@ -67,36 +447,87 @@ class Scraper:
             Scrapes PMC articles and writes them out to a .csv file.
 
         """
-        biblio = self.biblio_address + \
-            "/utils/fromPMCID/fromPMCID.php?PMCID=%s&print&content&title"
+        with self.journal:
+            finished = self.finished()
+            pmcids = [pmcid for pmcid in pmcids if pmcid not in finished]
+            self.journal.pending(pmcids)
+            append = self.resume and os.path.exists(self.text_dataset)
+
+            with open(self.text_dataset, "a" if append else "w") as new_file, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
 
-        with open(self.text_dataset, "w") as new_file:
-
-            writer = csv.writer(new_file)
-            writer.writerow(["id", "title", "only_abstract", "text"])
-            for pmcid in pmcids:
-                pmcidi = pmcid[3:].strip()
-                try:
-                    url = biblio%(pmcidi)
-                    response = requests.get(url)
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    title = soup.find_all('h1')[0].text
-                    text = ''.join([p.text for p in soup.find_all('p')])
-                    only_abstract = True
-                    if len(soup.find_all('h2')) > 1:
-                        only_abstract = False
-                    writer.writerow([pmcid, title, only_abstract, text])
-                    time.sleep(3)
-
-                except IndexError:
-                    print("problem with article PMC%s"%(pmcidi))
+                writer = csv.writer(new_file)
+                if not append:
+                    writer.writerow(["id", "title", "only_abstract", "text"])
+                results = executor.map(self.__try_scrape, pmcids)
+                for i, (pmcid, (row, error)) in enumerate(zip(pmcids,
+                                                              results)):
+                    if self.controller and i % 100 == 99:
+                        print(self.controller.stats())
+                    if row:
+                        writer.writerow(row)
+                        new_file.flush()
+                        self.journal.record(pmcid, "done")
+                    else:
+                        self.journal.record(pmcid, "failed", error)
+
+            self.report_failures()
+
+    def report_failures(
+        self: object
+    ) -> None:
+        """Writes the dead-letter file, the articles that never succeeded.
+
+        Returns
+        -------
+        None
+            Prints the number of failed articles and the file path.
+
+        """
+        if failed := self.journal.dead_letter(self.dead_letter):
+            print("%d articles could not be scraped, see %s" % (
+                failed, self.dead_letter))
+
+    def fetch_pubmed(
+        self: object,
+        pmids: List[str]
+    ) -> Dict[str, List[object]]:
+        """Fetches a batch of PubMed articles with a single efetch request.
+
+        Parameters
+        ----------
+        pmids : List[str]
+            A batch of article PMIDs.
+
+        Returns
+        -------
+        Dict[str, List[object]]
+            The csv row [id, title, only_abstract, text] of each found PMID.
+
+        """
+        params = {"db": "pubmed", "retmode": "xml", "id": ",".join(pmids)}
+        if api_key := os.environ.get("NCBI_API_KEY"):
+            params["api_key"] = api_key
+        response = self.client.post(self.eutils_address + "/efetch.fcgi",
+                                    data=params, limiter=self.eutils_limiter)
+        response.raise_for_status()
+
+        rows = {}
+        for element in ElementTree.fromstring(response.content):
+            article = PubMedArticle(b"<PubmedArticleSet>%s</PubmedArticleSet>"
+                                    % (ElementTree.tostring(element)))
+            rows[str(article.pmid)] = [
+                article.pmid, article.title, True, article.abstract]
+        return rows
 
     def fetch_abstracts(
         self: object,
         pmids: List[str]
     ) -> None:
         """This method is used to fetch abstracts for articles without a PMCID.
-        Runs after the last method.
+        Runs after the last method. PMIDs are fetched by batches of
+        batch_size with one efetch request each, rows are written in the
+        given order as soon as their batch is finished.
 
         Parameters
         ----------
@@ -110,12 +541,38 @@ class Scraper:
             finished.
 
         """
-        fetcher = PubMedFetcher()
-        with open(self.text_dataset, "a") as f:
-            writer = csv.writer(f)
-            for pmid in pmids:
-                only_abstract = True
-                text = fetcher.article_by_pmid(pmid).abstract
-                title = fetcher.article_by_pmid(pmid).title
-                writer.writerow([pmid, title, only_abstract, text])
-                time.sleep(3)
+        with self.journal:
+            finished = self.finished()
+            pmids = [str(pmid) for pmid in pmids if str(pmid) not in finished]
+            self.journal.pending(pmids)
+            with open(self.text_dataset, "a") as f:
+                writer = csv.writer(f)
+                for i in range(0, len(pmids), self.batch_size):
+                    batch = pmids[i:i + self.batch_size]
+                    rows, error = {}, "not found"
+                    if self.cache:
+                        rows = {pmid: row for pmid in batch
+                                if (row := self.cache.get(pmid))}
+                    if misses := [pmid for pmid in batch if pmid not in rows]:
+                        try:
+                            fetched = self.fetch_pubmed(misses)
+                        except (requests.RequestException,
+                                ElementTree.ParseError) as exception:
+                            fetched, error = {}, repr(exception)
+                        if self.cache:
+                            for row in fetched.values():
+                                self.cache.put(row)
+                        rows.update(fetched)
+                    for pmid in batch:
+                        if pmid in rows:
+                            writer.writerow(rows[pmid])
+                        else:
+                            print("problem with article %s" % (pmid))
+                    f.flush()
+                    for pmid in batch:
+                        if pmid in rows:
+                            self.journal.record(pmid, "done")
+                        else:
+                            self.journal.record(pmid, "failed", error)
+
+            self.report_failures()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A CLI entry point for the PyPI package, for running the local scoring
+service used by predict.py --server.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional
+from parsers import Parser
+from batcher import Batcher
+from service import ScoringService
+
+def launch_service(
+    model: str,
+    host: str,
+    port: int,
+    token_cache: Optional[str],
+    max_batch: int,
+    max_delay: float,
+    interval: Optional[float]
+) -> None:
+
+    batcher = Batcher(model, token_cache, max_batch, max_delay / 1000,
+                      interval or None)
+    service = ScoringService(batcher, host, port)
+    print("Serving %s on http://%s:%d" % (model, host, service.server_port))
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+        batcher.close()
+
+def main(
+) -> None:
+
+    parser = Parser.serve()
+    args = parser.parse_args()
+    args = args.__dict__
+    launch_service(args["model"], args["host"], args["port"],
+                   args["token_cache"], args["max_batch"], args["max_delay"],
+                   args["interval"])
+
+if __name__ == "__main__":
+    main()
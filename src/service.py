@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A ScoringService class, a local HTTP service that keeps CAZy's little helper
+warm between predictions.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Dict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import os
+from batcher import Batcher
+from pipeline import Pipeline
+
+class ScoringService(ThreadingHTTPServer):
+    """A local HTTP service, each request is handled by its own thread and
+    scored through a shared Batcher, so the libraries and the model are
+    only loaded once.
+
+    GET /health
+        The model served and the number of requests, batches, documents and
+        reloads.
+    POST /score {"texts": [...]}
+        The confidence scores of raw documents (title and text).
+    POST /predict {"input_path": ..., "id_pos": ..., ...}
+        Runs the prediction pipeline on an input file of article IDs, with
+        the options of predict.py, the results table is written next to it.
+    POST /reload
+        Reloads the model, even if its files did not change.
+
+    Attributes
+    ----------
+    batcher : cazy_little_helper.batcher.Batcher
+        The batcher that scores the documents of every request.
+
+    """
+    daemon_threads = True
+
+    def __init__(
+        self: object,
+        batcher: Batcher,
+        host: str="127.0.0.1",
+        port: int=8421
+    ) -> None:
+        """Class constructor, binds the service.
+
+        Parameters
+        ----------
+        batcher : Batcher
+            The batcher of the model to serve.
+        host : str, optional
+            The address to listen on. The default is "127.0.0.1" (only
+            local clients).
+        port : int, optional
+            The port to listen on. The default is 8421.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        super().__init__((host, port), ScoringHandler)
+        self.batcher = batcher
+
+    def predict(
+        self: object,
+        job: Dict
+    ) -> Dict:
+        """Runs the prediction pipeline with the served model, the
+        connections it opened are closed when it is finished.
+
+        Parameters
+        ----------
+        job : Dict
+            The input path and the options of predict.py.
+
+        Returns
+        -------
+        Dict
+            The path of the results table.
+
+        """
+        process = Pipeline(job["input_path"], job.get("id_pos", 0),
+                           job["biblio_add"], self.batcher.model,
+                           job.get("workers", 1), job.get("rate", 1/3),
+                           job.get("cache"), job.get("index"),
+                           job.get("resume", False),
+                           job.get("adaptive", False),
+                           batcher=self.batcher)
+        try:
+            process.run()
+        finally:
+            process.close()
+        return {"output_path": os.path.abspath(process.output_data)}
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """The requests handler of the ScoringService."""
+
+    def __reply(
+        self: object,
+        status: int,
+        body: Dict
+    ) -> None:
+        """Sends a JSON response."""
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(
+        self: object
+    ) -> None:
+        if self.path == "/health":
+            self.__reply(200, self.server.batcher.stats())
+        else:
+            self.__reply(404, {"error": "unknown path %s" % (self.path)})
+
+    def do_POST(
+        self: object
+    ) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/score":
+                self.__reply(200, {"scores": [float(score) for score in
+                                              self.server.batcher.score(
+                                                  body["texts"])]})
+            elif self.path == "/predict":
+                self.__reply(200, self.server.predict(body))
+            elif self.path == "/reload":
+                self.__reply(200, {"reloaded":
+                                   self.server.batcher.reload(force=True)})
+            else:
+                self.__reply(404, {"error": "unknown path %s" % (self.path)})
+        except Exception as error:
+            self.__reply(500, {"error": "%s: %s" % (type(error).__name__,
+                                                    error)})
+
+    def log_request(
+        self: object,
+        code: str="-",
+        size: str="-"
+    ) -> None:
+        """The requests are not logged, only the errors."""
+        return
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A ServiceClient class, the thin client of the scoring service, which only
+depends on the standard library so that it starts instantly.
+
+@author: dabane-ghassan
+"""
+from __future__ import absolute_import
+from typing import Optional, List, Dict
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+import json
+
+class ServiceClient:
+    """A client of the ScoringService.
+
+    Attributes
+    ----------
+    address : str
+        The address of the service, http://host:port.
+
+    timeout : Optional[float]
+        The timeout of a request in seconds, None to wait as long as the
+        service works (a prediction scrapes every article).
+
+    """
+    def __init__(
+        self: object,
+        address: str="http://127.0.0.1:8421",
+        timeout: Optional[float]=None
+    ) -> None:
+        """Class constructor.
+
+        Parameters
+        ----------
+        address : str, optional
+            The address of the service. The default is
+            "http://127.0.0.1:8421".
+        timeout : Optional[float], optional
+            The timeout of a request in seconds. The default is None.
+
+        Returns
+        -------
+        None
+            Class instance.
+
+        """
+        self.address = address.rstrip("/")
+        self.timeout = timeout
+
+    def __request(
+        self: object,
+        path: str,
+        body: Optional[Dict]=None
+    ) -> Dict:
+        """Sends a request, POST if it has a body, and decodes the JSON
+        response.
+
+        Raises
+        ------
+        Exception
+            If the service failed to handle the request.
+
+        """
+        data = json.dumps(body).encode() if body is not None else None
+        request = Request(self.address + path, data=data, headers={
+            "Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as error:
+            raise Exception("The scoring service failed: %s" % (
+                json.loads(error.read()).get("error", error.reason)))
+
+    def health(
+        self: object
+    ) -> Dict:
+        """The model served and the counters of the service."""
+        return self.__request("/health")
+
+    def score(
+        self: object,
+        texts: List[str]
+    ) -> List[float]:
+        """The confidence scores of raw documents (title and text)."""
+        return self.__request("/score", {"texts": texts})["scores"]
+
+    def predict(
+        self: object,
+        job: Dict
+    ) -> str:
+        """Runs the prediction pipeline on the service.
+
+        Parameters
+        ----------
+        job : Dict
+            The input path and the options of predict.py, the paths are
+            resolved by the service.
+
+        Returns
+        -------
+        str
+            The path of the results table.
+
+        """
+        return self.__request("/predict", job)["output_path"]
+
+    def reload(
+        self: object
+    ) -> bool:
+        """Reloads the model of the service."""
+        return self.__request("/reload", {})["reloaded"]
@@ -8,9 +8,9 @@ A Toolkit class.
 from __future__ import absolute_import
 import os
 import pandas as pd
-from metapub.pubmedcentral import get_pmid_for_otherid
-from metapub.pubmedcentral import get_pmcid_for_otherid
-from metapub.pubmedcentral import get_doi_for_otherid
+from typing import Optional
+from converter import IdConverter
+from idindex import IdIndex
 
 class Toolkit:
     """A Toolkit class to wrap some useful functions.
@@ -78,9 +78,11 @@ class Toolkit:
     @staticmethod
     def find_ids(
         ids_file: str,
-        id_type: str
+        id_type: str,
+        index: Optional[str]=None
     ) -> str:
-        """This function transforms a list of articles IDs into another type. 
+        """This function transforms a list of articles IDs into another type,
+        the IDs are converted in bulk with the PMC ID Converter API.
 
         Parameters
         ----------
@@ -89,6 +91,9 @@ class Toolkit:
         id_type : str
             The type of ID to search for, one of the following,
             ['PMID', 'DOI', 'PMCID'].
+        index : Optional[str], optional
+            The path of a local ID mapping index, looked up before the
+            network and updated with the new results. The default is None.
 
         Raises
         ------
@@ -101,28 +106,17 @@ class Toolkit:
             The output file path.
 
         """
-        if id_type == "PMID":
-            finder = get_pmid_for_otherid
-        elif id_type == "DOI":
-            finder = get_doi_for_otherid
-        elif id_type == "PMCID":
-            finder = get_pmcid_for_otherid
-        else:
+        if id_type not in ["PMID", "DOI", "PMCID"]:
             raise Exception("ID type error, please provide one of the \
                             following three = ['PMID', 'DOI', 'PMCID']")
 
         ids = pd.read_csv(ids_file, header=None)[0]
         output = "%s_%s.csv" % (os.path.splitext(ids_file)[0], id_type)
-        pmids = []
-
-        for idi in ids:
-            try:
-                if pmid := finder(idi):
-                    pmids.append(pmid)
-                else:
-                    pmids.append("not_found")
-            except AttributeError:
-                pmids.append("not_found")
+        converter = IdConverter(index=IdIndex(index) if index else None)
+        pmids = [pmid if pmid else "not_found" for pmid in converter.convert(
+            ids.to_list(), id_type.lower())]
+        if converter.index:
+            print(converter.index.stats())
 
         pd.DataFrame({"id": ids,
                       id_type: pd.Series(pmids)